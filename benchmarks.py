@@ -0,0 +1,296 @@
+"""
+Benchmarks de latence par étape, hors-ligne grâce à replay.py.
+
+    python benchmarks.py --mode record            # une fois, avec les vraies clés
+    python benchmarks.py --latency 0.2 --repeat 20 # ensuite, sans réseau
+    python benchmarks.py --imports                 # temps d'import, comparé au budget
+    python benchmarks.py --tracing                 # surcoût du traçage par appel
+    python benchmarks.py --metrics                 # surcoût des métriques par appel LLM
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import registry
+import replay
+
+# Budget de démarrage (s) par module : import à froid, dans un interpréteur neuf
+IMPORT_BUDGETS = {
+    "chefbot": 0.3,
+    "tools": 0.3,
+    "judge": 0.1,
+    "evaluation": 0.1,
+    "database_tools": 1.5,   # smolagents reste importé : les classes Tool en héritent
+}
+
+CONSTRAINTS = "Pour 6 personnes. Repas Végétariens. Produits d'été uniquement."
+EXPECTED = {"must_avoid": ["viande", "poisson"], "must_include": ["légumes"]}
+AGENT_QUESTION = "Quels plats puis-je faire avec du poulet et du riz ?"
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def bench(name: str, fn, repeat: int = 10) -> dict:
+    """Chronomètre fn() `repeat` fois puis mesure ses allocations sur une exécution."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+
+    return {
+        "stage": name,
+        "runs": repeat,
+        "p50_ms": percentile(durations, 0.5) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "peak_kb": peak / 1024,
+        "allocated_kb": allocated / 1024,
+    }
+
+
+class _TimedCompletions:
+    """Proxy de client Groq qui chronomètre chaque appel (= une itération de l'agent)."""
+
+    def __init__(self, client, durations):
+        self._client = client
+        self._durations = durations
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._client.chat.completions.create(**kwargs)
+        finally:
+            self._durations.append(time.perf_counter() - start)
+
+
+def setup_offline(mode: str = "replay", latency=0.0, fixtures: str = replay.FIXTURES_DIR):
+    """Branche chefbot (et son client Langfuse) sur la couche de replay."""
+    store = replay.FixtureStore(fixtures)
+    # Clients remplacés dans le registre avant tout usage : chefbot ne construit rien à l'import,
+    # le client Langfuse réel n'est donc jamais créé
+    registry.override("langfuse", replay.langfuse_client(store, mode, latency))
+
+    import chefbot
+    registry.override("groq", replay.groq_client(store, mode, latency))
+    registry.override("async_groq", replay.async_groq_client(store, mode, latency))
+    return store, chefbot
+
+
+def run_benchmarks(mode: str = "replay", latency=0.0, repeat: int = 10,
+                   fixtures: str = replay.FIXTURES_DIR) -> list:
+    store, chefbot = setup_offline(mode, latency, fixtures)
+    from step_executor import compact_context, normalize_plan
+
+    report = []
+    plan = chefbot.get_plan(CONSTRAINTS, use_cache=False)
+    report.append(bench("get_plan", lambda: chefbot.get_plan(CONSTRAINTS, use_cache=False), repeat))
+
+    # Étapes exécutées avec leur contexte compacté, comme dans plan_weekly_menu
+    steps = normalize_plan(plan)
+    results = {}
+    for step in steps:
+        context = compact_context(CONSTRAINTS, [results[d] for d in step["depend_de"]])
+        results[step["id"]] = chefbot.execute_step(step["nom"], context, use_cache=False)
+        report.append(bench(
+            f"execute_step[{step['id']}]",
+            lambda step=step, context=context: chefbot.execute_step(step["nom"], context, use_cache=False),
+            repeat,
+        ))
+
+    outputs = [results[s["id"]] for s in steps]
+    synthesis = chefbot._chat(chefbot._synthesis_messages(outputs), use_cache=False)
+    report.append(bench("synthese",
+                        lambda: chefbot._chat(chefbot._synthesis_messages(outputs), use_cache=False), repeat))
+
+    report.append(bench("rule_evaluator",
+                        lambda: chefbot.rule_evaluator(output=synthesis, expected_output=EXPECTED), repeat))
+    report.append(bench(
+        "llm_judge",
+        lambda: chefbot.llm_judge_batch([{"question": CONSTRAINTS, "output": synthesis}], use_cache=False),
+        repeat,
+    ))
+
+    # Agent de tool calling (Partie 4) : une mesure par itération (= un appel LLM)
+    import tools
+    iterations = []
+    groq = registry.get("groq")
+    registry.override("groq", _TimedCompletions(groq, iterations))
+    try:
+        agent = bench("tool_calling_agent", lambda: tools.tool_calling_agent(AGENT_QUESTION), repeat)
+    finally:
+        registry.override("groq", groq)
+    report.append(agent)
+    report.append({
+        "stage": "tool_calling_agent/iteration",
+        "runs": len(iterations),
+        "p50_ms": percentile(iterations, 0.5) * 1000 if iterations else None,
+        "p95_ms": percentile(iterations, 0.95) * 1000 if iterations else None,
+        "peak_kb": None,
+        "allocated_kb": None,
+    })
+    return report
+
+
+def bench_import(module: str, repeat: int = 3) -> float:
+    """Meilleur temps d'import à froid de `module` (s), chaque essai dans un nouveau processus."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    durations = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        durations.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(durations)
+
+
+def check_import_budgets(budgets: dict = IMPORT_BUDGETS, repeat: int = 3) -> list:
+    rows = []
+    for module, budget in budgets.items():
+        duration = bench_import(module, repeat)
+        rows.append({"module": module, "import_s": duration, "budget_s": budget, "ok": duration <= budget})
+    return rows
+
+
+def print_import_report(rows: list):
+    print(f"{'module':<20}{'import s':>10}{'budget s':>10}")
+    for row in rows:
+        flag = "" if row["ok"] else "  HORS BUDGET"
+        print(f"{row['module']:<20}{row['import_s']:>10.3f}{row['budget_s']:>10.2f}{flag}")
+
+
+def bench_tracing(calls: int = 2000, fixtures: str = replay.FIXTURES_DIR) -> list:
+    """
+    Surcoût par appel d'une fonction @observe : sans traçage, non retenue par
+    l'échantillonnage (0 %), tracée (100 %, spans exportés en mémoire).
+    """
+    import os
+
+    os.environ["LANGFUSE_TRACING_ENABLED"] = "true"
+    os.environ.pop("CHEFBOT_TRACING", None)
+    registry.override("langfuse", replay.langfuse_client(replay.FixtureStore(fixtures), "replay"))
+
+    def work():
+        return sum(range(200))
+
+    traced = registry.observe(work, name="bench_tracing")
+    exporter = registry.get("langfuse").span_exporter
+    rows = []
+    for label, fn, rate in (("sans traçage", work, None), ("échantillonné 0 %", traced, "0"),
+                            ("échantillonné 100 %", traced, "1")):
+        if rate is not None:
+            os.environ["CHEFBOT_TRACE_SAMPLING"] = f"bench_tracing={rate}"
+        fn()   # décorateur Langfuse résolu hors mesure
+        exporter.clear()
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        rows.append({"mode": label, "us_per_call": (time.perf_counter() - start) / calls * 1e6,
+                     "spans": len(exporter.get_finished_spans())})
+    os.environ.pop("CHEFBOT_TRACE_SAMPLING", None)
+
+    baseline = rows[0]["us_per_call"]
+    for row in rows:
+        row["overhead_us"] = row["us_per_call"] - baseline
+    return rows
+
+
+def print_tracing_report(rows: list):
+    print(f"{'mode':<24}{'µs/appel':>12}{'surcoût µs':>12}{'spans':>8}")
+    for row in rows:
+        print(f"{row['mode']:<24}{row['us_per_call']:>12.1f}{row['overhead_us']:>12.1f}{row['spans']:>8}")
+
+
+def bench_metrics(calls: int = 20000) -> list:
+    """Surcoût par appel de metrics.track (sans métriques, avec, avec l'usage en tokens)."""
+    import types
+
+    import metrics
+
+    response = types.SimpleNamespace(usage=types.SimpleNamespace(prompt_tokens=120, completion_tokens=80))
+
+    def bare():
+        return response
+
+    def tracked():
+        with metrics.track("bench-model", function="bench_metrics"):
+            return response
+
+    def tracked_usage():
+        with metrics.track("bench-model", function="bench_metrics") as call:
+            call["response"] = response
+            return response
+
+    rows = []
+    for label, fn in (("sans métriques", bare), ("latence", tracked), ("latence + tokens", tracked_usage)):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        rows.append({"mode": label, "us_per_call": (time.perf_counter() - start) / calls * 1e6})
+    baseline = rows[0]["us_per_call"]
+    for row in rows:
+        row["overhead_us"] = row["us_per_call"] - baseline
+    return rows
+
+
+def print_metrics_report(rows: list):
+    print(f"{'mode':<24}{'µs/appel':>12}{'surcoût µs':>12}")
+    for row in rows:
+        print(f"{row['mode']:<24}{row['us_per_call']:>12.2f}{row['overhead_us']:>12.2f}")
+
+
+def print_report(report: list):
+    print(f"{'étape':<32}{'runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'pic KB':>10}{'alloc KB':>10}")
+    cell = lambda v, fmt: f"{v:>10{fmt}}" if v is not None else f"{'-':>10}"
+    for row in report:
+        print(f"{row['stage']:<32}{row['runs']:>6}{cell(row['p50_ms'], '.2f')}{cell(row['p95_ms'], '.2f')}"
+              f"{cell(row['peak_kb'], '.1f')}{cell(row['allocated_kb'], '.1f')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks ChefBot par étape (record / replay)")
+    parser.add_argument("--mode", choices=replay.MODES, default="replay")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence synthétique (s) en replay")
+    parser.add_argument("--jitter", type=float, default=0.0, help="écart autour de la latence (s)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--fixtures", default=replay.FIXTURES_DIR)
+    parser.add_argument("--json", help="écrit aussi le rapport dans ce fichier")
+    parser.add_argument("--imports", action="store_true", help="mesure les temps d'import (budget de démarrage)")
+    parser.add_argument("--tracing", action="store_true", help="mesure le surcoût du traçage par appel")
+    parser.add_argument("--metrics", action="store_true", help="mesure le surcoût des métriques par appel")
+    args = parser.parse_args()
+
+    if args.metrics:
+        print_metrics_report(bench_metrics())
+        sys.exit(0)
+
+    if args.tracing:
+        print_tracing_report(bench_tracing(fixtures=args.fixtures))
+        sys.exit(0)
+
+    if args.imports:
+        rows = check_import_budgets(repeat=args.repeat)
+        print_import_report(rows)
+        sys.exit(0 if all(row["ok"] for row in rows) else 1)
+
+    latency = (args.latency, args.jitter) if args.jitter else args.latency
+    report = run_benchmarks(args.mode, latency, args.repeat, args.fixtures)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
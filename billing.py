@@ -0,0 +1,219 @@
+"""
+Commandes et additions du restaurant (Partie 5), sans LLM ni eval : addition en un appel (plats
+retrouvés par nom, jamais substitués), évaluateur d'expressions sûr pour `calculate`, totaux NumPy.
+"""
+import ast
+import math
+import operator
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from matching import fold, stem
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_EXPONENT = 100
+MAX_RESULT_BITS = 4096      # une puissance entière plus grande est refusée avant d'être calculée
+NAME_CANDIDATES = 10        # plats présélectionnés (trigrammes) avant la comparaison des mots
+NAME_STOPWORDS = frozenset("a au aux d de des du en et l la le les".split())
+
+
+class UnsafeExpression(ValueError):
+    """Expression refusée par l'évaluateur (syntaxe non autorisée ou invalide)."""
+
+
+class UnknownDishes(ValueError):
+    """Plats de la commande introuvables ou ambigus ; `suggestions` : nom demandé -> plats proches."""
+
+    def __init__(self, suggestions: dict):
+        super().__init__("plats introuvables à la carte : " + ", ".join(suggestions))
+        self.suggestions = suggestions
+
+
+# -----------------------------------------------------------------------
+# --- Évaluateur d'expressions ---
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_FUNCTIONS = {"round": round, "min": min, "max": max, "abs": abs, "sum": sum,
+              "ceil": math.ceil, "floor": math.floor}
+_SEQUENCE_FUNCTIONS = {"min", "max", "sum"}   # seules fonctions qui acceptent une liste littérale
+# Les espaces (même insécables) restent significatifs : "2 3" est une erreur, pas 23
+_NORMALIZE = str.maketrans({"×": "*", "÷": "/", "€": None, "\u00a0": " ", "\u202f": " "})
+
+
+def _pow(base, exponent):
+    """Puissance bornée : exposant (même calculé) et taille du résultat entier vérifiés avant calcul."""
+    if abs(exponent) > MAX_EXPONENT:
+        raise UnsafeExpression(f"exposant limité à {MAX_EXPONENT}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if base.bit_length() * exponent > MAX_RESULT_BITS:
+            raise UnsafeExpression("résultat trop grand")
+    return operator.pow(base, exponent)
+
+
+class _BoundedPow(ast.NodeTransformer):
+    """Remplace chaque `a ** b` par `_pow(a, b)`."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(func=ast.Name(id="_pow", ctx=ast.Load()),
+                                              args=[node.left, node.right], keywords=[]), node)
+        return node
+
+
+def _check(node, sequence_allowed: bool = False):
+    """Refuse toute syntaxe hors liste ; une liste n'est admise qu'en argument direct de min / max / sum."""
+    if isinstance(node, ast.Expression):
+        return _check(node.body)
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise UnsafeExpression(f"constante non numérique : {node.value!r}")
+        return
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        _check(node.left)
+        _check(node.right)
+        return
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _check(node.operand)
+    if isinstance(node, (ast.Tuple, ast.List)) and sequence_allowed:
+        for element in node.elts:
+            _check(element)
+        return
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+            and not node.keywords):
+        for arg in node.args:
+            _check(arg, sequence_allowed=node.func.id in _SEQUENCE_FUNCTIONS)
+        return
+    raise UnsafeExpression(f"syntaxe non autorisée : {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str):
+    """Code compilé (et mis en cache) d'une expression arithmétique vérifiée."""
+    expression = expression.translate(_NORMALIZE).strip()
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise UnsafeExpression("expression trop longue")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise UnsafeExpression(f"expression invalide : {e.msg}") from None
+    _check(tree)
+    tree = ast.fix_missing_locations(_BoundedPow().visit(tree))
+    return compile(tree, "<calculate>", "eval")
+
+
+def safe_eval(expression: str):
+    """Évalue une expression arithmétique ("3 * 12 + 9 / 2", "round(87 / 6, 2)") sans eval libre."""
+    code = compile_expression(expression)
+    try:
+        return eval(code, {"__builtins__": {}}, {**_FUNCTIONS, "_pow": _pow})
+    except UnsafeExpression:
+        raise
+    except (ArithmeticError, TypeError, ValueError) as e:
+        raise UnsafeExpression(f"calcul impossible : {e}") from None
+
+
+# -----------------------------------------------------------------------
+# --- Commandes ---
+
+def parse_order(items) -> list:
+    """Normalise une commande ({"quiche": 2}, [["quiche", 2]], [{"plat": ...}], ["quiche"]) en [(nom, quantité)]."""
+    if isinstance(items, dict):
+        items = list(items.items())
+    order = {}
+    for item in items or []:
+        if isinstance(item, str):
+            name, quantity = item, 1
+        elif isinstance(item, dict):
+            name = item.get("plat") or item.get("nom") or item.get("name")
+            quantity = item.get("quantite", item.get("quantité", item.get("quantity", 1)))
+        else:
+            name, quantity = item
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise ValueError(f"quantité invalide pour {name!r} : {quantity!r}") from None
+        if not name or quantity < 0:
+            raise ValueError(f"ligne de commande invalide : {item!r}")
+        key = str(name).strip()
+        order[key] = order.get(key, 0) + quantity
+    return [(name, quantity) for name, quantity in order.items() if quantity]
+
+
+def name_words(name: str) -> frozenset:
+    """Mots significatifs d'un nom de plat (sans accents, casse, pluriel simple ni articles)."""
+    return frozenset(stem(w) for w in re.findall(r"\w+", fold(name)) if w not in NAME_STOPWORDS)
+
+
+class PriceBook:
+    """Prix des plats d'un store, avec résolution stricte des noms mise en cache."""
+
+    def __init__(self, store):
+        self.store = store
+        self._resolved = {}
+
+    def resolve(self, name: str):
+        """Fiche du plat : nom normalisé exact ou nom partiel non ambigu, sinon None."""
+        key = name.strip().lower()
+        if key not in self._resolved:
+            wanted = name_words(name)
+            candidates = self.store.search_name(name, k=NAME_CANDIDATES) if wanted else []
+            exact = [p for p in candidates if name_words(p["nom"]) == wanted]
+            partial = [p for p in candidates if wanted <= name_words(p["nom"])]
+            found = exact or (partial if len(partial) == 1 else [])
+            self._resolved[key] = found[0] if found else None
+        return self._resolved[key]
+
+    def suggest(self, name: str, k: int = 3) -> list:
+        """Noms de plats proches, pour le message d'erreur d'un plat introuvable."""
+        return [p["nom"] for p in self.store.search_name(name, k=k)]
+
+    def clear(self):
+        """À appeler après une mise à jour de la carte."""
+        self._resolved.clear()
+
+
+def _cents(value) -> float:
+    return round(float(value) + 1e-9, 2)
+
+
+def build_bill(prices: PriceBook, items, convives: int = None, budget: float = None) -> dict:
+    """Lignes, total, part par convive et budget ; lève UnknownDishes si un plat n'est pas à la carte."""
+    lines, unknown = [], {}
+    for name, quantity in parse_order(items):
+        product = prices.resolve(name)
+        if product is None:
+            unknown[name] = prices.suggest(name)
+            continue
+        lines.append({"plat": product["nom"], "demande": name, "prix_unitaire": product["prix"],
+                      "quantite": quantity, "total": _cents(product["prix"] * quantity)})
+    if unknown:
+        raise UnknownDishes(unknown)
+    total = _cents(sum(line["total"] for line in lines))
+    bill = {"lignes": lines, "total": total, "articles": sum(line["quantite"] for line in lines)}
+    if convives:
+        bill["convives"] = int(convives)
+        bill["par_personne"] = _cents(total / int(convives))
+    if budget is not None:
+        bill["budget"] = {"montant": budget, "reste": _cents(budget - total), "respecte": total <= budget}
+    return bill
+
+
+def order_totals(prices: PriceBook, orders: list) -> np.ndarray:
+    """Totaux de nombreuses commandes en une somme pondérée NumPy ; NaN si un plat est introuvable."""
+    order_index, unit_prices, quantities = [], [], []
+    for i, items in enumerate(orders):
+        for name, quantity in parse_order(items):
+            product = prices.resolve(name)
+            order_index.append(i)
+            unit_prices.append(product["prix"] if product is not None else np.nan)
+            quantities.append(quantity)
+    weights = np.asarray(unit_prices, dtype=float) * np.asarray(quantities, dtype=float)
+    totals = np.bincount(np.asarray(order_index, dtype=np.int64), weights=weights, minlength=len(orders))
+    return np.round(totals, 2)
@@ -0,0 +1,127 @@
+"""Cache des réponses LLM : LRU en mémoire devant SQLite, clé = hash (modèle, messages, paramètres)."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PATH = os.getenv("CHEFBOT_CACHE_PATH", ".chefbot_cache.sqlite")
+CACHE_TTL = float(os.getenv("CHEFBOT_CACHE_TTL", 7 * 24 * 3600))      # secondes
+CACHE_MAX_ENTRIES = int(os.getenv("CHEFBOT_CACHE_MAX_ENTRIES", 10_000))
+
+API_DEFAULT_TEMPERATURE = 1.0    # température de Groq quand l'appel n'en précise pas
+MAX_CACHED_TEMPERATURE = 0.3     # au-delà, un tirage voulu varié : jamais figé par un cache
+
+
+def effective_temperature(temperature=None) -> float:
+    return API_DEFAULT_TEMPERATURE if temperature is None else float(temperature)
+
+
+def cacheable(temperature=None) -> bool:
+    """Réponse réutilisable si la température effective ne dépasse pas MAX_CACHED_TEMPERATURE."""
+    return effective_temperature(temperature) <= MAX_CACHED_TEMPERATURE
+
+
+def make_key(model: str, messages: list, **params) -> str:
+    """Hash stable de (modèle, messages, paramètres) ; l'ordre des clés n'a pas d'influence."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache clé -> valeur JSON : LRU en mémoire (`memory_entries`), puis SQLite (TTL, taille max)."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES, memory_entries: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """Retourne la valeur en cache ou None (absente ou expirée)."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.stats["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.stats["disk_hits"] += 1
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        """Enregistre une valeur JSON-sérialisable (TTL par défaut : celui du cache)."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+            )
+            self._writes += 1
+            # L'éviction disque est amortie : une passe toutes les 100 écritures
+            if self._writes % 100 == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
@@ -0,0 +1,168 @@
+"""
+Cascade de modèles pour plan_weekly_menu (Partie 2) : petit modèle d'abord, 70b si la vérification
+locale signale la sortie. Aucun appel réseau ici.
+
+    CHEFBOT_MODEL_ROUTING="plan=large,step=small>large"   CHEFBOT_CASCADE_SYNTHESIS=1
+"""
+import os
+import re
+import threading
+
+import metrics
+from matching import compile_expectations, fold
+
+TIERS = {
+    "small": "meta-llama/llama-4-scout-17b-16e-instruct",
+    "large": "llama-3.3-70b-versatile",
+}
+
+DEFAULT_ROUTING = {
+    "plan": ("small", "large"),
+    "step": ("small", "large"),
+    "synthesis": ("large",),
+}
+# Synthèse en cascade (petit modèle d'abord) : seulement sur demande, le menu complet échoue
+# souvent à la vérification et l'escalade coûte alors un appel de plus que le 70b seul
+CASCADE_SYNTHESIS = ("small", "large")
+
+MIN_OUTPUT_CHARS = 40
+MIN_INCLUDED_RATIO = 1.0   # synthèse : tous les éléments requis doivent apparaître
+
+# Contraintes reconnues dans la demande -> termes interdits / requis (vérification locale)
+CONSTRAINT_RULES = [
+    (re.compile(r"vegetalien|vegan"), {
+        "must_avoid": ["viande", "poisson", "fruits de mer", "oeuf", "lait", "fromage", "beurre", "crème", "miel"]}),
+    (re.compile(r"vegetarien"), {
+        "must_avoid": ["viande", "poulet", "boeuf", "porc", "agneau", "jambon", "lardons", "poisson",
+                       "saumon", "thon", "fruits de mer"]}),
+    (re.compile(r"fruits de mer|crustace"), {
+        "must_avoid": ["crevettes", "crabe", "homard", "moules", "huîtres", "calamar"]}),
+    (re.compile(r"gluten"), {
+        "must_avoid": ["blé", "orge", "seigle", "épeautre", "pâtes classiques", "pain classique"]}),
+    (re.compile(r"lactose|sans lait|produits laitiers"), {
+        "must_avoid": ["lait", "crème", "beurre", "fromage"]}),
+    (re.compile(r"arachide|cacahuete"), {
+        "must_avoid": ["arachide", "cacahuète"]}),
+]
+
+_REFUSALS = re.compile(r"^\s*(?:je ne peux pas|désolé|i can(?:no|')t|i'm sorry)", re.I)
+
+
+def routing(overrides: dict = None) -> dict:
+    """Routage effectif : défaut, CHEFBOT_CASCADE_SYNTHESIS, puis CHEFBOT_MODEL_ROUTING, puis `overrides`."""
+    result = dict(DEFAULT_ROUTING)
+    if os.getenv("CHEFBOT_CASCADE_SYNTHESIS", "0") == "1":
+        result["synthesis"] = CASCADE_SYNTHESIS
+    for item in os.getenv("CHEFBOT_MODEL_ROUTING", "").split(","):
+        if "=" in item:
+            stage, models = item.split("=", 1)
+            result[stage.strip()] = tuple(m.strip() for m in models.split(">") if m.strip())
+    for stage, models in (overrides or {}).items():
+        result[stage] = (models,) if isinstance(models, str) else tuple(models)
+    return result
+
+
+def model_for(tier: str) -> str:
+    return TIERS.get(tier, tier)
+
+
+# -----------------------------------------------------------------------
+# --- Vérifications locales ---
+
+def expectations_for(constraints: str, expected: dict = None) -> dict:
+    """Termes interdits / requis déduits de la demande, complétés par `expected` (dataset)."""
+    text = fold(constraints or "")
+    avoid, include = [], []
+    for pattern, rule in CONSTRAINT_RULES:
+        if pattern.search(text):
+            avoid += rule.get("must_avoid", [])
+            include += rule.get("must_include", [])
+    if expected:
+        avoid += expected.get("must_avoid", [])
+        include += expected.get("must_include", [])
+    return {"must_avoid": list(dict.fromkeys(avoid)), "must_include": list(dict.fromkeys(include))}
+
+
+def check_output(output: str, expectations: dict, require_included: bool = False,
+                 evaluate=None) -> list:
+    """Raisons d'escalader une sortie (liste vide : acceptée) ; `evaluate` suit l'interface de rule_evaluator."""
+    if not output or len(output.strip()) < MIN_OUTPUT_CHARS:
+        return ["empty"]
+    if _REFUSALS.search(output):
+        return ["refusal"]
+    if not expectations.get("must_avoid") and not (require_included and expectations.get("must_include")):
+        return []
+    expected = {"must_avoid": expectations.get("must_avoid", []),
+                "must_include": expectations.get("must_include", []) if require_included else []}
+    scores = (evaluate(output=output, expected_output=expected) if evaluate is not None
+              else compile_expectations(expected).score(output))
+    reasons = []
+    if scores.get("no_forbidden", 1.0) < 1.0:
+        reasons.append("forbidden")
+    if require_included and scores.get("included_ratio", 1.0) < MIN_INCLUDED_RATIO:
+        reasons.append("missing_required")
+    return reasons
+
+
+# -----------------------------------------------------------------------
+# --- Exécution et statistiques ---
+
+class CascadeStats:
+    """Appels par étape et par modèle, escalades et leurs raisons."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def record(self, stage: str, served_by: str, escalations: list):
+        with self._lock:
+            stats = self._stages.setdefault(stage, {"requests": 0, "served_by": {}, "escalations": 0,
+                                                    "reasons": {}})
+            stats["requests"] += 1
+            stats["served_by"][served_by] = stats["served_by"].get(served_by, 0) + 1
+            stats["escalations"] += len(escalations)
+            for reasons in escalations:
+                for reason in reasons:
+                    stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {stage: {**s, "served_by": dict(s["served_by"]), "reasons": dict(s["reasons"])}
+                      for stage, s in self._stages.items()}
+        for s in stages.values():
+            s["escalation_rate"] = s["escalations"] / s["requests"] if s["requests"] else 0.0
+        served = {}
+        for s in stages.values():
+            for model, count in s["served_by"].items():
+                served[model] = served.get(model, 0) + count
+        return {"by_stage": stages, "served_by": served}
+
+
+stats = CascadeStats()
+
+
+def run(stage: str, call, check, models, recorder: CascadeStats = stats):
+    """Essaie `call(modèle)` jusqu'à ce que `check` ne signale rien ; retourne (sortie, modèle, escalades)."""
+    escalations = []
+    for position, tier in enumerate(models):
+        last = position == len(models) - 1
+        try:
+            output = call(model_for(tier))
+        except Exception as e:
+            if last:
+                recorder.record(stage, tier, escalations)
+                raise
+            escalations.append([f"error:{type(e).__name__}"])
+            metrics.count_retry(reason="escalation")
+            continue
+        reasons = [] if last else check(output)
+        if not reasons:
+            recorder.record(stage, tier, escalations)
+            return output, tier, escalations
+        escalations.append(reasons)
+        metrics.count_retry(reason="escalation")
+    raise ValueError(f"aucun modèle configuré pour l'étape {stage!r}")
@@ -0,0 +1,92 @@
+"""
+Catalogue partagé des recettes, de la nutrition et du frigo (Partie 4) : data/ lu une fois,
+indexé sur une clé normalisée ; les fiches sont retournées en copie.
+"""
+import copy
+import json
+import os
+import re
+import threading
+
+from matching import fold
+
+DATA_DIR = os.getenv("CHEFBOT_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+
+def normalize_key(name: str) -> str:
+    return re.sub(r"\s+", " ", fold(name).strip())
+
+
+def _load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Catalog:
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        self._recipes = None
+        self._nutrition = None
+        self._fridge = None
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    @property
+    def recipes(self) -> dict:
+        if self._recipes is None:
+            with self._lock:
+                if self._recipes is None:
+                    raw = _load_json(self._path("recipes.json"))
+                    self._recipes = {normalize_key(name): recipe for name, recipe in raw.items()}
+        return self._recipes
+
+    @property
+    def nutrition(self) -> dict:
+        if self._nutrition is None:
+            with self._lock:
+                if self._nutrition is None:
+                    columns = _load_json(self._path("nutrition.json"))
+                    names = columns.pop("ingredient")
+                    records = {}
+                    for row, name in enumerate(names):
+                        records[normalize_key(name)] = {
+                            field: values[row] for field, values in columns.items() if values[row] is not None
+                        }
+                    self._nutrition = records
+        return self._nutrition
+
+    @property
+    def fridge(self) -> list:
+        if self._fridge is None:
+            with self._lock:
+                if self._fridge is None:
+                    self._fridge = _load_json(self._path("fridge.json"))
+        return list(self._fridge)
+
+    def update_fridge(self, items: list, persist: bool = False):
+        """Remplace le frigo ; émettre ensuite "fridge_update" aux sessions qui mémoïsent check_fridge."""
+        with self._lock:
+            self._fridge = list(items)
+            if persist:
+                with open(self._path("fridge.json"), "w", encoding="utf-8") as f:
+                    json.dump(self._fridge, f, ensure_ascii=False)
+
+    def get_recipe(self, dish_name: str):
+        return copy.deepcopy(self.recipes.get(normalize_key(dish_name)))
+
+    def get_nutrition(self, ingredient: str):
+        return copy.deepcopy(self.nutrition.get(normalize_key(ingredient)))
+
+
+_catalog = None
+
+
+def get_catalog() -> Catalog:
+    """Catalogue du processus, créé au premier appel."""
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog()
+    return _catalog
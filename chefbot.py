@@ -1,46 +1,312 @@
+import contextvars
 import json
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
-from groq import Groq
-from langfuse import observe, get_client
+
+import cascade
+import metrics
+import registry
+import structured
+import tracing
+from cache import cacheable, make_key
+from evaluation import run_local_evaluation
+from judge import MicroBatcher, batch_prompt, is_complete, judge_key, parse_batch, single_prompt
+from matching import compile_expectations
+from registry import observe
+from step_executor import DEFAULT_CONTEXT_BUDGET, normalize_plan, run_steps
+from streaming import astream_chat, cached_stream, new_stats, stream_chat
 
 #Chargement des variables d'environnement
 load_dotenv()
 
-#Configuration Langfuse (optionnel si déjà dans .env)
-os.environ["LANGFUSE_PUBLIC_KEY"] = os.getenv("LANGFUSE_PUBLIC_KEY")
-os.environ["LANGFUSE_SECRET_KEY"] = os.getenv("LANGFUSE_SECRET_KEY")
+#Configuration Langfuse : les clés viennent du .env ; absentes (CI, replay hors-ligne), rien n'est
+#copié (os.environ n'accepte pas None)
 os.environ["LANGFUSE_HOST"] = "https://cloud.langfuse.com/"
 
-#Initialisation explicite du client Langfuse
-langfuse = get_client()
+#Clients Groq et Langfuse construits au premier usage (registry.py) : importer chefbot pour une
+#seule fonction ne charge ni ne connecte les SDK. Remplacement : registry.override("groq", ...)
+def _groq():
+    return registry.get("groq")
+
+
+def _async_groq():
+    return registry.async_groq()
+
+
+def _langfuse():
+    return registry.get("langfuse")
+
+
+#Cache des réponses (mémoire + SQLite), partagé par tous les appels de ce module ; comme les
+#clients, créé au premier usage (importer chefbot n'écrit aucun fichier)
+def _response_cache():
+    return registry.get("response_cache")
+
+
+_LAZY_ATTRIBUTES = {"client": "groq", "langfuse": "langfuse", "response_cache": "response_cache"}
+
+
+def __getattr__(name):
+    # chefbot.client, chefbot.async_client (dans une boucle asyncio), chefbot.langfuse et
+    # chefbot.response_cache restent disponibles
+    if name == "async_client":
+        return registry.async_groq()
+    if name in _LAZY_ATTRIBUTES:
+        return registry.get(_LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+MODEL = "llama-3.3-70b-versatile"
+
+
+# Plan, étapes et synthèse : température basse explicite, réponses stables donc mises en cache
+# (sans température, Groq échantillonne à 1.0 et la réponse n'est pas mise en cache)
+PIPELINE_TEMPERATURE = 0.2
+
+
+def _cacheable(params: dict) -> bool:
+    return cacheable(params.get("temperature"))
+
+
+#Consommation de tokens, comptabilisée par bloc `with track_usage()` (partagée avec les threads
+#lancés depuis le bloc via copy_context)
+_usage = contextvars.ContextVar("chefbot_usage", default=None)
+_usage_lock = threading.Lock()
+
+
+@contextmanager
+def track_usage():
+    """Comptabilise les tokens des appels Groq effectués dans le bloc."""
+    totals = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    token = _usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage.reset(token)
 
-#Client Groq
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+def _record_usage(completion=None):
+    totals = _usage.get()
+    if totals is None:
+        return
+    with _usage_lock:
+        if completion is None:
+            totals["cache_hits"] += 1
+            return
+        totals["calls"] += 1
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            totals["prompt_tokens"] += usage.prompt_tokens or 0
+            totals["completion_tokens"] += usage.completion_tokens or 0
+
+
+# Latence, tokens et erreurs par fonction et par modèle (metrics.py), tokens du `track_usage` courant
+def _create(model: str, messages: list, function: str = None, **params):
+    with metrics.track(model, function) as call:
+        completion = call["response"] = _groq().chat.completions.create(model=model, messages=messages, **params)
+    _record_usage(completion)
+    return completion
+
+
+async def _acreate(model: str, messages: list, function: str = None, **params):
+    with metrics.track(model, function) as call:
+        completion = call["response"] = await _async_groq().chat.completions.create(
+            model=model, messages=messages, **params)
+    _record_usage(completion)
+    return completion
+
+
+def _record_cached(model: str, function: str = None):
+    _record_usage()
+    with metrics.track(model, function) as call:
+        call["cached"] = True
+
+
+def _chat(messages: list, model: str = MODEL, use_cache: bool = True, validate=None, **params) -> str:
+    """
+    Appel Groq avec cache de réponses ; hors cache si `use_cache=False`, si la température effective
+    dépasse MAX_CACHED_TEMPERATURE ou si `validate(content)` lève une exception.
+    """
+    key = make_key(model, messages, **params)
+    use_cache = use_cache and _cacheable(params)
+    if use_cache:
+        cached = _response_cache().get(key)
+        if cached is not None:
+            _record_cached(model)
+            return cached["content"]
+
+    content = _create(model, messages, **params).choices[0].message.content
+
+    if use_cache:
+        try:
+            if validate is not None:
+                validate(content)
+        except Exception:
+            return content
+        _response_cache().set(key, {"content": content})
+    return content
+
+
+def _record_stream(function: str, model: str, stats: dict, error: str = None):
+    """Métriques d'un flux terminé (le générateur s'exécute hors du contexte de son appelant)."""
+    if metrics.enabled():
+        generation_s = (stats["duration_s"] or 0.0) - (stats["ttft_s"] or 0.0)
+        metrics.metrics.record_call(function, model, stats["duration_s"] or 0.0,
+                                    completion_tokens=stats["tokens"], error=error,
+                                    cached=stats["cached"], generation_s=generation_s)
+
+
+def _chat_stream(messages: list, model: str = MODEL, use_cache: bool = True, stats: dict = None,
+                 function: str = None, **params):
+    """Variante streaming de _chat : morceaux de texte au fil du flux, réponse mise en cache à la fin."""
+    stats = new_stats() if stats is None else stats
+    function = function or metrics.current_function()
+    key = make_key(model, messages, **params)
+    use_cache = use_cache and _cacheable(params)
+    cached = _response_cache().get(key) if use_cache else None
+
+    if cached is not None:
+        yield from cached_stream(cached["content"], stats)
+    else:
+        parts = []
+        try:
+            for delta in stream_chat(_groq(), messages, model, stats, **params):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            _record_stream(function, model, stats, error=type(e).__name__)
+            raise
+        if use_cache:
+            _response_cache().set(key, {"content": "".join(parts)})
+    _record_stream(function, model, stats)
+
+    tracing.update_current_span(metadata={"stream": stats})
+
+
+async def _achat_stream(messages: list, model: str = MODEL, use_cache: bool = True, stats: dict = None,
+                        function: str = None, **params):
+    """Équivalent asynchrone de _chat_stream (client AsyncGroq)."""
+    stats = new_stats() if stats is None else stats
+    function = function or metrics.current_function()
+    key = make_key(model, messages, **params)
+    use_cache = use_cache and _cacheable(params)
+    cached = _response_cache().get(key) if use_cache else None
+
+    if cached is not None:
+        for delta in cached_stream(cached["content"], stats):
+            yield delta
+    else:
+        parts = []
+        try:
+            async for delta in astream_chat(_async_groq(), messages, model, stats, **params):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            _record_stream(function, model, stats, error=type(e).__name__)
+            raise
+        if use_cache:
+            _response_cache().set(key, {"content": "".join(parts)})
+    _record_stream(function, model, stats)
+
+    tracing.update_current_span(metadata={"stream": stats})
 
 # -----------------------------------------------------------------------
 # --- PARTIE 1 : PREMIER CONTACT ---
+
+CHEF_SYSTEM_PROMPT = (
+    "Tu es ChefBot, un chef cuisinier français spécialisé en cuisine de saison. "
+    "Tu es concis, professionnel et passionné. Ton objectif est de valoriser les produits frais du moment et de donner des conseils techniques précis."
+)
+
 @observe(name="ask_chef")
-def ask_chef(question: str, temperature: float = 0.7) -> str:
+def ask_chef(question: str, temperature: float = 0.7, use_cache: bool = True) -> str:
     """
     Appel LLM + monitoring Langfuse et température variable.
+    Une question proche d'une question déjà posée (cache sémantique) ne rappelle pas Groq.
     """
-
-    system_prompt = (
-        "Tu es ChefBot, un chef cuisinier français spécialisé en cuisine de saison. "
-        "Tu es concis, professionnel et passionné. Ton objectif est de valoriser les produits frais du moment et de donner des conseils techniques précis."
-    )
-
-    completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ],
-        temperature=temperature,
-    )
-
-    return completion.choices[0].message.content
+    cached = _semantic_lookup(question, temperature) if use_cache else None
+    if cached is not None:
+        return cached
+
+    answer = _chat(_chef_messages(question), temperature=temperature, use_cache=use_cache)
+    if use_cache:
+        _semantic_cache().set(question, answer, temperature, scope=_chef_scope(temperature))
+    return answer
+
+
+#Cache sémantique des questions (semantic_cache.py), créé au premier usage (import de numpy
+#différé) ; les réponses d'un autre modèle, d'un autre prompt système ou d'une autre température
+#ne sont jamais servies
+def _semantic_cache():
+    def factory():
+        from semantic_cache import SemanticCache
+        return SemanticCache()
+    return registry.get_or_create("semantic_cache", factory)
+
+
+@lru_cache(maxsize=32)
+def _chef_scope(temperature: float = None) -> int:
+    from semantic_cache import scope_key, temperature_band
+    return scope_key(MODEL, CHEF_SYSTEM_PROMPT, temperature_band(temperature))
+
+
+def _semantic_lookup(question: str, temperature: float):
+    cache = _semantic_cache()
+    hit = cache.get(question, temperature, scope=_chef_scope(temperature))
+    if hit is None:
+        return None
+    answer, similarity, cached_question = hit
+    _record_usage()
+    with metrics.track(MODEL) as call:
+        call["cached"] = True
+    tracing.update_current_span(metadata={"semantic_cache": {
+        "similarity": round(similarity, 3), "cached_question": cached_question,
+        "hit_rate": cache.hit_rate(),
+    }})
+    return answer
+
+
+def _chef_messages(question: str) -> list:
+    return [
+        {"role": "system", "content": CHEF_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ]
+
+
+@observe(name="ask_chef_stream")
+def ask_chef_stream(question: str, temperature: float = 0.7, use_cache: bool = True, stats: dict = None):
+    """Variante streaming de ask_chef : générateur de morceaux de texte."""
+    cached = _semantic_lookup(question, temperature) if use_cache else None
+    if cached is not None:
+        yield from cached_stream(cached, stats)
+        return
+    parts = []
+    for delta in _chat_stream(_chef_messages(question), temperature=temperature, use_cache=use_cache, stats=stats,
+                              function="ask_chef_stream"):
+        parts.append(delta)
+        yield delta
+    if use_cache:
+        _semantic_cache().set(question, "".join(parts), temperature, scope=_chef_scope(temperature))
+
+
+@observe(name="ask_chef_astream")
+async def ask_chef_astream(question: str, temperature: float = 0.7, use_cache: bool = True, stats: dict = None):
+    """Variante streaming asynchrone de ask_chef (async for)."""
+    cached = _semantic_lookup(question, temperature) if use_cache else None
+    if cached is not None:
+        for delta in cached_stream(cached, stats):
+            yield delta
+        return
+    parts = []
+    async for delta in _achat_stream(_chef_messages(question), temperature=temperature,
+                                     use_cache=use_cache, stats=stats, function="ask_chef_astream"):
+        parts.append(delta)
+        yield delta
+    if use_cache:
+        _semantic_cache().set(question, "".join(parts), temperature, scope=_chef_scope(temperature))
 
 
 @observe(name="run_partie_1")
@@ -48,7 +314,7 @@ def run_temperature_tests():
     """1.3 - Jouez avec la temperature"""
 
     # Ajout tags et metadata à la trace courante
-    langfuse.update_current_trace(
+    tracing.update_current_trace(
         tags=["Partie 1", "Groupe_Natalène_Yacine"],
         metadata={"experiment": "temperature_variation"}
     )
@@ -64,6 +330,7 @@ def run_temperature_tests():
 
 
 # if __name__ == "__main__":
+#     tracing.init()
 #     run_temperature_tests()
 
 #     #  Envoi effectif des traces à Langfuse
@@ -97,53 +364,78 @@ soit comparer plusieurs générations par température pour constater les diffé
 # -----------------------------------------------------------------------
 # --- PARTIE 2 : LE CHEF QUI RÉFLÉCHIT ---
 
+def _validate_plan(parsed):
+    # Validation métier
+    if not isinstance(parsed, dict) or "etapes" not in parsed:
+        raise ValueError("JSON structure invalid: missing 'etapes'")
+
+
+def _parse_plan(content: str) -> dict:
+    """Parse (avec réparation locale) et valide la réponse du planificateur (lève une exception si invalide)."""
+    parsed, _ = structured.parse(content, _validate_plan, stats=None)
+    return parsed
+
+
 @observe(name="get_plan")
-def get_plan(constraints: str):
+def get_plan(constraints: str, use_cache: bool = True, model: str = MODEL, attempts: int = 2):
     """2.1 : Planificateur de menu (décomposition en étapes)"""
     prompt = f"""Analyse ces contraintes : {constraints}.
             Décompose la création d'un menu de semaine en 3 étapes distinctes.
+            Pour chaque étape, indique dans "depend_de" les numéros (à partir de 0) des étapes
+            dont elle a besoin du résultat ; laisse la liste vide si l'étape est indépendante.
             Réponds UNIQUEMENT en JSON avec le format suivant:
-            {{"etapes": ["etape1", "etape2", "etape3"]}}"""
+            {{"etapes": [{{"nom": "etape1", "depend_de": []}}, {{"nom": "etape2", "depend_de": []}}, {{"nom": "etape3", "depend_de": [0, 1]}}]}}"""
 
 #            TEST ERREUR JSON :
 #            Ne décompose pas le menu de la semaine.
 #            Ne réponds pas en JSON, juste en texte brut selon ce format : etapes = 
 
-    for attempt in range(2):
-        try:
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-
-            parsed = json.loads(completion.choices[0].message.content)
+    # Schéma imposé si le modèle le supporte ; une réponse presque valide est réparée
+    # localement (structured.py) : le retry n'a lieu que si la réparation échoue
+    response_format = structured.response_format(model, "plan", structured.PLAN_SCHEMA)
 
-            # Validation métier
-            if not isinstance(parsed, dict) or "etapes" not in parsed:
-                raise ValueError("JSON structure invalid: missing 'etapes'")
+    for attempt in range(attempts):
+        content = None
+        try:
+            try:
+                # Seule une réponse valide (éventuellement après réparation) est mise en cache ;
+                # le retry repart toujours de Groq
+                content = _chat(
+                    [{"role": "user", "content": prompt}],
+                    model=model,
+                    response_format=response_format,
+                    temperature=PIPELINE_TEMPERATURE,
+                    use_cache=use_cache and attempt == 0,
+                    validate=_parse_plan,
+                )
+            except Exception as e:
+                # Groq rejette un JSON invalide mais renvoie le texte généré : on tente de le réparer
+                content = structured.failed_generation(e)
+                if content is None:
+                    raise
+                structured.metrics.count("recovered_generations")
 
-            return parsed
+            plan, repairs = structured.parse(content, _validate_plan)
+            tracing.update_current_span(metadata={"attempt": attempt + 1, "json_repairs": repairs})
+            return plan
 
         except Exception as e:   # capture TOUT
-            try:
-                langfuse.event(
-                    name="json_parsing_error",
-                    level="ERROR",
-                    input=completion.choices[0].message.content if 'completion' in locals() else None,
-                    metadata={
-                        "error": str(e),
-                        "attempt": attempt + 1,
-                        "function": "get_plan"
-                    }
-                )
-                langfuse.flush()
-            except Exception:
-                print("Langfuse logging failed")
-                print("Original error:", e)
+            # Événement exporté en arrière-plan : pas de flush sur le chemin de la requête
+            tracing.event(
+                name="json_parsing_error",
+                level="ERROR",
+                input=content,
+                metadata={
+                    "error": str(e),
+                    "attempt": attempt + 1,
+                    "function": "get_plan"
+                }
+            )
 
-            if attempt == 1:
+            if attempt == attempts - 1:
                 raise
+            structured.metrics.count("retries")
+            metrics.count_retry("get_plan", "invalid_json")
 
     # 
     raise RuntimeError("get_plan failed after retry — no valid JSON returned")
@@ -151,51 +443,137 @@ def get_plan(constraints: str):
 
 
 @observe(name="execute_step")
-def execute_step(step_name: str, context: str):
+def execute_step(step_name: str, context: str, use_cache: bool = True, model: str = MODEL):
     """2.2 : Planificateur de menu (exécution d'une étape)"""
-    completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
+    return _chat(
+        [
             {"role": "system", "content": f"Contexte actuel : {context}"},
             {"role": "user", "content": f"Etape suivante : {step_name}"}
-        ]
+        ],
+        model=model,
+        temperature=PIPELINE_TEMPERATURE,
+        use_cache=use_cache,
+    )
+
+
+#Cascade de modèles (cascade.py) : chaque étape passe d'abord par le petit modèle et n'est
+#refaite avec le 70b que si la vérification locale (rule_evaluator) signale la sortie
+def _plan_cascaded(constraints: str, routes: dict, use_cache: bool) -> dict:
+    final = cascade.model_for(routes["plan"][-1])
+    plan, _, _ = cascade.run(
+        "plan",
+        # Un seul essai par modèle intermédiaire : l'escalade remplace le retry
+        lambda model: get_plan(constraints, use_cache=use_cache, model=model,
+                               attempts=2 if model == final else 1),
+        lambda plan: [] if normalize_plan(plan) else ["empty_plan"],
+        routes["plan"],
     )
-    return completion.choices[0].message.content
+    return plan
+
+
+def _step_runner(routes: dict, expectations: dict, use_cache: bool):
+    def run(step, context):
+        output, _, _ = cascade.run(
+            "step",
+            lambda model: execute_step(step, context, use_cache=use_cache, model=model),
+            lambda output: cascade.check_output(output, expectations, evaluate=rule_evaluator),
+            routes["step"],
+        )
+        return output
+    return run
 
 
 @observe(name="plan_weekly_menu")
-def plan_weekly_menu(constraints: str) -> str:
-    """Fonction principale de la Partie 2"""
+def plan_weekly_menu(constraints: str, use_cache: bool = True,
+                     context_budget: int = DEFAULT_CONTEXT_BUDGET, max_workers: int = 4,
+                     routing: dict = None, expected: dict = None) -> str:
+    """Fonction principale de la Partie 2 ; `routing` : modèles par étape (voir cascade.py)."""
+    routes = cascade.routing(routing)
+    expectations = cascade.expectations_for(constraints, expected)
 
     # 1. Planification
-    plan = get_plan(constraints)
-
-    # 2. Exécution des étapes
-    results = []
-    current_context = f"Contraintes accumulées : {constraints}"
-
-    for step in plan.get("etapes", []):
-        res = execute_step(step, current_context)
-        results.append(res)
-        current_context += f"\n{res}"
-
-    # 3. Synthèse finale
-    completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": "Tu es un créateur de menus."},
-            {"role": "user", "content": f"Assemble le tout en un menu cohérent : {' '.join(results)}"}
-        ]
+    plan = _plan_cascaded(constraints, routes, use_cache)
+
+    # 2. Exécution des étapes : les étapes indépendantes tournent en parallèle et chacune
+    #    ne reçoit que les sorties dont elle dépend, dans la limite de `context_budget` tokens
+    results = run_steps(
+        normalize_plan(plan),
+        _step_runner(routes, expectations, use_cache),
+        constraints,
+        budget=context_budget,
+        max_workers=max_workers,
     )
 
-    return completion.choices[0].message.content
+    # 3. Synthèse finale : le menu complet doit aussi contenir les éléments requis
+    with metrics.function("synthesis"):
+        menu, tier, escalations = cascade.run(
+            "synthesis",
+            lambda model: _chat(_synthesis_messages(results), model=model, temperature=PIPELINE_TEMPERATURE,
+                                use_cache=use_cache),
+            lambda output: cascade.check_output(output, expectations, require_included=True,
+                                                evaluate=rule_evaluator),
+            routes["synthesis"],
+        )
+    tracing.update_current_span(metadata={"synthesis_model": tier, "synthesis_escalations": escalations})
+    return menu
+
+
+def _synthesis_messages(results: list) -> list:
+    return [
+        {"role": "system", "content": "Tu es un créateur de menus."},
+        {"role": "user", "content": f"Assemble le tout en un menu cohérent : {' '.join(results)}"}
+    ]
+
+
+@observe(name="plan_weekly_menu_stream")
+def plan_weekly_menu_stream(constraints: str, use_cache: bool = True,
+                            context_budget: int = DEFAULT_CONTEXT_BUDGET, max_workers: int = 4,
+                            stats: dict = None, routing: dict = None):
+    """Variante streaming de plan_weekly_menu : événements {"type": "step", ...} puis {"type": "token", ...}."""
+    routes = cascade.routing(routing)
+    plan = _plan_cascaded(constraints, routes, use_cache)
+
+    # Les étapes tournent dans un thread ; leurs résultats remontent par une file
+    events = queue.Queue()
+    outcome = {}
+
+    def worker():
+        try:
+            outcome["results"] = run_steps(
+                normalize_plan(plan),
+                _step_runner(routes, cascade.expectations_for(constraints), use_cache),
+                constraints,
+                budget=context_budget,
+                max_workers=max_workers,
+                on_result=lambda step, res: events.put(
+                    {"type": "step", "id": step["id"], "nom": step["nom"], "content": res}
+                ),
+            )
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(None)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+    thread.start()
+    while (event := events.get()) is not None:
+        yield event
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+
+    synthesis_model = cascade.model_for(routes["synthesis"][-1])
+    for delta in _chat_stream(_synthesis_messages(outcome["results"]), model=synthesis_model,
+                              temperature=PIPELINE_TEMPERATURE, use_cache=use_cache, stats=stats,
+                              function="synthesis"):
+        yield {"type": "token", "content": delta}
 
 @observe(name="run_partie_2")
 def run_tests():
     """Test Partie 2"""
 
     # Tags spécifiques à la partie 2
-    langfuse.update_current_trace(
+    tracing.update_current_trace(
         tags=["Partie 2", "Groupe_Natalène_Yacine"],
         metadata={"experiment": "menu_planner"}
     )
@@ -205,6 +583,7 @@ def run_tests():
     print(menu)
 
 # if __name__ == "__main__":
+#     tracing.init()
 #     run_tests()
 #     langfuse.flush()
 #     print("\nTraces envoyées à Langfuse.")
@@ -219,20 +598,9 @@ def rule_evaluator(**kwargs) -> dict:
     output = kwargs.get("output", "")
     expected = kwargs.get("expected_output", {})
 
-    output_lower = output.lower()
-    scores = {}
-    
-    # Interdits
-    must_avoid = expected.get("must_avoid", [])
-    found_forbidden = [i for i in must_avoid if i.lower() in output_lower]
-    scores["no_forbidden"] = 1.0 if not found_forbidden else 0.0
-    
-    # Requis
-    must_include = expected.get("must_include", [])
-    found_included = [i for i in must_include if i.lower() in output_lower]
-    scores["included_ratio"] = len(found_included) / len(must_include) if must_include else 1.0
-    
-    return scores
+    # Interdits (no_forbidden) et requis (included_ratio) en une passe, sur texte normalisé
+    # (accents, casse, pluriels) ; le matcher est compilé une fois par jeu d'attentes
+    return compile_expectations(expected).score(output)
 
 @observe(name="llm_judge")
 def llm_judge(**kwargs) -> dict:
@@ -242,46 +610,117 @@ def llm_judge(**kwargs) -> dict:
     output = kwargs.get("output", "")
     expected = kwargs.get("expected_output", {})
 
-    prompt = f"""Note ce menu (0.0 à 1.0) selon :
-    1. Pertinence (respect de {question})
-    2. Créativité
-    3. Praticité
-    Réponds uniquement en JSON : {{"pertinence": 0, "creativite": 0, "praticite": 0}}
-    Menu : {output}"""
-    
-    completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_object"}
-    )
-    return json.loads(completion.choices[0].message.content)
+    return llm_judge_batch([{"question": question, "output": output, "expected": expected}])[0]
+
+
+@observe(name="llm_judge_batch")
+def llm_judge_batch(items: list, batch_size: int = 8, use_cache: bool = True) -> list:
+    """Note plusieurs menus ({"question", "output", "expected"}) par lots de `batch_size`, avec cache des notes."""
+    results = [None] * len(items)
+    keys = [judge_key(item["question"], item["output"], MODEL, item.get("expected")) for item in items]
+
+    todo = []
+    for i, key in enumerate(keys):
+        cached = _response_cache().get(key) if use_cache else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            todo.append(i)
+
+    # Deux passes au plus : la seconde ne concerne que les menus mal notés à la première
+    for attempt in range(2):
+        incomplete = []
+        for start in range(0, len(todo), batch_size):
+            chunk = todo[start:start + batch_size]
+            batch = [items[i] for i in chunk]
+            prompt = (single_prompt(batch[0]["question"], batch[0]["output"], batch[0].get("expected"))
+                      if len(batch) == 1 else batch_prompt(batch))
+            content = _chat(
+                [{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                use_cache=False,
+            )
+            parsed = parse_batch(content, len(batch))
+            for position, i in enumerate(chunk):
+                scores = parsed.get(position, {})
+                if results[i]:
+                    scores = {**results[i], **scores}   # on complète la première passe
+                results[i] = scores
+                if is_complete(scores):
+                    if use_cache:
+                        _response_cache().set(keys[i], scores)
+                else:
+                    incomplete.append(i)
+        todo = incomplete
+        if not todo:
+            break
+        if attempt == 0:
+            metrics.count_retry("llm_judge_batch", "incomplete_scores")
+
+    if todo:
+        tracing.update_current_span(metadata={"incomplete_items": todo})
+    return [r or {} for r in results]
+
+
+def _judge_process(items: list):
+    # Tokens du lot comptés à part, puis répartis entre les soumetteurs par _charge_usage
+    with track_usage() as usage:
+        results = llm_judge_batch(items)
+    return results, usage
+
+
+def _charge_usage(usage: dict, index: int, n: int):
+    """Part `index` sur `n` de la consommation d'un lot, ajoutée au `track_usage` courant."""
+    totals = _usage.get()
+    if totals is None:
+        return
+    with _usage_lock:
+        for key, value in usage.items():
+            totals[key] += value // n + (1 if index < value % n else 0)
+
+
+#Regroupe les appels concurrents du runner d'évaluation en requêtes batch
+_judge_batcher = MicroBatcher(_judge_process, batch_size=8, max_wait=0.2, charge=_charge_usage)
+
+
+def llm_judge_batched(**kwargs) -> dict:
+    """Évaluateur compatible avec llm_judge, mais mutualisé entre les workers d'évaluation."""
+    return _judge_batcher.submit({"question": kwargs.get("input", ""), "output": kwargs.get("output", ""),
+                                  "expected": kwargs.get("expected_output", {})})
 
 @observe(name="run_partie_3")
-def run_evaluation():
+def run_evaluation(workers: int = 8, checkpoint_path: str = "eval_checkpoint.jsonl"):
     """3.4 - Lancer l'expérience"""
 
     # Tags spécifiques à la partie 3
-    langfuse.update_current_trace(
+    tracing.update_current_trace(
         tags=["Partie 3", "Groupe_Natalène_Yacine"],
         metadata={"experiment": "menu_evaluation"}
     )
     
-    my_dataset = langfuse.get_dataset("chefbot-menu-eval-Natalène_Yacine")
+    my_dataset = _langfuse().get_dataset("chefbot-menu-eval-Natalène_Yacine")
     print("\n--- EVALUATION ---")
 
     
-    # Liste des items
-    langfuse.run_experiment(
-        name="Partie 3 Natalène_Yacine",
-        data=my_dataset.items,
+    # Runner local : pool de workers + checkpoint pour reprendre une exécution interrompue
+    summary = run_local_evaluation(
+        my_dataset.items,
         task=lambda input: plan_weekly_menu(input["constraints"]),
         evaluators=[
             rule_evaluator,
-            llm_judge
-        ]
+            llm_judge_batched
+        ],
+        workers=workers,
+        checkpoint_path=checkpoint_path,
+        track_usage=track_usage,
     )
 
+    tracing.update_current_trace(metadata={"experiment": "menu_evaluation", "summary": summary})
+    print(f"\nRésumé : {json.dumps(summary, ensure_ascii=False, indent=2)}")
+    return summary
+
 # if __name__ == "__main__":
+#     tracing.init()
 #     run_evaluation()
 #     langfuse.flush()
 #     print("\nTraces envoyées à Langfuse.")
@@ -297,6 +736,9 @@ Nous avons une erreur d'appel de la fonction lambda dans run_experiment :
 elle reçoit un argument 'item' alors que nous avons défini 'input'.
 
 Nous avons cherché ensemble la source de l'erreur, sans résultats le jour J.
+
+Depuis, run_experiment est remplacé par notre propre runner (evaluation.py) : la tâche
+reçoit directement l'input de l'item, ce qui contourne le problème.
 """
 
 
@@ -0,0 +1,190 @@
+"""
+Mémoire de conversation bornée en tokens (Parties 4 et 5) : faits épinglés renvoyés à chaque
+requête, anciens résultats d'outils puis anciens tours repliés dans un résumé glissant.
+"""
+import re
+from functools import lru_cache
+
+from step_executor import estimate_tokens, truncate_to_tokens
+
+DEFAULT_MEMORY_BUDGET = 2000   # tokens par requête (hors réponse)
+SUMMARY_BUDGET = 300
+EVICTED_TOOL_RESULT = "[résultat d'outil retiré de l'historique]"
+
+# Faits épinglés : motif -> catégorie. Un fait plus récent de même catégorie remplace l'ancien
+# (sauf pour les contraintes alimentaires, qui s'accumulent).
+PINNED_PATTERNS = [
+    ("budget", re.compile(r"budget[^.\n]{0,20}?\d+(?:[.,]\d+)?\s*(?:€|euros?)", re.I)),
+    ("convives", re.compile(r"\b\d+\s+(?:personnes|convives|invités)\b", re.I)),
+    ("contraintes", re.compile(
+        r"\b(?:sans\s+[a-zàâçéèêëîïôûù]+|allergiques?\s+(?:aux?|à\s+la|à\s+l'|au)\s*[a-zàâçéèêëîïôûù]+(?:\s+(?:à|a|de)\s+[a-zàâçéèêëîïôûù]+)?"
+        r"|intol[ée]rants?\s+(?:aux?|à\s+la|au)\s*[a-zàâçéèêëîïôûù]+|v[ée]g[ée]tariens?|v[ée]gans?)\b",
+        re.I)),
+]
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    # Chargé au premier comptage : l'encodage tiktoken peut nécessiter un téléchargement
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:   # tiktoken absent ou encodage indisponible hors-ligne
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def extract_facts(text: str) -> dict:
+    """Faits à épingler trouvés dans un message utilisateur : {catégorie: [faits]}."""
+    facts = {}
+    for category, pattern in PINNED_PATTERNS:
+        found = [re.sub(r"\s+", " ", m.group(0).strip()) for m in pattern.finditer(text or "")]
+        if found:
+            facts[category] = found
+    return facts
+
+
+def _field(message, name):
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+
+def message_tokens(message) -> int:
+    """Tokens d'un message (dict ou objet du SDK), appels d'outils compris."""
+    tokens = 4 + count_tokens(_field(message, "content") or "")
+    for call in _field(message, "tool_calls") or []:
+        function = _field(call, "function")
+        tokens += count_tokens(_field(function, "name") or "") + count_tokens(_field(function, "arguments") or "")
+    return tokens
+
+
+def default_summarizer(summary: str, turn: list) -> str:
+    """Résumé extractif local (sans appel LLM) : question et réponse finale, abrégées."""
+    question = next((_field(m, "content") for m in turn if _field(m, "role") == "user"), "") or ""
+    answer = next((_field(m, "content") for m in reversed(turn)
+                   if _field(m, "role") == "assistant" and _field(m, "content")), "") or ""
+    line = f"- Q : {truncate_to_tokens(question, 40)}"
+    if answer:
+        line += f" / R : {truncate_to_tokens(answer, 60)}"
+    return f"{summary}\n{line}".strip()
+
+
+class ConversationMemory:
+    """Historique découpé en tours ; `budget` en tokens par requête, `keep_turns` tours jamais résumés."""
+
+    def __init__(self, budget: int = DEFAULT_MEMORY_BUDGET, keep_turns: int = 1,
+                 summarizer=None, summary_budget: int = SUMMARY_BUDGET):
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.summarizer = summarizer or default_summarizer
+        self.summary_budget = summary_budget
+        self.summary = ""
+        self.pinned = {}
+        self.turns = []   # [[{"message": ..., "tokens": n}, ...], ...]
+        self.stats = {"evicted_tool_results": 0, "summarized_turns": 0}
+
+    # --- Alimentation ---
+
+    def pin(self, category: str, fact: str):
+        facts = self.pinned.setdefault(category, [])
+        if category == "contraintes":
+            if fact.lower() not in (f.lower() for f in facts):
+                facts.append(fact)
+        else:
+            facts[:] = [fact]
+
+    def add_user(self, text: str):
+        """Démarre un nouveau tour ; les faits importants du message sont épinglés."""
+        for category, facts in extract_facts(text).items():
+            for fact in facts:
+                self.pin(category, fact)
+        self.turns.append([])
+        self.add({"role": "user", "content": text})
+
+    def add(self, message):
+        if not self.turns:
+            self.turns.append([])
+        self.turns[-1].append({"message": message, "tokens": message_tokens(message)})
+
+    def add_turn(self, question: str, answer: str):
+        self.add_user(question)
+        self.add({"role": "assistant", "content": str(answer)})
+
+    # --- Restitution ---
+
+    def context_text(self) -> str:
+        """Faits épinglés et résumé, sous forme de texte (vide s'il n'y a rien)."""
+        parts = []
+        if self.pinned:
+            facts = "; ".join(f"{category} : {', '.join(values)}" for category, values in self.pinned.items())
+            parts.append(f"Informations à respecter : {facts}")
+        if self.summary:
+            parts.append(f"Résumé des échanges précédents :\n{self.summary}")
+        return "\n".join(parts)
+
+    def total_tokens(self, system: str = "") -> int:
+        return (count_tokens(system) + count_tokens(self.context_text())
+                + sum(e["tokens"] for turn in self.turns for e in turn))
+
+    def _fit(self, system: str):
+        # 1. Résultats d'outils des tours précédents, puis du tour courant (plus ancien d'abord) ;
+        #    les derniers résultats, pas encore lus par le modèle, sont conservés
+        pending = set()
+        if self.turns:
+            for entry in reversed(self.turns[-1]):
+                if _field(entry["message"], "role") != "tool":
+                    break
+                pending.add(id(entry))
+        for turn in self.turns:
+            for entry in turn:
+                if self.total_tokens(system) <= self.budget:
+                    return
+                message = entry["message"]
+                if (_field(message, "role") == "tool" and id(entry) not in pending
+                        and message["content"] != EVICTED_TOOL_RESULT):
+                    entry["message"] = {**message, "content": EVICTED_TOOL_RESULT}
+                    entry["tokens"] = message_tokens(entry["message"])
+                    self.stats["evicted_tool_results"] += 1
+
+        # 2. Tours les plus anciens repliés dans le résumé
+        while len(self.turns) > self.keep_turns and self.total_tokens(system) > self.budget:
+            turn = self.turns.pop(0)
+            summary = self.summarizer(self.summary, [e["message"] for e in turn])
+            # Résumé glissant : les lignes les plus anciennes sortent en premier
+            lines = summary.splitlines()
+            while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_budget:
+                lines.pop(0)
+            self.summary = truncate_to_tokens("\n".join(lines), self.summary_budget)
+            self.stats["summarized_turns"] += 1
+
+    def messages(self, system: str = None) -> list:
+        """Messages à envoyer : système (+ faits épinglés et résumé), puis tours conservés."""
+        system = system or ""
+        self._fit(system)
+        context = self.context_text()
+        content = f"{system}\n\n{context}".strip() if context else system
+        head = [{"role": "system", "content": content}] if content else []
+        return head + [e["message"] for turn in self.turns for e in turn]
+
+    def prompt(self, task: str) -> str:
+        """Tâche enrichie (faits épinglés, résumé, derniers échanges) pour les agents à chaîne unique."""
+        self.add_user(task)
+        self._fit("")
+        history = []
+        for turn in self.turns[:-1]:
+            for entry in turn:
+                message = entry["message"]
+                if _field(message, "role") in ("user", "assistant") and _field(message, "content"):
+                    history.append(f"{_field(message, 'role')} : {_field(message, 'content')}")
+        parts = [self.context_text()]
+        if history:
+            parts.append("Derniers échanges :\n" + "\n".join(history))
+        parts.append(f"Nouvelle demande : {task}")
+        return "\n\n".join(p for p in parts if p)
@@ -1,27 +1,49 @@
 from dotenv import load_dotenv
 from langfuse import observe, get_client, Evaluation
-from groq import Groq
 import json
 from datetime import datetime
 from typing import Callable
 import os
 
+import dataset_loader
+import registry
+
 load_dotenv()
 
-groq_client = Groq()
 os.environ["LANGFUSE_PUBLIC_KEY"] = os.getenv("LANGFUSE_PUBLIC_KEY")
 os.environ["LANGFUSE_SECRET_KEY"] = os.getenv("LANGFUSE_SECRET_KEY")
 os.environ["LANGFUSE_HOST"] = "https://cloud.langfuse.com/"
 
 
+def __getattr__(name):
+    # Client Groq partagé du processus (pool de connexions commun), créé au premier usage
+    if name == "groq_client":
+        return registry.get("groq")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # =============================================================================
 # CREATING DATASETS
 # =============================================================================
 
+DATASET_NAME = "chefbot-menu-eval-Natalène_Yacine"
+
+
+def load_dataset_file(source, dataset_name: str = DATASET_NAME, **kwargs) -> dict:
+    """
+    Ajoute au dataset les cas d'un fichier JSONL/CSV (ou d'une liste de cas), en flux, par lots
+    concurrents. Relançable : les cas déjà envoyés (même contenu) sont ignorés.
+    Voir dataset_loader.load_cases pour les options (batch_size, workers, retries...).
+    """
+    langfuse = registry.get("langfuse")
+    kwargs.setdefault("manifest", dataset_loader.manifest_path(dataset_name))
+    return dataset_loader.load_cases(source, dataset_name, langfuse.create_dataset_item, **kwargs)
+
+
 def create_chefbot_menu_eval():
-    dataset_name = "chefbot-menu-eval-Natalène_Yacine"
+    dataset_name = DATASET_NAME
 
-    dataset = get_client().create_dataset(
+    dataset = registry.get("langfuse").create_dataset(
         name=dataset_name,
         description="dataset for ChefBot menu",
         metadata={
@@ -53,16 +75,20 @@ def create_chefbot_menu_eval():
         }
     ]
 
-    for i, case in enumerate(test_cases):
-        get_client().create_dataset_item(
-            dataset_name=dataset_name,
-            input=case["input"],
-            expected_output=case["expected_output"],
-        )
+    stats = load_dataset_file(test_cases, dataset_name, verbose=False)
 
-    print(f"✓ Created dataset with {len(test_cases)} test cases")
+    print(f"✓ Created dataset with {stats['uploaded'] + stats['already_uploaded']} test cases")
     return dataset
 
 
 if __name__ == "__main__":
-    create_chefbot_menu_eval()
\ No newline at end of file
+    import sys
+
+    import tracing
+    tracing.init()
+    create_chefbot_menu_eval()
+    # python create_dataset.py cas.jsonl [autres.csv ...] : ajout en masse au dataset
+    for path in sys.argv[1:]:
+        result = load_dataset_file(path)
+        for error in result["errors"]:
+            print(f"  {path}: {error}")
\ No newline at end of file
@@ -1,9 +1,16 @@
 from dotenv import load_dotenv
-from smolagents import CodeAgent, LiteLLMModel, tool, Tool, ManagedAgent
-from langfuse import observe, get_client
-import litellm
+from smolagents import tool, Tool
 import json
 
+import registry
+import tracing
+from billing import PriceBook, UnknownDishes, UnsafeExpression, build_bill, safe_eval
+from conversation import ConversationMemory
+from fanout import DEFAULT_TIMEOUT, fan_out, merge_answers
+from memo import ToolSession
+from menu_solver import DEFAULT_COURSES, Infeasible, MenuSolver
+from product_store import ProductStore, SQLiteProductStore
+from registry import observe
 from tools import check_fridge, get_recipe, check_dietary_info
 
 load_dotenv()
@@ -12,83 +19,334 @@ load_dotenv()
 # -----------------------------------------------------------------------
 # --- 5.1 - Outil de base de donnees ---
 
-# --- Langfuse tracing for LiteLLM (v3 — OpenTelemetry) ---
-litellm.callbacks = ["langfuse_otel"]
+MODEL_ID = "groq/meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+def get_model():
+    """Modèle des agents des parties 5 et 6, créé (avec le tracing LiteLLM) au premier appel."""
+    def factory():
+        # --- Langfuse tracing for LiteLLM (v3 — OpenTelemetry), sur le provider de Langfuse ---
+        tracing.instrument_litellm()
+        return registry.litellm_model(MODEL_ID)
+    return registry.get_or_create("database_tools.model", factory)
+
+
+# Agents et modèle construits au premier accès (database_tools.restaurant_agent, .manager...)
+def __getattr__(name):
+    if name == "model_llm":
+        return get_model()
+    if name == "restaurant_agent":
+        return get_restaurant_agent()
+    if name in ("nutritionist", "chef", "budget", "consult_agents", "manager"):
+        return get_empire()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-model_llm = LiteLLMModel(model_id="groq/meta-llama/llama-4-scout-17b-16e-instruct")
 class MenuDatabaseTool(Tool):
 
     name = "database_lookup"
-    description = "Look up a product by name in the database. Returns price and stock."
+    description = (
+        "Look up dishes in the restaurant database. Returns price, preparation time, allergens "
+        "and category, sorted by price and paginated. Filters can be combined. With product_name, "
+        "returns the closest dish names (accents and typos tolerated) ranked by score."
+    )
     inputs = {
         "product_name": {
             "type": "string",
-            "description": "The name of the product to look up."
+            "description": "The name (or part of the name) of the product to look up.",
+            "nullable": True
+        },
+        "categorie": {
+            "type": "string",
+            "description": "Category: petitdéjeuner, apéritif, déjeuner, dîner, entrée, dessert or boisson.",
+            "nullable": True
+        },
+        "prix_max": {
+            "type": "number",
+            "description": "Maximum price in euros.",
+            "nullable": True
+        },
+        "sans_allergene": {
+            "type": "string",
+            "description": "Allergen(s) to exclude, comma-separated (e.g. 'gluten, lait').",
+            "nullable": True
+        },
+        "page": {
+            "type": "integer",
+            "description": "Result page (10 dishes per page), starting at 1.",
+            "nullable": True
         }
     }
     output_type = "string"
 
-    def __init__(self):
+    def __init__(self, db_path: str = None, reseed: bool = False):
+        """
+        `db_path` : catalogue SQLite existant, utilisé tel quel ; les plats de démonstration ne
+        l'amorcent que s'il est vide (ou si `reseed=True`, qui remplace son contenu).
+        """
         super().__init__()
         # Simulate a database
         self.products = {
-            "omelette": {"nom": "Omelette", "prix": 15,"prep_time": 10, "allergènes": ["oeufs"],"catégorie": "petitdéjeuner"},
-            "salade césar": {"nom": "Salade César", "prix": 12,"prep_time": 15, "allergènes": ["lait", "poisson"],"catégorie": "déjeuner"},
-            "pâtes bolognaises": {"nom": "Pâtes Bolognaises", "prix": 18,"prep_time": 30, "allergènes": ["gluten"],"catégorie": "dîner"},
-            "soupe de légumes": {"nom": "Soupe de Légumes", "prix": 10,"prep_time": 20, "allergènes": [],"catégorie": "entrée"},
-            "tarte aux pommes": {"nom": "Tarte aux Pommes", "prix": 8,"prep_time": 45, "allergènes": ["gluten", "lait"],"catégorie": "dessert"},
-            "smoothie aux fruits": {"nom": "Smoothie aux Fruits", "prix": 6,"prep_time": 5, "allergènes": ["fruits"],"catégorie": "boisson"},
-            "quiche lorraine": {"nom": "Quiche Lorraine", "prix": 14,"prep_time": 25, "allergènes": ["gluten", "lait", "oeufs"],"catégorie": "déjeuner"},
-            "risotto aux champignons": {"nom": "Risotto aux Champignons", "prix": 16,"prep_time": 25, "allergènes": ["gluten", "lait"],"catégorie": "dîner"},
-            "salade de quinoa": {"nom": "Salade de Quinoa", "prix": 12,"prep_time": 15, "allergènes": [],"catégorie": "entrée"},
-            "crème brûlée": {"nom": "Crème Brûlée", "prix": 9,"prep_time": 40, "allergènes": ["lait", "oeufs"],"catégorie": "dessert"}
+            "omelette": {"nom": "Omelette", "prix": 15,"prep_time": 10, "allergènes": ["oeufs"],"catégorie": "petitdéjeuner", "végétarien": True},
+            "salade césar": {"nom": "Salade César", "prix": 12,"prep_time": 15, "allergènes": ["lait", "poisson"],"catégorie": "déjeuner", "végétarien": False},
+            "pâtes bolognaises": {"nom": "Pâtes Bolognaises", "prix": 18,"prep_time": 30, "allergènes": ["gluten"],"catégorie": "dîner", "végétarien": False},
+            "soupe de légumes": {"nom": "Soupe de Légumes", "prix": 10,"prep_time": 20, "allergènes": [],"catégorie": "entrée", "végétarien": True},
+            "tarte aux pommes": {"nom": "Tarte aux Pommes", "prix": 8,"prep_time": 45, "allergènes": ["gluten", "lait"],"catégorie": "dessert", "végétarien": True},
+            "bâtonnets de crudités": {"nom": "Bâtonnets de Crudités", "prix": 5,"prep_time": 10, "allergènes": [],"catégorie": "apéritif", "végétarien": True},
+            "smoothie aux fruits": {"nom": "Smoothie aux Fruits", "prix": 6,"prep_time": 5, "allergènes": ["fruits"],"catégorie": "boisson", "végétarien": True},
+            "quiche lorraine": {"nom": "Quiche Lorraine", "prix": 14,"prep_time": 25, "allergènes": ["gluten", "lait", "oeufs"],"catégorie": "déjeuner", "végétarien": False},
+            "risotto aux champignons": {"nom": "Risotto aux Champignons", "prix": 16,"prep_time": 25, "allergènes": ["gluten", "lait"],"catégorie": "dîner", "végétarien": True},
+            "salade de quinoa": {"nom": "Salade de Quinoa", "prix": 12,"prep_time": 15, "allergènes": [],"catégorie": "entrée", "végétarien": True},
+            "crème brûlée": {"nom": "Crème Brûlée", "prix": 9,"prep_time": 40, "allergènes": ["lait", "oeufs"],"catégorie": "dessert", "végétarien": True}
         }
+        # Index construits une fois : en mémoire, ou SQLite pour les gros catalogues
+        self.store = (SQLiteProductStore(db_path, self.products, replace=reseed) if db_path
+                      else ProductStore(self.products))
 
-    def forward(self, categorie=None, prix_max=None, sans_allergene=None):
-        res = [p for p in self.products.values() if (not categorie or p['catégorie'] == categorie) and (not prix_max or p['prix'] <= prix_max)]
-        if sans_allergene:
-            res = [p for p in res if sans_allergene not in p['allergènes']]
-        return json.dumps(res)
+    def forward(self, product_name=None, categorie=None, prix_max=None, sans_allergene=None, page=None):
+        if product_name:
+            # Recherche floue par nom : "creme brulee" ou "quiche" trouvent le bon plat
+            matches = self.store.search_name(product_name, categorie=categorie, prix_max=prix_max,
+                                             sans_allergenes=sans_allergene)
+            return json.dumps({"query": product_name, "results": matches}, ensure_ascii=False)
+        res = self.store.query(categorie=categorie, prix_max=prix_max, sans_allergenes=sans_allergene, page=page)
+        return json.dumps(res, ensure_ascii=False)
 
 # -----------------------------------------------------------------------
 # --- 5.2 - Agent avec planification ---
 
 @tool
 def calculate(expression: str) -> str:
-    """Fait des calculs. Args: expression: l'opération."""
-    try: return str(eval(expression))
-    except: return "Erreur"
+    """
+    Fait des calculs.
+
+    Args:
+        expression: l'opération.
+    """
+    # Arithmétique seulement (billing.safe_eval) : plus d'eval sur le code écrit par l'agent
+    try: return str(safe_eval(expression))
+    except UnsafeExpression as e: return f"Erreur : {e}"
+
+
+class OrderBillTool(Tool):
+    """Addition détaillée d'une commande en un appel (prix lus dans le catalogue, pas par le LLM)."""
+
+    name = "order_bill"
+    description = (
+        "Compute the detailed bill of an order in one call: finds each dish in the restaurant "
+        "database (exact or unambiguous partial names, accents and case ignored; unknown dishes are "
+        "reported with suggestions, never replaced), returns itemized lines (unit price x quantity), total, "
+        "per-person share and budget check. Use it instead of reading prices and doing the "
+        "arithmetic yourself."
+    )
+    inputs = {
+        "items": {
+            "type": "object",
+            "description": "Mapping {dish name: quantity}, e.g. {'Quiche Lorraine': 2, 'Crème brûlée': 2}.",
+        },
+        "convives": {
+            "type": "integer",
+            "description": "Number of people sharing the bill.",
+            "nullable": True
+        },
+        "budget": {
+            "type": "number",
+            "description": "Total budget in euros, to check the bill against.",
+            "nullable": True
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, menu: MenuDatabaseTool = None):
+        super().__init__()
+        self.prices = PriceBook((menu or MenuDatabaseTool()).store)
+
+    def forward(self, items, convives=None, budget=None):
+        try:
+            bill = build_bill(self.prices, items, convives=convives, budget=budget)
+        except UnknownDishes as e:
+            return json.dumps({"erreur": str(e), "suggestions": e.suggestions}, ensure_ascii=False)
+        except ValueError as e:
+            return json.dumps({"erreur": str(e)}, ensure_ascii=False)
+        return json.dumps(bill, ensure_ascii=False)
 
-restaurant_agent = CodeAgent(tools=[MenuDatabaseTool(), calculate], model=model_llm, planning_interval=2)
+# Résultats des outils mémoïsés le temps de la session (invalidation : restaurant_session.emit("menu_update"))
+restaurant_session = ToolSession()
+
+
+def _build_restaurant_agent():
+    from smolagents import CodeAgent
+    menu = MenuDatabaseTool()
+    return CodeAgent(tools=[restaurant_session.wrap(menu), OrderBillTool(menu), calculate], model=get_model(),
+                     planning_interval=2)
+
+
+def get_restaurant_agent():
+    return registry.get_or_create("database_tools.restaurant_agent", _build_restaurant_agent)
 
 # -----------------------------------------------------------------------
 # --- 5.3 - Agent conversationnel ---
 
 @observe(name="run_partie_5")
-def run_restaurant_session():
-    
-    print(restaurant_agent.run("Budget 60€, un sans gluten. Proposez un menu.", reset=False))
-    print(restaurant_agent.run("L'addition détaillée ?", reset=False))
+def run_restaurant_session(questions=None, memory: ConversationMemory = None):
+    # Chaque tour repart d'une mémoire d'agent vide (reset=True) : le contexte est reconstruit
+    # par ConversationMemory (budget et allergies épinglés, anciens tours résumés), ce qui
+    # garde une taille de requête stable au fil du service
+    questions = questions or ["Budget 60€, un sans gluten. Proposez un menu.", "L'addition détaillée ?"]
+    memory = memory or ConversationMemory(budget=1500)
+    for question in questions:
+        answer = get_restaurant_agent().run(memory.prompt(question), reset=True)
+        memory.add({"role": "assistant", "content": str(answer)})
+        print(answer)
+    return memory
 
 
 # --- PARTIE 6 - L'EMPIRE CHEFBOT ---
 # -----------------------------------------------------------------------
 
-nutritionist = ManagedAgent(agent=CodeAgent(tools=[tool(check_dietary_info)], model=model_llm), 
-                            name="nutritionist", description="Vérifie allergènes")
-chef = ManagedAgent(agent=CodeAgent(tools=[tool(check_fridge), tool(get_recipe)], model=model_llm), 
-                    name="chef", description="Recettes et frigo")
-budget = ManagedAgent(agent=CodeAgent(tools=[calculate, MenuDatabaseTool()], model=model_llm), 
-                     name="budget", description="Prix et calculs")
+# Une session d'outils partagée par les agents de l'empire : un même ingrédient ou un même
+# plat n'est consulté qu'une fois par run
+empire_session = ToolSession()
 
-manager = CodeAgent(tools=[], model=model_llm, managed_agents=[nutritionist, chef, budget])
+class ConsultAgentsTool(Tool):
+    """Envoie plusieurs sous-tâches indépendantes à des agents en une seule étape du manager."""
 
-@observe(name="Partie 6 Raphaelgabriel - Empire")
-def run_empire_test():
-    requete = """
+    name = "consult_agents"
+    description = (
+        "Send independent sub-tasks to several team members at once; they work concurrently. "
+        "Prefer this over calling the team members one after another when their sub-tasks do "
+        "not depend on each other. Returns their answers merged, one section per member; a member "
+        "that is too slow is reported as timeout."
+    )
+    inputs = {
+        "tasks": {
+            "type": "object",
+            "description": "Mapping {team member name: sub-task}, e.g. {'nutritionist': '...', 'chef': '...'}.",
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, agents: list, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__()
+        self.agents = {agent.name: agent for agent in agents}
+        self.timeout = timeout
+        self.description += f" Team members: {', '.join(self.agents)}."
+
+    def forward(self, tasks):
+        return merge_answers(fan_out(self.agents, tasks, timeout=self.timeout))
+
+
+class MenuComposerTool(Tool):
+    """Compose les menus qui conviennent à tous les convives en un appel (menu_solver.py)."""
+
+    name = "compose_menu"
+    description = (
+        "Find the cheapest complete menus from the restaurant database that every guest can eat, "
+        "in one call: one dish per course, respecting diets (e.g. 'végétarien'), allergies "
+        "(e.g. 'sans gluten', 'allergique aux fruits à coque') and the total budget. Returns the "
+        "top menus with prices per course, total and per-person cost, or the reason why no menu "
+        "exists. 'avertissements' lists allergies the menu data cannot check: report them to the "
+        "user. Use it instead of trying dish combinations yourself."
+    )
+    inputs = {
+        "convives": {
+            "type": "integer",
+            "description": "Number of guests.",
+        },
+        "contraintes": {
+            "type": "array",
+            "description": "Diets and allergies of the guests, e.g. ['végétarien', 'sans gluten'].",
+            "nullable": True
+        },
+        "services": {
+            "type": "array",
+            "description": "Courses, among apéritif, entrée, plat, dessert (default: entrée, plat, dessert).",
+            "nullable": True
+        },
+        "budget": {
+            "type": "number",
+            "description": "Total budget in euros for all guests.",
+            "nullable": True
+        },
+        "top_k": {
+            "type": "integer",
+            "description": "Number of menus to return (default 3).",
+            "nullable": True
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, menu: MenuDatabaseTool = None):
+        super().__init__()
+        menu = menu or MenuDatabaseTool()
+        # Le solveur travaille sur les tableaux en mémoire (prix triés, bitmasks) : un catalogue
+        # SQLite est copié une fois, c'est bien lui (et non les plats de démonstration) qui sert
+        store = menu.store if isinstance(menu.store, ProductStore) else menu.store.to_memory()
+        self.solver = MenuSolver(store)
+
+    def forward(self, convives, contraintes=None, services=None, budget=None, top_k=None):
+        try:
+            result = self.solver.solve(convives, contraintes or [], services or DEFAULT_COURSES,
+                                       budget=budget, top_k=top_k or 3)
+        except Infeasible as e:
+            return json.dumps({"menus": [], "impossible": e.reasons, "avertissements": e.warnings},
+                              ensure_ascii=False)
+        except ValueError as e:
+            return json.dumps({"erreur": str(e)}, ensure_ascii=False)
+        return json.dumps(result, ensure_ascii=False)
+
+
+def _build_empire():
+    # smolagents 1.24 : un agent géré est un CodeAgent nommé et décrit, passé dans managed_agents
+    from smolagents import CodeAgent
+    model_llm = get_model()
+    nutritionist = CodeAgent(tools=[empire_session.wrap(tool(check_dietary_info))], model=model_llm,
+                             name="nutritionist", description="Vérifie allergènes")
+    chef = CodeAgent(tools=[empire_session.wrap(tool(check_fridge)), empire_session.wrap(tool(get_recipe))],
+                     model=model_llm, name="chef", description="Recettes et frigo")
+    menu = MenuDatabaseTool()
+    budget = CodeAgent(tools=[calculate, OrderBillTool(menu), empire_session.wrap(menu)], model=model_llm,
+                       name="budget", description="Prix et calculs")
+    consult_agents = ConsultAgentsTool([nutritionist, chef, budget])
+    # compose_menu résout d'un coup convives x allergies x budget sur la carte
+    manager = CodeAgent(tools=[consult_agents, MenuComposerTool(menu)], model=model_llm,
+                        managed_agents=[nutritionist, chef, budget])
+    return {"nutritionist": nutritionist, "chef": chef, "budget": budget,
+            "consult_agents": consult_agents, "manager": manager}
+
+
+def get_empire() -> dict:
+    """Agents de l'empire (nutritionist, chef, budget, consult_agents, manager), créés au premier appel."""
+    return registry.get_or_create("database_tools.empire", _build_empire)
+
+EMPIRE_REQUEST = """
     Je recois 8 personnes samedi soir. Parmi eux : 2 vegetariens, 1 intolerant au gluten,
     1 allergique aux fruits a coque. Budget total : 120 euros.
     Je veux un aperitif, une entree, un plat principal et un dessert.
     Il faut que tout le monde puisse manger chaque service.
     """
-    print(manager.run(requete))
\ No newline at end of file
+
+# Sous-tâches indépendantes lancées d'emblée en parallèle (mode parallel=True)
+EMPIRE_SUBTASKS = {
+    "nutritionist": "Pour cette demande, liste les allergènes et ingrédients à éviter pour chaque convive :\n{request}",
+    "chef": "Pour cette demande, propose des recettes réalisables avec le frigo pour chaque service :\n{request}",
+    "budget": "Pour cette demande, liste les plats de la carte compatibles et leurs prix par service :\n{request}",
+}
+
+
+@observe(name="Partie 6 Raphaelgabriel - Empire")
+def run_empire_test(requete: str = EMPIRE_REQUEST, parallel: bool = True, timeout: float = DEFAULT_TIMEOUT):
+    empire = get_empire()
+    if not parallel:
+        print(empire["manager"].run(requete))
+        return
+    # Les trois consultations tournent en même temps ; le manager n'a plus qu'à arbitrer
+    results = fan_out(empire["consult_agents"].agents, {name: task.format(request=requete) for name, task in EMPIRE_SUBTASKS.items()},
+                      timeout=timeout)
+    tracing.update_current_span(metadata={
+        name: {"status": r["status"], "duration_s": round(r["duration_s"], 2)} for name, r in results.items()
+    })
+    print(empire["manager"].run(
+        f"{requete}\n\nRéponses déjà obtenues de l'équipe :\n\n{merge_answers(results)}\n\n"
+        "Compose le menu final à partir de ces réponses ; ne reconsulte l'équipe que si une information manque."
+    ))
\ No newline at end of file
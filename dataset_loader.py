@@ -0,0 +1,239 @@
+"""
+Chargement en masse des cas de test (Partie 3) depuis JSONL ou CSV : lecture en flux, validation
+ligne à ligne, id = hash du contenu (relances idempotentes), envoi par lots avec retries.
+"""
+import contextvars
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+MAX_REPORTED_ERRORS = 20
+
+_LIST_SEPARATOR = re.compile(r"\s*[|;]\s*")
+
+
+class InvalidCase(ValueError):
+    """Ligne qui ne respecte pas le schéma d'un cas de test."""
+
+
+# -----------------------------------------------------------------------
+# --- Lecture en flux ---
+
+def _split_list(value: str) -> list:
+    value = (value or "").strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [v for v in _LIST_SEPARATOR.split(value) if v]
+
+
+def _row_from_csv(row: dict) -> dict:
+    if row.get("input"):
+        case = {"input": json.loads(row["input"]),
+                "expected_output": json.loads(row["expected_output"]) if row.get("expected_output") else None}
+        if row.get("metadata"):
+            case["metadata"] = json.loads(row["metadata"])
+        return case
+    expected = {"must_avoid": _split_list(row.get("must_avoid")),
+                "must_include": _split_list(row.get("must_include"))}
+    if (row.get("max_calories_per_meal") or "").strip():
+        expected["max_calories_per_meal"] = float(row["max_calories_per_meal"])
+    return {"input": {"constraints": row.get("constraints")}, "expected_output": expected}
+
+
+def read_cases(source):
+    """(numéro de ligne, cas ou exception) pour chaque ligne de `source` (fichier ou itérable de dict)."""
+    if not isinstance(source, (str, os.PathLike)):
+        yield from enumerate(source, start=1)
+        return
+    path = os.fspath(source)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    yield reader.line_num, _row_from_csv(row)
+                except (ValueError, TypeError) as e:
+                    yield reader.line_num, InvalidCase(f"ligne CSV illisible : {e}")
+        else:
+            for line_num, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_num, InvalidCase(f"JSON invalide : {e.msg}")
+
+
+# -----------------------------------------------------------------------
+# --- Validation et identifiants ---
+
+def _string_list(value, field):
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(v, str) and v.strip() for v in value):
+        raise InvalidCase(f"expected_output.{field} doit être une liste de chaînes non vides")
+    return [v.strip() for v in value]
+
+
+def validate_case(case) -> dict:
+    """Cas normalisé {"input", "expected_output", "metadata"?} ; lève InvalidCase sinon."""
+    if not isinstance(case, dict):
+        raise InvalidCase("un cas doit être un objet JSON")
+    data = case.get("input")
+    if not isinstance(data, dict) or not isinstance(data.get("constraints"), str) or not data["constraints"].strip():
+        raise InvalidCase("input.constraints est obligatoire (texte non vide)")
+    expected = case.get("expected_output")
+    if not isinstance(expected, dict):
+        raise InvalidCase("expected_output est obligatoire (objet)")
+
+    normalized = {
+        "must_avoid": _string_list(expected.get("must_avoid"), "must_avoid"),
+        "must_include": _string_list(expected.get("must_include"), "must_include"),
+    }
+    if not normalized["must_avoid"] and not normalized["must_include"]:
+        raise InvalidCase("expected_output doit contenir must_avoid ou must_include")
+    calories = expected.get("max_calories_per_meal")
+    if calories is not None:
+        if isinstance(calories, bool) or not isinstance(calories, (int, float)) or calories <= 0:
+            raise InvalidCase("expected_output.max_calories_per_meal doit être un nombre positif")
+        normalized["max_calories_per_meal"] = int(calories) if float(calories).is_integer() else calories
+    # Les autres champs attendus (ex : critères propres à un cas) sont conservés tels quels
+    for key, value in expected.items():
+        normalized.setdefault(key, value)
+
+    result = {"input": {**data, "constraints": data["constraints"].strip()}, "expected_output": normalized}
+    if case.get("metadata") is not None:
+        if not isinstance(case["metadata"], dict):
+            raise InvalidCase("metadata doit être un objet")
+        result["metadata"] = case["metadata"]
+    return result
+
+
+def content_hash(case: dict) -> str:
+    """Hash du contenu d'un cas validé (input + expected_output, ordre des clés indifférent)."""
+    canonical = json.dumps({"input": case["input"], "expected_output": case["expected_output"]},
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def item_id(dataset_name: str, digest: str) -> str:
+    """Identifiant Langfuse de l'item : stable pour un même cas dans un même dataset."""
+    return hashlib.sha256(f"{dataset_name}:{digest}".encode("utf-8")).hexdigest()[:32]
+
+
+# -----------------------------------------------------------------------
+# --- Manifeste des cas déjà envoyés ---
+
+def manifest_path(dataset_name: str, directory: str = ".") -> str:
+    safe = re.sub(r"[^\w.-]+", "_", dataset_name)
+    return os.path.join(directory, f".dataset_manifest_{safe}.txt")
+
+
+def load_manifest(path: str) -> set:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+# -----------------------------------------------------------------------
+# --- Chargement ---
+
+def _with_retry(fn, retries: int, backoff: float):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def load_cases(source, dataset_name: str, create_item, batch_size: int = DEFAULT_BATCH_SIZE,
+               workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES, backoff: float = 0.5,
+               manifest: str = None, verbose: bool = True) -> dict:
+    """Valide et envoie les cas de `source` via `create_item` ; retourne compteurs et premières erreurs."""
+    stats = {"read": 0, "valid": 0, "invalid": 0, "duplicates": 0, "already_uploaded": 0,
+             "uploaded": 0, "failed": 0, "errors": []}
+    uploaded = load_manifest(manifest)
+    seen = set()
+    lock = threading.Lock()
+    manifest_file = open(manifest, "a", encoding="utf-8") if manifest else None
+
+    def upload(batch):
+        for digest, case in batch:
+            try:
+                _with_retry(lambda: create_item(dataset_name=dataset_name, id=item_id(dataset_name, digest),
+                                                input=case["input"], expected_output=case["expected_output"],
+                                                metadata={**case.get("metadata", {}), "content_hash": digest}),
+                            retries, backoff)
+            except Exception as e:
+                with lock:
+                    stats["failed"] += 1
+                    if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                        stats["errors"].append({"hash": digest, "error": f"envoi : {e}"})
+                continue
+            with lock:
+                stats["uploaded"] += 1
+                if manifest_file:
+                    manifest_file.write(digest + "\n")
+                    manifest_file.flush()
+
+    def batches():
+        batch = []
+        for line_num, case in read_cases(source):
+            stats["read"] += 1
+            try:
+                if isinstance(case, Exception):
+                    raise case
+                case = validate_case(case)
+            except InvalidCase as e:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                    stats["errors"].append({"line": line_num, "error": str(e)})
+                continue
+            stats["valid"] += 1
+            digest = content_hash(case)
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            if digest in uploaded:
+                stats["already_uploaded"] += 1
+                continue
+            batch.append((digest, case))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Au plus 2 lots en attente par worker : la lecture avance au rythme de l'envoi
+            pending = set()
+            for batch in batches():
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(pool.submit(contextvars.copy_context().run, upload, batch))
+            wait(pending)
+    finally:
+        if manifest_file:
+            manifest_file.close()
+
+    stats["duration_s"] = time.perf_counter() - start
+    if verbose:
+        print(f"✓ {stats['uploaded']} cas envoyés, {stats['already_uploaded']} déjà présents, "
+              f"{stats['duplicates']} doublons, {stats['invalid']} invalides, {stats['failed']} échecs "
+              f"({stats['duration_s']:.1f}s)")
+    return stats
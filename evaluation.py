@@ -0,0 +1,131 @@
+"""
+Runner d'évaluation local (Partie 3), à la place de langfuse.run_experiment : pool de threads,
+checkpoint JSONL pour reprendre un run interrompu, latence et tokens par item.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+
+def _field(item, name, default=None):
+    """Accès uniforme aux items Langfuse (attributs) et aux dicts."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def item_id(item, index: int) -> str:
+    return str(_field(item, "id") or index)
+
+
+def load_checkpoint(path: str) -> dict:
+    """Retourne {item_id: enregistrement} pour les items déjà évalués sans erreur."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue   # ligne tronquée par une interruption
+            if record.get("error") is None:
+                done[record["item_id"]] = record
+    return done
+
+
+def _end_last_line(path: str):
+    """Termine une dernière ligne tronquée : l'enregistrement suivant ne doit pas s'y coller."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(records: list) -> dict:
+    ok = [r for r in records if r.get("error") is None]
+    latencies = [r["latency_s"] for r in ok]
+    scores = {}
+    for r in ok:
+        for name, value in r["scores"].items():
+            if isinstance(value, (int, float)):
+                scores.setdefault(name, []).append(value)
+    return {
+        "items": len(records),
+        "errors": len(records) - len(ok),
+        "latency_p50_s": _percentile(latencies, 0.5),
+        "latency_p95_s": _percentile(latencies, 0.95),
+        "prompt_tokens": sum(r["usage"].get("prompt_tokens", 0) for r in ok),
+        "completion_tokens": sum(r["usage"].get("completion_tokens", 0) for r in ok),
+        "scores": {name: sum(v) / len(v) for name, v in scores.items()},
+    }
+
+
+def run_local_evaluation(items, task, evaluators, workers: int = 8,
+                         checkpoint_path: str = "eval_checkpoint.jsonl",
+                         track_usage=None, verbose: bool = True) -> dict:
+    """
+    output = task(input), puis evaluator(input=, output=, expected_output=) -> dict de scores.
+    `track_usage` : context manager de consommation par item (ex : chefbot.track_usage).
+    """
+    items = list(items)
+    done = load_checkpoint(checkpoint_path)
+    todo = [(item_id(item, i), item) for i, item in enumerate(items) if item_id(item, i) not in done]
+    if verbose:
+        print(f"{len(done)} items déjà évalués, {len(todo)} restants")
+
+    _end_last_line(checkpoint_path)
+    lock = threading.Lock()
+
+    def evaluate(iid, item):
+        record = {"item_id": iid, "output": None, "scores": {}, "latency_s": None, "usage": {}, "error": None}
+        item_input = _field(item, "input")
+        expected = _field(item, "expected_output") or {}
+        with (track_usage() if track_usage else nullcontext({})) as usage:
+            start = time.perf_counter()
+            try:
+                record["output"] = task(item_input)
+                record["latency_s"] = time.perf_counter() - start
+                for evaluator in evaluators:
+                    record["scores"].update(
+                        evaluator(input=item_input, output=record["output"], expected_output=expected)
+                    )
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                record["latency_s"] = time.perf_counter() - start
+        record["usage"] = dict(usage)
+
+        with lock:
+            with open(checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        return record
+
+    records = list(done.values())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Copie du contexte : les spans Langfuse de chaque item restent rattachés à la trace courante
+        futures = [pool.submit(contextvars.copy_context().run, evaluate, iid, item) for iid, item in todo]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if verbose:
+                status = record["error"] or record["scores"]
+                print(f"Item {record['item_id']} ({record['latency_s']:.1f}s, "
+                      f"{record['usage'].get('prompt_tokens', 0) + record['usage'].get('completion_tokens', 0)} tokens) : {status}")
+
+    return summarize(records)
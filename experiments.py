@@ -0,0 +1,170 @@
+"""Grille questions x températures x répétitions en parallèle, et diversité par température (Partie 1)."""
+import asyncio
+import re
+import time
+from itertools import product
+
+import numpy as np
+
+import registry
+import tracing
+from cache import make_key
+from chefbot import CHEF_SYSTEM_PROMPT, MODEL, _acreate, _record_cached
+from registry import observe
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# -----------------------------------------------------------------------
+# --- Exécution de la grille ---
+
+async def run_grid(questions: list, temperatures: list, repeats: int = 3,
+                   concurrency: int = 8, model: str = MODEL, use_cache: bool = False):
+    """
+    Produit chaque résultat (question, température, répétition) dès qu'il arrive, `concurrency`
+    requêtes au plus. `use_cache=True` rejoue les mêmes tirages (la répétition est dans la clé).
+    """
+    # Appels mesurés comme ceux de chefbot._chat (metrics.py, track_usage), sur le client
+    # AsyncGroq de la boucle courante et son pool de connexions
+    semaphore = asyncio.Semaphore(concurrency)
+    response_cache = registry.get("response_cache") if use_cache else None
+
+    async def one(question, temperature, repeat):
+        messages = [
+            {"role": "system", "content": CHEF_SYSTEM_PROMPT},
+            {"role": "user", "content": question},
+        ]
+        result = {"question": question, "temperature": temperature, "repeat": repeat,
+                  "content": None, "latency_s": 0.0, "error": None}
+
+        key = make_key(model, messages, temperature=temperature, repeat=repeat)
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                _record_cached(model, "run_grid")
+                result["content"] = cached["content"]
+                return result
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                completion = await _acreate(model, messages, "run_grid", temperature=temperature)
+                result["content"] = completion.choices[0].message.content
+            except Exception as e:
+                result["error"] = str(e)
+            result["latency_s"] = time.perf_counter() - start
+
+        if use_cache and result["error"] is None:
+            response_cache.set(key, {"content": result["content"]})
+        return result
+
+    tasks = [asyncio.create_task(one(q, t, r))
+             for q, t, r in product(questions, temperatures, range(repeats))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Si l'appelant s'arrête en cours de route, on n'attend pas les requêtes restantes.
+        # Le client n'est pas fermé : ses connexions appartiennent au pool de la boucle,
+        # réutilisé par les grilles suivantes (http_pool.aclose() pour le fermer)
+        for task in tasks:
+            task.cancel()
+
+
+async def collect_grid(*args, **kwargs) -> list:
+    """Exécute toute la grille et retourne la liste des résultats (ordre d'arrivée)."""
+    return [result async for result in run_grid(*args, **kwargs)]
+
+
+# -----------------------------------------------------------------------
+# --- Statistiques de diversité ---
+
+def pairwise_overlap(texts: list) -> np.ndarray:
+    """Matrice (n, n) de Jaccard entre les ensembles de mots des textes (produit matriciel d'incidence)."""
+    tokens = [set(_WORD_RE.findall(t.lower())) for t in texts]
+    n = len(tokens)
+    flat = [w for ws in tokens for w in ws]
+    if not flat:
+        return np.ones((n, n))
+
+    vocab, inverse = np.unique(np.array(flat), return_inverse=True)
+    rows = np.repeat(np.arange(n), [len(ws) for ws in tokens])
+    incidence = np.zeros((n, len(vocab)), dtype=np.int32)
+    incidence[rows, inverse] = 1
+
+    intersection = incidence @ incidence.T
+    sizes = np.diag(intersection)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    return np.divide(intersection, union, out=np.ones((n, n)), where=union > 0)
+
+
+def diversity_stats(results: list) -> dict:
+    """Par température : recouvrement moyen entre générations d'une question, et dispersion des longueurs."""
+    groups = {}
+    for r in results:
+        if r["error"] is None and r["content"]:
+            groups.setdefault(r["temperature"], {}).setdefault(r["question"], []).append(r["content"])
+
+    stats = {}
+    for temperature, by_question in sorted(groups.items()):
+        overlaps = []
+        lengths = []
+        for texts in by_question.values():
+            lengths.extend(len(_WORD_RE.findall(t)) for t in texts)
+            if len(texts) > 1:
+                matrix = pairwise_overlap(texts)
+                overlaps.append(matrix[np.triu_indices(len(texts), k=1)])
+
+        lengths = np.array(lengths, dtype=float)
+        overlaps = np.concatenate(overlaps) if overlaps else None
+        stats[temperature] = {
+            "n": int(lengths.size),
+            "overlap_mean": float(overlaps.mean()) if overlaps is not None else float("nan"),
+            "overlap_std": float(overlaps.std()) if overlaps is not None else float("nan"),
+            "length_mean": float(lengths.mean()),
+            "length_std": float(lengths.std()),
+            "length_min": int(lengths.min()),
+            "length_max": int(lengths.max()),
+        }
+    return stats
+
+
+# -----------------------------------------------------------------------
+# --- 1.3 bis - Comparer plusieurs générations par température ---
+
+@observe(name="run_partie_1_grid")
+def run_temperature_grid(repeats: int = 5, concurrency: int = 8):
+    """Version parallèle de run_temperature_tests : N générations par température."""
+
+    tracing.update_current_trace(
+        tags=["Partie 1", "Groupe_Natalène_Yacine"],
+        metadata={"experiment": "temperature_grid", "repeats": repeats}
+    )
+
+    questions = ["J'ai récupéré des poireaux et des noix du marché ce matin. Qu'est-ce que je peux cuisiner avec pour ce soir ?"]
+    temps = [0.1, 0.7, 1.2]
+
+    async def main():
+        results = []
+        async for r in run_grid(questions, temps, repeats=repeats, concurrency=concurrency):
+            status = r["error"] or f"{len(r['content'])} caractères"
+            print(f"  T={r['temperature']} #{r['repeat']} ({r['latency_s']:.2f}s) : {status}")
+            results.append(r)
+        return results
+
+    results = asyncio.run(main())
+    stats = diversity_stats(results)
+
+    print("\n--- DIVERSITE PAR TEMPERATURE ---")
+    for t, s in stats.items():
+        print(f"T={t} : recouvrement {s['overlap_mean']:.2f} ± {s['overlap_std']:.2f}, "
+              f"longueur {s['length_mean']:.0f} ± {s['length_std']:.0f} mots "
+              f"[{s['length_min']}-{s['length_max']}] (n={s['n']})")
+    return stats
+
+
+# if __name__ == "__main__":
+#     tracing.init()
+#     run_temperature_grid()
+#     langfuse.flush()
+#     print("\nTraces envoyées à Langfuse.")
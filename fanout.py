@@ -0,0 +1,78 @@
+"""
+Consultation concurrente de plusieurs agents (Partie 6), avec délai maximum par sous-tâche.
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_TIMEOUT = 120.0   # secondes, pour l'ensemble des sous-tâches
+
+OK, TIMEOUT, ERROR, UNKNOWN = "ok", "timeout", "error", "unknown_agent"
+
+
+def _interrupt(agent):
+    """Demande l'arrêt d'un agent smolagents (`interrupt()`, sur l'agent ou sur son `.agent`)."""
+    for target in (agent, getattr(agent, "agent", None)):
+        interrupt = getattr(target, "interrupt", None)
+        if callable(interrupt):
+            try:
+                interrupt()
+            except Exception:
+                pass
+            return
+
+
+def fan_out(agents: dict, tasks: dict, timeout: float = DEFAULT_TIMEOUT, max_workers: int = None) -> dict:
+    """Exécute `agents[nom](tâche)` en parallèle ; {nom: {"status", "answer", "duration_s"}}."""
+    results = {}
+    runnable = {}
+    for name, task in tasks.items():
+        if name in agents:
+            runnable[name] = task
+        else:
+            results[name] = {"status": UNKNOWN, "answer": f"agent inconnu (disponibles : {', '.join(agents)})",
+                             "duration_s": 0.0}
+    if not runnable:
+        return {name: results[name] for name in tasks}
+
+    def run(name, task):
+        start = time.perf_counter()
+        answer = agents[name](task)
+        return answer, time.perf_counter() - start
+
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(runnable))
+    try:
+        # Contexte copié par tâche : les spans Langfuse des sous-agents restent rattachés
+        futures = {
+            pool.submit(contextvars.copy_context().run, run, name, task): name
+            for name, task in runnable.items()
+        }
+        done, pending = wait(futures, timeout=timeout)
+        for future in done:
+            name = futures[future]
+            try:
+                answer, duration = future.result()
+                results[name] = {"status": OK, "answer": answer, "duration_s": duration}
+            except Exception as e:
+                results[name] = {"status": ERROR, "answer": f"{type(e).__name__}: {e}",
+                                 "duration_s": time.perf_counter() - start}
+        for future in pending:
+            name = futures[future]
+            future.cancel()
+            _interrupt(agents[name])
+            results[name] = {"status": TIMEOUT, "answer": f"pas de réponse après {timeout:g}s",
+                             "duration_s": time.perf_counter() - start}
+    finally:
+        # On n'attend pas les sous-agents abandonnés
+        pool.shutdown(wait=False, cancel_futures=True)
+    return {name: results[name] for name in tasks}
+
+
+def merge_answers(results: dict) -> str:
+    """Réponses des agents fusionnées en un texte, une section par agent."""
+    sections = []
+    for name, result in results.items():
+        header = f"### {name}" if result["status"] == OK else f"### {name} ({result['status']})"
+        sections.append(f"{header}\n{result['answer']}")
+    return "\n\n".join(sections)
@@ -0,0 +1,241 @@
+"""
+Pool de connexions HTTP (keep-alive, HTTP/2 si h2 est installé) partagé par Groq et LiteLLM.
+
+    CHEFBOT_HTTP_MAX_CONNECTIONS (20), CHEFBOT_HTTP_MAX_KEEPALIVE (10), CHEFBOT_HTTP_KEEPALIVE_EXPIRY (30 s),
+    CHEFBOT_HTTP_TIMEOUT (60 s), CHEFBOT_HTTP_CONNECT_TIMEOUT (5 s), CHEFBOT_HTTP2=0 pour désactiver HTTP/2
+"""
+import asyncio
+import os
+import threading
+from importlib.util import find_spec
+
+import httpx
+
+
+def _env(name, default, cast=float):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_env("CHEFBOT_HTTP_MAX_CONNECTIONS", 20, int),
+        max_keepalive_connections=_env("CHEFBOT_HTTP_MAX_KEEPALIVE", 10, int),
+        keepalive_expiry=_env("CHEFBOT_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def timeout() -> httpx.Timeout:
+    return httpx.Timeout(_env("CHEFBOT_HTTP_TIMEOUT", 60.0), connect=_env("CHEFBOT_HTTP_CONNECT_TIMEOUT", 5.0))
+
+
+def http2_enabled() -> bool:
+    return os.getenv("CHEFBOT_HTTP2", "1") != "0" and find_spec("h2") is not None
+
+
+# -----------------------------------------------------------------------
+# --- Métriques de réutilisation ---
+
+class PoolMetrics:
+    """Requêtes, connexions ouvertes / réutilisées et handshakes TLS, par hôte."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._hosts = {}
+
+    def record(self, host: str, new_connection: bool, tls: bool, http_version: str = None):
+        with self._lock:
+            stats = self._hosts.setdefault(host, {"requests": 0, "new_connections": 0, "reused": 0,
+                                                  "tls_handshakes": 0, "http2": 0})
+            stats["requests"] += 1
+            stats["new_connections" if new_connection else "reused"] += 1
+            stats["tls_handshakes"] += int(tls)
+            stats["http2"] += int(http_version == "HTTP/2")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._hosts.items()}
+        totals = {key: sum(s[key] for s in hosts.values())
+                  for key in ("requests", "new_connections", "reused", "tls_handshakes", "http2")}
+        totals["reuse_rate"] = totals["reused"] / totals["requests"] if totals["requests"] else 0.0
+        return {**totals, "by_host": hosts}
+
+
+metrics = PoolMetrics()
+
+
+def _record(request: httpx.Request, events: set, response: httpx.Response = None):
+    metrics.record(
+        request.url.host,
+        new_connection="connection.connect_tcp.complete" in events,
+        tls="connection.start_tls.complete" in events,
+        http_version=response.http_version if response is not None else None,
+    )
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Transport httpx qui compte les connexions ouvertes / réutilisées (extension `trace`)."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        events = set()
+        previous = request.extensions.get("trace")
+
+        def trace(name, info):
+            events.add(name)
+            if previous is not None:
+                previous(name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        response = None
+        try:
+            response = self.transport.handle_request(request)
+            return response
+        finally:
+            _record(request, events, response)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncMeteredTransport(httpx.AsyncBaseTransport):
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        events = set()
+        previous = request.extensions.get("trace")
+
+        async def trace(name, info):
+            events.add(name)
+            if previous is not None:
+                await previous(name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        response = None
+        try:
+            response = await self.transport.handle_async_request(request)
+            return response
+        finally:
+            _record(request, events, response)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# -----------------------------------------------------------------------
+# --- Clients partagés ---
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients = {}   # boucle asyncio -> AsyncClient (un client asynchrone ne change pas de boucle)
+
+
+def new_client(**kwargs) -> httpx.Client:
+    transport = httpx.HTTPTransport(http2=http2_enabled(), limits=limits())
+    return httpx.Client(transport=MeteredTransport(transport), timeout=timeout(), **kwargs)
+
+
+def new_async_client(**kwargs) -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(http2=http2_enabled(), limits=limits())
+    return httpx.AsyncClient(transport=AsyncMeteredTransport(transport), timeout=timeout(), **kwargs)
+
+
+def sync_client() -> httpx.Client:
+    """Client httpx du processus (créé au premier appel)."""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = new_client()
+    return _sync_client
+
+
+def async_client() -> httpx.AsyncClient:
+    """Client httpx asynchrone de la boucle asyncio courante (créé au premier appel dans la boucle)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for other in [l for l in _async_clients if l.is_closed()]:
+            del _async_clients[other]   # connexions d'une boucle terminée : inutilisables
+        if loop not in _async_clients:
+            _async_clients[loop] = new_async_client()
+        return _async_clients[loop]
+
+
+# -----------------------------------------------------------------------
+# --- LiteLLM ---
+
+class PooledLiteLLM:
+    """Module litellm de `LiteLLMModel.client` dont les complétions passent par le pool partagé."""
+
+    def __init__(self):
+        import litellm
+        from litellm.llms.custom_httpx.http_handler import HTTPHandler
+        self._litellm = litellm
+        self._handler = HTTPHandler(timeout=timeout(), client=sync_client())
+        # Chemins de litellm qui utilisent la session globale plutôt que `client`
+        litellm.client_session = sync_client()
+
+    def __getattr__(self, name):
+        return getattr(self._litellm, name)
+
+    def completion(self, **kwargs):
+        import metrics
+        kwargs.setdefault("client", self._handler)
+        # Appels des agents smolagents mesurés comme les appels Groq directs (metrics.py) ;
+        # en streaming, seule l'ouverture du flux est chronométrée
+        with metrics.track(kwargs.get("model")) as call:
+            response = self._litellm.completion(**kwargs)
+            if not kwargs.get("stream"):
+                call["response"] = response
+        return response
+
+
+def _aclose_on(loop, client: httpx.AsyncClient):
+    """Ferme un client asynchrone sur sa propre boucle (ses connexions y sont attachées)."""
+    if loop.is_closed():
+        return   # boucle terminée : ses connexions ne peuvent plus être fermées proprement
+    if not loop.is_running():
+        loop.run_until_complete(client.aclose())
+        return
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    if current is loop:
+        loop.create_task(client.aclose())
+    else:
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+def close():
+    """Ferme le client synchrone et les clients asynchrones créés (un par boucle)."""
+    global _sync_client
+    with _lock:
+        sync, _sync_client = _sync_client, None
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+    if sync is not None:
+        sync.close()
+    for loop, client in clients:
+        _aclose_on(loop, client)
+
+
+async def aclose():
+    """À appeler depuis une boucle asyncio : ferme (et attend) le client de cette boucle."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def stats() -> dict:
+    return metrics.snapshot()
@@ -0,0 +1,203 @@
+"""LLM juge (Partie 3) : prompts, clé de cache, réparation des notes et micro-batcher ; aucun appel réseau."""
+import contextvars
+import json
+import re
+import threading
+from concurrent.futures import Future
+
+from cache import make_key
+
+JUDGE_PROMPT_VERSION = "v3"
+CRITERIA = ("pertinence", "creativite", "praticite")
+
+_NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def judge_key(question, output: str, model: str, expected: dict = None) -> str:
+    """Clé de cache d'une note : (question, sortie, attentes, version du prompt, modèle)."""
+    return make_key(model, [], kind="llm_judge", version=JUDGE_PROMPT_VERSION,
+                    question=question, output=output, expected=expectations(expected))
+
+
+def expectations(expected: dict = None) -> dict:
+    """Attentes du dataset utiles au juge : {"must_avoid": [...], "must_include": [...]} (listes non vides)."""
+    expected = expected or {}
+    return {key: list(expected[key]) for key in ("must_avoid", "must_include") if expected.get(key)}
+
+
+def expectations_text(expected: dict = None) -> str:
+    """Attentes en une ligne pour le prompt ("" si l'item n'en a pas)."""
+    expected = expectations(expected)
+    parts = []
+    if expected.get("must_avoid"):
+        parts.append("à éviter : " + ", ".join(expected["must_avoid"]))
+    if expected.get("must_include"):
+        parts.append("à inclure : " + ", ".join(expected["must_include"]))
+    return "Attentes (" + " ; ".join(parts) + ")" if parts else ""
+
+
+def single_prompt(question, output: str, expected: dict = None) -> str:
+    attentes = expectations_text(expected)
+    attentes = f"\n    {attentes}" if attentes else ""
+    return f"""Note ce menu (0.0 à 1.0) selon :
+    1. Pertinence (respect de {question} et des attentes)
+    2. Créativité
+    3. Praticité{attentes}
+    Réponds uniquement en JSON : {{"pertinence": 0, "creativite": 0, "praticite": 0}}
+    Menu : {output}"""
+
+
+def batch_prompt(items: list) -> str:
+    """Un seul prompt pour noter plusieurs (question, menu) ; les menus sont numérotés."""
+    blocks = []
+    for i, item in enumerate(items):
+        lines = [f"### Menu {i}", f"Demande : {item['question']}"]
+        attentes = expectations_text(item.get("expected"))
+        if attentes:
+            lines.append(attentes)
+        lines.append(f"Menu : {item['output']}")
+        blocks.append("\n".join(lines))
+    menus = "\n\n".join(blocks)
+    return f"""Note chacun des menus ci-dessous (0.0 à 1.0) selon :
+    1. Pertinence (respect de la demande et des attentes)
+    2. Créativité
+    3. Praticité
+    Réponds uniquement en JSON, avec une entrée par menu :
+    {{"notes": [{{"id": 0, "pertinence": 0, "creativite": 0, "praticite": 0}}]}}
+
+{menus}"""
+
+
+def repair_score(value):
+    """
+    Ramène une note dans [0, 1] : "0,8" -> 0.8, "8/10" -> 0.8, "75 %" -> 0.75, entier 8 -> 0.8,
+    entier 80 -> 0.8 ; toute autre valeur hors bornes (1.5, 250) est ramenée à la borne.
+    Retourne None si la valeur est inexploitable.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        numbers = _NUMBER_RE.findall(value)
+        if not numbers:
+            return None
+        number = float(numbers[0].replace(",", "."))
+        if len(numbers) > 1 and "/" in value:   # "8/10"
+            denominator = float(numbers[1].replace(",", "."))
+            return repair_score(number / denominator) if denominator else None
+        if "%" in value:
+            number /= 100
+        value = number
+    if not isinstance(value, (int, float)) or value != value:   # NaN
+        return None
+    if value > 1 and value == int(value) and value <= 100:   # note entière sur 10 ou sur 100
+        value = value / 10 if value <= 10 else value / 100
+    return min(1.0, max(0.0, float(value)))
+
+
+def repair_scores(raw) -> dict:
+    """Notes validées (critères connus uniquement) ; un critère inexploitable est absent."""
+    if not isinstance(raw, dict):
+        return {}
+    normalized = {re.sub(r"[^a-z]", "", k.lower().replace("é", "e")): v for k, v in raw.items()}
+    scores = {}
+    for criterion in CRITERIA:
+        score = repair_score(normalized.get(criterion))
+        if score is not None:
+            scores[criterion] = score
+    return scores
+
+
+def parse_batch(content: str, n: int) -> dict:
+    """
+    Retourne {index: notes réparées} à partir de la réponse batch. Tolère une liste nue,
+    d'autres noms de clé que "notes", des id en chaîne, ou l'absence d'id (ordre positionnel).
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        return {}
+    if isinstance(data, dict):
+        entries = next((v for v in data.values() if isinstance(v, list)), None)
+        if entries is None and n == 1:
+            entries = [data]
+    else:
+        entries = data
+    if not isinstance(entries, list):
+        return {}
+
+    parsed = {}
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.get("id", position))
+        except (TypeError, ValueError):
+            index = position
+        if 0 <= index < n and index not in parsed:
+            parsed[index] = repair_scores(entry)
+    return parsed
+
+
+def is_complete(scores: dict) -> bool:
+    return all(c in scores for c in CRITERIA)
+
+
+class MicroBatcher:
+    """
+    Lots d'appels concurrents à submit() (`batch_size` éléments ou `max_wait` secondes), traités
+    dans le contexte du premier soumetteur. Avec `charge(coût, index, n)`, `process` retourne
+    (résultats, coût) et chaque soumetteur reçoit sa part du coût dans son propre contexte.
+    """
+
+    def __init__(self, process, batch_size: int = 8, max_wait: float = 0.2, charge=None):
+        self.process = process
+        self.charge = charge
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, item):
+        future = Future()
+        context = contextvars.copy_context()
+        batch = None
+        with self._lock:
+            self._pending.append((item, future, context))
+            if len(self._pending) >= self.batch_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch)
+        return future.result()
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch):
+        context = batch[0][2]
+        try:
+            results = context.run(self.process, [item for item, _, _ in batch])
+            if self.charge is not None:
+                results, cost = results
+                for index, (_, _, submitter) in enumerate(batch):
+                    submitter.run(self.charge, cost, index, len(batch))
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
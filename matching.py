@@ -0,0 +1,195 @@
+"""
+Recherche multi-termes de rule_evaluator (Partie 3) : une regex compilée par jeu de termes, sur
+texte normalisé (casse, accents, ligatures, pluriels) ; mentions niées ("sans viande") écartées.
+"""
+import bisect
+import re
+import unicodedata
+from functools import lru_cache
+
+_LIGATURES = {"œ": "oe", "æ": "ae", "ß": "ss"}
+_SEPARATOR = "\n\x00\n"   # séparateur des sorties concaténées en mode batch
+
+
+class _FoldTable(dict):
+    """Table paresseuse pour str.translate : chaque caractère n'est normalisé qu'une fois."""
+
+    def __missing__(self, code):
+        char = chr(code).casefold()
+        char = "".join(_LIGATURES.get(c, c) for c in char)
+        folded = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        self[code] = folded
+        return folded
+
+
+_FOLD = _FoldTable()
+
+
+def fold(text: str) -> str:
+    """Normalise un texte : casefold, sans accents, ligatures développées."""
+    return text.translate(_FOLD)
+
+
+def fold_with_offsets(text: str):
+    """Comme fold, mais retourne aussi offsets[i] = position dans `text` du i-ème caractère normalisé."""
+    folded = fold(text)
+    if len(folded) == len(text):
+        return folded, None   # cas courant : correspondance 1 pour 1
+    offsets = []
+    for i, char in enumerate(text):
+        offsets.extend([i] * len(fold(char)))
+    offsets.append(len(text))
+    return folded, offsets
+
+
+def stem(word: str) -> str:
+    """Racinisation légère : retire la marque du pluriel (s / x) des mots de plus de 3 lettres."""
+    if len(word) > 3 and word[-1] in "sx":
+        return word[:-1]
+    return word
+
+
+def term_pattern(term: str) -> str:
+    """Motif regex d'un terme (éventuellement composé de plusieurs mots) normalisé."""
+    words = re.findall(r"\w+", fold(term))
+    parts = [re.escape(stem(w)) + r"(?:s|x|es)?" for w in words]
+    return r"\b" + r"[\s\-']+".join(parts) + r"\b"
+
+
+class TermMatcher:
+    """Regex unique pour une liste de termes, chacun testé indépendamment (chevauchements compris)."""
+
+    def __init__(self, terms):
+        self.terms = [t for t in dict.fromkeys(terms) if re.search(r"\w", t)]
+        patterns = [term_pattern(t) for t in self.terms]
+        # Le premier lookahead (un des termes commence ici) écarte vite les autres positions ;
+        # puis un lookahead facultatif par terme, dont le groupe capture la correspondance
+        groups = "".join(f"(?:(?=({p})))?" for p in patterns)
+        self._regex = re.compile(r"\b(?=" + "|".join(patterns) + ")" + groups) if patterns else None
+
+    def _iter(self, folded):
+        if self._regex is None:
+            return
+        n = len(self.terms)
+        for m in self._regex.finditer(folded):
+            for i in range(n):
+                start, end = m.span(i + 1)
+                if start >= 0:
+                    yield i, start, end
+
+    def find(self, text: str) -> list:
+        """Liste de (terme, début, fin) dans le texte d'origine."""
+        folded, offsets = fold_with_offsets(text)
+        spans = []
+        for i, start, end in self._iter(folded):
+            if offsets is not None:
+                start, end = offsets[start], offsets[end]
+            spans.append((self.terms[i], start, end))
+        return spans
+
+    def found(self, text: str) -> set:
+        return {self.terms[i] for i, _, _ in self._iter(fold(text))}
+
+    def found_batch(self, texts: list) -> list:
+        """Termes trouvés pour chaque texte, en une seule passe sur les textes concaténés."""
+        joined, starts = _join(texts)
+        results = [set() for _ in texts]
+        for i, start, _ in self._iter(joined):
+            results[bisect.bisect_right(starts, start) - 1].add(self.terms[i])
+        return results
+
+
+def _join(texts: list):
+    """Textes normalisés concaténés (mode batch) et position de départ de chacun."""
+    folded = [fold(t) for t in texts]
+    starts = []
+    position = 0
+    for f in folded:
+        starts.append(position)
+        position += len(f) + len(_SEPARATOR)
+    return _SEPARATOR.join(folded), starts
+
+
+# -----------------------------------------------------------------------
+# --- Négation ---
+
+# Mention niée : "sans viande", "pas de poisson", "aucune crème", "ni beurre", "zéro sucre" ;
+# seul un article peut séparer le marqueur du terme ("sans sel au blé" n'exclut pas le blé)
+_NEGATION = re.compile(r"\b(?:sans|pas|aucune?|ni|zero|hors|exempte?s?)"
+                       r"(?:[\s\-']+(?:de|du|des|d|la|le|les|l|un|une))?[\s\-']+\Z")
+# Suite d'une énumération niée : "sans viande, poisson ni fruits de mer"
+# (pas après "et" ; un article n'est accepté qu'après "ni" / "ou" : "pas de légumes, du poisson"
+# reste affirmatif)
+_LIST_GAP = re.compile(r"[\s,]*(?:|\b(?:ni|ou)\b[\s\-']*(?:\b(?:de|du|des|d|la|le|les|l)\b[\s\-']*)?)")
+NEGATION_WINDOW = 24
+
+
+def affirmed(folded: str, hits) -> list:
+    """Correspondances (terme, début, fin) de `folded` qui ne sont pas sous une négation."""
+    kept = []
+    negated_end = None
+    for hit in hits:
+        start, end = hit[1], hit[2]
+        negated = (_NEGATION.search(folded[max(0, start - NEGATION_WINDOW):start]) is not None
+                   or (negated_end is not None and negated_end <= start
+                       and _LIST_GAP.fullmatch(folded, negated_end, start) is not None))
+        if negated:
+            negated_end = end
+        else:
+            kept.append(hit)
+    return kept
+
+
+class ExpectationMatcher:
+    """Termes interdits (must_avoid) et requis (must_include) d'un item ; les mentions niées ne comptent pas."""
+
+    def __init__(self, must_avoid=(), must_include=()):
+        self.must_avoid = list(must_avoid)
+        self.must_include = list(must_include)
+        self._matcher = TermMatcher(self.must_avoid + self.must_include)
+        self._avoid = set(self.must_avoid)
+        self._include = set(self.must_include)
+
+    def _scores(self, found: set) -> dict:
+        included = found & self._include
+        return {
+            "no_forbidden": 0.0 if found & self._avoid else 1.0,
+            "included_ratio": len(included) / len(self._include) if self._include else 1.0,
+        }
+
+    def _hits(self, folded: str) -> list:
+        return affirmed(folded, self._matcher._iter(folded))
+
+    def score(self, output: str) -> dict:
+        return self._scores({self._matcher.terms[i] for i, _, _ in self._hits(fold(output))})
+
+    def score_batch(self, outputs: list) -> list:
+        """Scores de milliers de sorties contre le même jeu d'attentes."""
+        joined, starts = _join(outputs)
+        found = [set() for _ in outputs]
+        for i, start, _ in self._hits(joined):
+            found[bisect.bisect_right(starts, start) - 1].add(self._matcher.terms[i])
+        return [self._scores(f) for f in found]
+
+    def matches(self, output: str) -> dict:
+        """Détail des correspondances affirmées : {"forbidden": [...], "included": [...]} avec positions."""
+        folded, offsets = fold_with_offsets(output)
+        spans = []
+        for i, start, end in self._hits(folded):
+            if offsets is not None:
+                start, end = offsets[start], offsets[end]
+            spans.append((self._matcher.terms[i], start, end))
+        return {
+            "forbidden": [s for s in spans if s[0] in self._avoid],
+            "included": [s for s in spans if s[0] in self._include],
+        }
+
+
+@lru_cache(maxsize=1024)
+def _compile(must_avoid: tuple, must_include: tuple) -> ExpectationMatcher:
+    return ExpectationMatcher(must_avoid, must_include)
+
+
+def compile_expectations(expected: dict) -> ExpectationMatcher:
+    """Matcher compilé (et mis en cache) pour un expected_output du dataset."""
+    return _compile(tuple(expected.get("must_avoid", [])), tuple(expected.get("must_include", [])))
@@ -0,0 +1,133 @@
+"""
+Mémoïsation des outils le temps d'une session d'agent : TTL, invalidation par événement
+(session.emit("fridge_update")), appels identiques concurrents exécutés une seule fois.
+"""
+import copy
+import functools
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_TTL = 300.0   # secondes
+
+# Événements -> outils dont les résultats deviennent obsolètes
+DEFAULT_INVALIDATIONS = {
+    "fridge_update": {"check_fridge"},
+    "menu_update": {"database_lookup"},
+    "nutrition_update": {"check_dietary_info"},
+    "recipes_update": {"get_recipe"},
+}
+
+
+def _args_key(args, kwargs) -> str:
+    return json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ToolSession:
+
+    def __init__(self, default_ttl: float = DEFAULT_TTL, ttls: dict = None, invalidations: dict = None):
+        """`ttls` : TTL par nom d'outil ; `invalidations` : événement -> noms d'outils."""
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.invalidations = {event: set(names) for event, names in (invalidations or DEFAULT_INVALIDATIONS).items()}
+        self._entries = {}   # (outil, clé d'arguments) -> (expiration, valeur)
+        self._inflight = {}  # (outil, clé d'arguments) -> Future de l'appel en cours
+        self._stats = {}     # outil -> {"hits", "misses"}
+        self._lock = threading.Lock()
+
+    # --- Enveloppes ---
+
+    def memoize(self, func, name: str = None, ttl: float = None):
+        """Version mémoïsée d'une fonction, rattachée à cette session."""
+        name = name or func.__name__
+        if ttl is not None:
+            self.ttls[name] = ttl
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self._call(name, func, args, kwargs)
+
+        return wrapper
+
+    def wrap(self, target, name: str = None, ttl: float = None):
+        """Fonction -> fonction mémoïsée ; Tool smolagents -> copie dont `forward` est mémoïsé."""
+        if callable(getattr(target, "forward", None)) and hasattr(target, "name"):
+            wrapped = copy.copy(target)
+            wrapped.forward = self.memoize(target.forward, name=name or target.name, ttl=ttl)
+            return wrapped
+        return self.memoize(target, name=name, ttl=ttl)
+
+    def wrap_registry(self, registry: dict) -> dict:
+        """Copie d'un registre {nom: fonction} dont toutes les fonctions sont mémoïsées."""
+        return {name: self.memoize(func, name=name) for name, func in registry.items()}
+
+    def _call(self, name, func, args, kwargs):
+        key = (name, _args_key(args, kwargs))
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(name, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                stats["hits"] += 1
+                return entry[1]
+            pending = self._inflight.get(key)
+            if pending is not None:
+                stats["hits"] += 1
+            else:
+                stats["misses"] += 1
+                future = self._inflight[key] = Future()
+
+        if pending is not None:
+            return pending.result()   # même appel déjà en cours dans un autre thread
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_exception(e)
+            raise
+        ttl = self.ttls.get(name, self.default_ttl)
+        with self._lock:
+            # Invalidé pendant l'appel : le résultat est rendu mais pas conservé
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+                if ttl > 0:
+                    self._entries[key] = (time.monotonic() + ttl, value)
+        future.set_result(value)
+        return value
+
+    # --- Invalidation ---
+
+    def invalidate(self, name: str = None):
+        """Oublie les résultats d'un outil (ou de tous les outils si `name` est None)."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._inflight.clear()
+            else:
+                self._entries = {k: v for k, v in self._entries.items() if k[0] != name}
+                self._inflight = {k: v for k, v in self._inflight.items() if k[0] != name}
+
+    def on(self, event: str, *names: str):
+        """Ajoute des outils à invalider quand `event` est émis."""
+        self.invalidations.setdefault(event, set()).update(names)
+
+    def emit(self, event: str):
+        """Signale un changement de données (ex : "fridge_update")."""
+        for name in self.invalidations.get(event, ()):
+            self.invalidate(name)
+
+    # --- Statistiques ---
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def hit_rate(self) -> float:
+        stats = self.stats.values()
+        hits = sum(s["hits"] for s in stats)
+        total = hits + sum(s["misses"] for s in stats)
+        return hits / total if total else 0.0
@@ -0,0 +1,195 @@
+"""
+Composition de menus multi-convives par séparation et évaluation (Partie 6) : un plat par service
+que tous les convives peuvent manger, dans le budget. Sans solution, Infeasible donne la preuve ;
+un allergène non renseigné par la carte est signalé dans `avertissements`.
+"""
+import heapq
+import re
+import time
+
+import numpy as np
+
+from matching import fold
+from product_store import ProductStore, normalize_allergen
+
+DEFAULT_COURSES = ("entrée", "plat", "dessert")
+DEFAULT_TOP_K = 3
+
+# Service -> catégories du catalogue
+COURSE_CATEGORIES = {
+    "aperitif": ("apéritif",),
+    "boisson": ("boisson",),
+    "entree": ("entrée",),
+    "plat": ("déjeuner", "dîner"),
+    "plat principal": ("déjeuner", "dîner"),
+    "dejeuner": ("déjeuner",),
+    "diner": ("dîner",),
+    "dessert": ("dessert",),
+    "petit dejeuner": ("petitdéjeuner",),
+    "petitdejeuner": ("petitdéjeuner",),
+}
+
+# Régime -> drapeau du plat qui doit être vrai (absent : plat exclu par prudence)
+DIETS = {"vegetarien": "végétarien", "vegetarienne": "végétarien", "vegetariens": "végétarien"}
+
+# Allergies exprimées en toutes lettres -> allergène du catalogue
+ALLERGEN_ALIASES = {"fruit a coque": "fruits à coque", "noix": "fruits à coque", "oeuf": "oeufs",
+                    "laitier": "lait", "lactose": "lait", "produit laitier": "lait"}
+
+_ALLERGY_PREFIX = re.compile(
+    r"^(?:\d+\s+)?(?:sans|allergi(?:e|que)s?|intoleran(?:t|te|ts|ce)s?|pas de)\s+"
+    r"(?:(?:a|au|aux|a la|de|du|des|d)\s+)?", re.I)
+
+
+def parse_constraint(text: str):
+    """("régime", drapeau) ou ("allergène", nom) pour une contrainte en français."""
+    folded = re.sub(r"[^\w\s]", " ", fold(text)).strip()
+    folded = re.sub(r"\s+", " ", folded)
+    words = folded.split()
+    for word in words:
+        if word in DIETS:
+            return "diet", DIETS[word]
+    allergen = _ALLERGY_PREFIX.sub("", folded).strip()
+    allergen = ALLERGEN_ALIASES.get(allergen, ALLERGEN_ALIASES.get(allergen.rstrip("s"), allergen))
+    return "allergen", normalize_allergen(allergen)
+
+
+class Infeasible(ValueError):
+    """Aucun menu ne respecte les contraintes ; `reasons` donne la preuve, `warnings` les allergènes non vérifiés."""
+
+    def __init__(self, reasons: list, warnings: list = ()):
+        super().__init__("; ".join(reasons))
+        self.reasons = reasons
+        self.warnings = list(warnings)
+
+
+class MenuSolver:
+    """Recherche des k menus les moins chers sur un ProductStore."""
+
+    def __init__(self, store: ProductStore):
+        self.store = store
+        self._flags = {}
+
+    def flag(self, name: str) -> np.ndarray:
+        """Tableau booléen (aligné sur store.products) du drapeau `name` des plats."""
+        if name not in self._flags:
+            self._flags[name] = np.array([bool(p.get(name)) for p in self.store.products], dtype=bool)
+        return self._flags[name]
+
+    def candidates(self, course: str, allergens: list, diets: list, prix_max: float = None):
+        """Positions (triées par prix) des plats du service compatibles avec tout le monde."""
+        key = fold(course).strip()
+        categories = COURSE_CATEGORIES.get(key)
+        if categories is None:
+            raise ValueError(f"service inconnu : {course!r} (connus : {', '.join(DEFAULT_COURSES)})")
+        found = np.concatenate([self.store.positions(c, prix_max=prix_max, sans_allergenes=allergens)
+                                for c in categories])
+        for diet in diets:
+            found = found[self.flag(diet)[found]]
+        return np.sort(found)   # positions croissantes = prix croissants
+
+    def _why_empty(self, course: str, allergens: list, diets: list) -> str:
+        """Contrainte qui vide un service (la première qui suffit, sinon leur combinaison)."""
+        if not len(self.candidates(course, [], [])):
+            return f"{course} : aucun plat de ce service à la carte"
+        for allergen in allergens:
+            if not len(self.candidates(course, [allergen], [])):
+                return f"{course} : tous les plats contiennent {allergen}"
+        for diet in diets:
+            if not len(self.candidates(course, [], [diet])):
+                return f"{course} : aucun plat {diet}"
+        constraints = ", ".join([f"sans {a}" for a in allergens] + diets)
+        return f"{course} : aucun plat compatible avec toutes les contraintes ({constraints})"
+
+    def solve(self, convives: int, constraints=(), courses=DEFAULT_COURSES, budget: float = None,
+              top_k: int = DEFAULT_TOP_K) -> dict:
+        """Les `top_k` menus les moins chers ; lève Infeasible avec la preuve s'il n'y en a aucun."""
+        start = time.perf_counter()
+        convives = max(1, int(convives))
+        top_k = max(1, int(top_k))
+        allergens, diets = [], []
+        for constraint in constraints or ():
+            kind, value = parse_constraint(constraint)
+            target = diets if kind == "diet" else allergens
+            if value and value not in target:
+                target.append(value)
+
+        # Allergène absent de toutes les fiches : aucun plat ne peut être exclu à coup sûr
+        unchecked = [a for a in allergens if a not in self.store.allergen_bits]
+        allergens = [a for a in allergens if a not in unchecked]
+        warnings = [f"{a} : allergène non renseigné sur les fiches de la carte, à vérifier auprès du restaurant"
+                    for a in unchecked]
+
+        prices = self.store.prices
+        per_course = [self.candidates(c, allergens, diets) for c in courses]
+        empty = [self._why_empty(c, allergens, diets) for c, found in zip(courses, per_course) if not len(found)]
+        if empty:
+            raise Infeasible(empty, warnings)
+
+        minimum = sum(prices[found[0]] for found in per_course) * convives
+        if budget is not None and minimum > budget + 1e-9:
+            raise Infeasible([f"coût minimal {minimum:.2f} € pour {convives} convives > budget {budget:.2f} €"],
+                             warnings)
+        if budget is not None:
+            # Prix maximal d'un plat : ce que le budget laisse une fois les autres services au minimum
+            for i, found in enumerate(per_course):
+                cap = (budget - minimum) / convives + prices[found[0]]
+                per_course[i] = found[:np.searchsorted(prices[found], cap + 1e-9, side="right")]
+
+        # Les services les plus contraints d'abord : moins de branches en haut de l'arbre
+        order = sorted(range(len(courses)), key=lambda i: len(per_course[i]))
+        remaining_min = [0.0] * (len(order) + 1)
+        for depth in range(len(order) - 1, -1, -1):
+            remaining_min[depth] = remaining_min[depth + 1] + prices[per_course[order[depth]][0]] * convives
+
+        best = []       # tas max (coût négatif) des top_k menus
+        chosen = [None] * len(courses)
+        explored = 0
+
+        def bound():
+            limit = budget if budget is not None else float("inf")
+            if len(best) == top_k:
+                limit = min(limit, -best[0][0])
+            return limit
+
+        def search(depth, cost):
+            nonlocal explored
+            if depth == len(order):
+                entry = (-cost, tuple(chosen))
+                if len(best) < top_k:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+                return
+            course = order[depth]
+            for position in per_course[course]:
+                explored += 1
+                total = cost + prices[position] * convives
+                # Plats triés par prix : si celui-ci dépasse la borne, les suivants aussi
+                if total + remaining_min[depth + 1] > bound() + 1e-9:
+                    break
+                if position in chosen:
+                    continue
+                chosen[course] = position
+                search(depth + 1, total)
+                chosen[course] = None
+
+        search(0, 0.0)
+        if not best:
+            raise Infeasible(["aucune combinaison de plats distincts ne respecte le budget"], warnings)
+
+        menus = []
+        for negative_cost, positions in sorted(best, key=lambda e: -e[0]):
+            cost = -negative_cost
+            menu = {"services": [{"service": course, "plat": self.store.products[p]["nom"],
+                                  "prix_unitaire": self.store.products[p]["prix"],
+                                  "total": round(float(self.store.products[p]["prix"]) * convives, 2)}
+                                 for course, p in zip(courses, positions)],
+                    "total": round(float(cost), 2), "par_personne": round(float(cost) / convives, 2)}
+            if budget is not None:
+                menu["reste"] = round(budget - float(cost), 2)
+            menus.append(menu)
+        return {"convives": convives,
+                "contraintes": {"sans": allergens, "regimes": diets, "non_verifiees": unchecked},
+                "avertissements": warnings, "budget": budget, "menus": menus, "explored": explored,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3)}
@@ -0,0 +1,365 @@
+"""
+Métriques locales des appels LLM par fonction et par modèle : latence, tokens, débit, cache,
+retries et erreurs. Exports démarrés par `start()` ou au premier appel mesuré, jamais à l'import.
+
+    metrics.metrics.prometheus_text() / metrics.metrics.snapshot()
+    CHEFBOT_METRICS=0, CHEFBOT_METRICS_PORT=9464, CHEFBOT_METRICS_JSON=metrics.json, CHEFBOT_METRICS_INTERVAL=60
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)            # secondes
+TOKENS_PER_S_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+
+_function = contextvars.ContextVar("chefbot_metrics_function", default="other")
+# Lu une fois : l'appel de os.getenv coûterait à lui seul ~2 µs par mesure
+_enabled = os.getenv("CHEFBOT_METRICS", "1") != "0"
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = bool(value)
+
+
+# -----------------------------------------------------------------------
+# --- Collecte ---
+
+class Histogram:
+    """Histogramme à seaux fixes (compteurs cumulés à l'export, comme Prometheus)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # dernier seau : +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimation (borne haute du seau) du quantile q."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _CallSeries:
+    """Mesures des appels d'un couple (fonction, modèle) : un seul accès dictionnaire par appel."""
+
+    __slots__ = ("statuses", "errors", "latency", "tokens_per_s", "prompt_tokens", "completion_tokens")
+
+    def __init__(self):
+        self.statuses = {}
+        self.errors = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.tokens_per_s = Histogram(TOKENS_PER_S_BUCKETS)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+
+class Metrics:
+    """Compteurs et histogrammes étiquetés, thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}     # (nom, étiquettes) -> valeur
+            self._histograms = {}   # (nom, étiquettes) -> Histogram
+            self._calls = {}        # (fonction, modèle) -> _CallSeries
+            self._started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record_call(self, function: str, model: str, duration_s: float, prompt_tokens: int = None,
+                    completion_tokens: int = None, error: str = None, cached: bool = False,
+                    generation_s: float = None):
+        """Un appel LLM terminé (ou échoué, `error` = type de l'exception)."""
+        status = "error" if error else "cache_hit" if cached else "ok"
+        key = (function or "other", model or "unknown")
+        with self._lock:
+            series = self._calls.get(key)
+            if series is None:
+                series = self._calls[key] = _CallSeries()
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+            if error:
+                series.errors[error] = series.errors.get(error, 0) + 1
+            if cached:
+                return
+            series.latency.observe(duration_s)
+            if prompt_tokens:
+                series.prompt_tokens += prompt_tokens
+            if completion_tokens:
+                series.completion_tokens += completion_tokens
+                seconds = generation_s or duration_s
+                if seconds > 0:
+                    series.tokens_per_s.observe(completion_tokens / seconds)
+
+    def _collect(self):
+        """(compteurs, histogrammes) à plat, étiquettes comprises ; à appeler sous le verrou."""
+        counters = dict(self._counters)
+        histograms = dict(self._histograms)
+        for (function, model), series in self._calls.items():
+            labels = (("function", function), ("model", model))
+            for status, count in series.statuses.items():
+                counters[("chefbot_llm_requests_total", labels + (("status", status),))] = count
+            for error, count in series.errors.items():
+                counters[("chefbot_llm_errors_total", labels + (("error", error),))] = count
+            if series.prompt_tokens:
+                counters[("chefbot_llm_prompt_tokens_total", labels)] = series.prompt_tokens
+            if series.completion_tokens:
+                counters[("chefbot_llm_completion_tokens_total", labels)] = series.completion_tokens
+            if series.latency.count:
+                histograms[("chefbot_llm_request_duration_seconds", labels)] = series.latency
+            if series.tokens_per_s.count:
+                histograms[("chefbot_llm_tokens_per_second", labels)] = series.tokens_per_s
+        return counters, histograms
+
+    # --- Export ---
+
+    def snapshot(self) -> dict:
+        """Vue JSON : compteurs et histogrammes (count, sum, p50, p95, seaux)."""
+        with self._lock:
+            counters, histograms = self._collect()
+            counters = [(name, dict(labels), value) for (name, labels), value in counters.items()]
+            histograms = [(name, dict(labels), h.count, h.sum, h.quantile(0.5), h.quantile(0.95),
+                           dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)))
+                          for (name, labels), h in histograms.items()]
+        return {
+            "timestamp": time.time(),
+            "uptime_s": time.time() - self._started,
+            "counters": [{"name": n, "labels": l, "value": v} for n, l, v in sorted(counters, key=_sort_key)],
+            "histograms": [{"name": n, "labels": l, "count": c, "sum": s, "p50": p50, "p95": p95, "buckets": b}
+                           for n, l, c, s, p50, p95, b in sorted(histograms, key=_sort_key)],
+        }
+
+    def prometheus_text(self) -> str:
+        """Format d'exposition texte de Prometheus (version 0.0.4)."""
+        with self._lock:
+            counters, histograms = self._collect()
+            counters = sorted(counters.items())
+            histograms = sorted((key, list(h.buckets), list(h.counts), h.sum, h.count)
+                                for key, h in histograms.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _sort_key(row):
+    return row[0], sorted(row[1].items())
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+metrics = Metrics()
+
+
+# -----------------------------------------------------------------------
+# --- Instrumentation ---
+
+def current_function() -> str:
+    return _function.get()
+
+
+def enter(name: str):
+    return _function.set(name)
+
+
+def leave(token):
+    _function.reset(token)
+
+
+@contextmanager
+def function(name: str):
+    """Étiquette "function" des appels LLM faits dans le bloc."""
+    token = _function.set(name)
+    try:
+        yield
+    finally:
+        _function.reset(token)
+
+
+def usage_of(response):
+    """(prompt_tokens, completion_tokens) d'une réponse Groq / OpenAI / LiteLLM."""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+@contextmanager
+def track(model: str, function: str = None):
+    """Mesure un appel LLM ; le bloc complète "response" (ou les tokens), "generation_s", "cached"."""
+    call = {}
+    if not enabled():
+        yield call
+        return
+    if not _started:
+        _start_on_first_use()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield call
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        prompt_tokens, completion_tokens = usage_of(call.get("response"))
+        metrics.record_call(
+            function or _function.get(), model, time.perf_counter() - start,
+            prompt_tokens=call.get("prompt_tokens", prompt_tokens),
+            completion_tokens=call.get("completion_tokens", completion_tokens),
+            error=error, cached=call.get("cached", False), generation_s=call.get("generation_s"),
+        )
+
+
+def count_retry(function: str = None, reason: str = "retry"):
+    if enabled():
+        metrics.inc("chefbot_llm_retries_total", function=function or _function.get(), reason=reason)
+
+
+# -----------------------------------------------------------------------
+# --- Exposition ---
+
+_exporters = {}
+_exporters_lock = threading.Lock()
+_started = False
+
+
+def write_snapshot(path: str):
+    """Écrit le snapshot JSON (remplacement atomique : un lecteur ne voit jamais un fichier partiel)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metrics.snapshot(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def start_json_exporter(path: str, interval: float = 60.0):
+    """Thread démon qui écrit un snapshot JSON toutes les `interval` secondes."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(path)
+            except OSError as e:
+                print(f"Metrics export failed: {e}")
+
+    with _exporters_lock:
+        if ("json", path) not in _exporters:
+            thread = threading.Thread(target=loop, name="chefbot-metrics-json", daemon=True)
+            thread.start()
+            _exporters[("json", path)] = thread
+    return _exporters[("json", path)]
+
+
+def serve_prometheus(port: int = 9464, host: str = "127.0.0.1"):
+    """Sert GET /metrics (texte Prometheus) depuis un thread démon ; retourne le serveur."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/metrics.json"):
+                self.send_error(404)
+                return
+            if self.path.startswith("/metrics.json"):
+                body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+            else:
+                body, content_type = metrics.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _exporters_lock:
+        if ("http", port) not in _exporters:
+            server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=server.serve_forever, name="chefbot-metrics-http", daemon=True).start()
+            _exporters[("http", port)] = server
+    return _exporters[("http", port)]
+
+
+def start():
+    """Démarre les exports CHEFBOT_METRICS_PORT / CHEFBOT_METRICS_JSON (idempotent)."""
+    global _started
+    _started = True
+    if not enabled():
+        return
+    if os.getenv("CHEFBOT_METRICS_PORT"):
+        serve_prometheus(int(os.environ["CHEFBOT_METRICS_PORT"]))
+    if os.getenv("CHEFBOT_METRICS_JSON"):
+        start_json_exporter(os.environ["CHEFBOT_METRICS_JSON"],
+                            float(os.getenv("CHEFBOT_METRICS_INTERVAL", "60")))
+
+
+def _start_on_first_use():
+    # Un export impossible (port déjà pris...) ne doit pas faire échouer l'appel LLM mesuré
+    try:
+        start()
+    except OSError as e:
+        print(f"Metrics export failed: {e}")
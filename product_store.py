@@ -0,0 +1,293 @@
+"""
+Plats de MenuDatabaseTool (Partie 5) : index par catégorie, prix triés, allergènes en bitmask,
+pagination. ProductStore en mémoire (NumPy), SQLiteProductStore pour les gros catalogues.
+"""
+import json
+import re
+import sqlite3
+
+import numpy as np
+
+from matching import fold
+
+DEFAULT_PAGE_SIZE = 10
+DEFAULT_TOP_K = 5
+MIN_NAME_SCORE = 0.3
+
+
+def normalize_allergen(name: str) -> str:
+    return fold(name.strip())
+
+
+def parse_allergens(value) -> list:
+    """Accepte un allergène, une liste, ou une chaîne séparée par des virgules."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [normalize_allergen(v) for v in value if str(v).strip()]
+
+
+def _page(total: int, page: int, page_size: int, results: list) -> dict:
+    return {"total": total, "page": page, "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size, "results": results}
+
+
+def _page_bounds(page, page_size):
+    page = max(1, int(page or 1))
+    page_size = max(1, int(page_size or DEFAULT_PAGE_SIZE))
+    return page, page_size, (page - 1) * page_size
+
+
+def trigrams(text: str) -> set:
+    """Trigrammes d'un texte normalisé, avec bourrage pour donner du poids aux débuts de mots."""
+    padded = "  " + re.sub(r"\s+", " ", text.strip()) + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Index inversé trigramme -> noms ; score de Dice, bonus si le nom (ou un mot) commence par la requête."""
+
+    def __init__(self, names):
+        self.names = [fold(n) for n in names]
+        postings = {}
+        sizes = []
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {g: np.array(ids, dtype=np.int64) for g, ids in postings.items()}
+        self.sizes = np.array(sizes, dtype=float)
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K, min_score: float = MIN_NAME_SCORE) -> list:
+        """Liste de (position, score) des `k` meilleurs noms, score décroissant."""
+        query = re.sub(r"\s+", " ", fold(query).strip())
+        if not query:
+            return []
+        grams = trigrams(query)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return []
+
+        ids, common = np.unique(np.concatenate(lists), return_counts=True)
+        scores = 2 * common / (len(grams) + self.sizes[ids])
+
+        # Présélection par Dice, puis bonus de préfixe sur les seuls candidats retenus
+        keep = min(len(ids), max(k * 4, 20))
+        best = np.argpartition(-scores, keep - 1)[:keep]
+        ranked = []
+        for j in best:
+            name = self.names[ids[j]]
+            score = float(scores[j])
+            if name == query:
+                score = 1.0
+            elif name.startswith(query) or f" {query}" in name:
+                score = min(1.0, score + 0.25)
+            if score >= min_score:
+                ranked.append((int(ids[j]), score))
+        ranked.sort(key=lambda r: (-r[1], r[0]))
+        return ranked[:k]
+
+
+def _with_score(product: dict, score: float) -> dict:
+    return {**product, "score": round(score, 3)}
+
+
+class ProductStore:
+    """Catalogue en mémoire, trié par prix, avec index de catégorie et bitmasks d'allergènes."""
+
+    def __init__(self, products):
+        products = list(products.values()) if isinstance(products, dict) else list(products)
+        products.sort(key=lambda p: p["prix"])
+        self.products = products
+
+        self.allergen_bits = {}
+        masks = []
+        for p in products:
+            mask = 0
+            for allergen in p.get("allergènes", []):
+                mask |= self._bit(normalize_allergen(allergen))
+            masks.append(mask)
+
+        self.prices = np.array([p["prix"] for p in products], dtype=float)
+        self.masks = np.array(masks, dtype=np.uint64)
+
+        positions = {}
+        for i, p in enumerate(products):
+            positions.setdefault(p["catégorie"], []).append(i)
+        self.by_category = {c: np.array(idx, dtype=np.int64) for c, idx in positions.items()}
+        self.names = NameIndex(p["nom"] for p in products)
+
+    def _bit(self, allergen: str) -> int:
+        if allergen not in self.allergen_bits:
+            if len(self.allergen_bits) >= 64:
+                raise ValueError("au plus 64 allergènes distincts sont supportés")
+            self.allergen_bits[allergen] = 1 << len(self.allergen_bits)
+        return self.allergen_bits[allergen]
+
+    def allergen_mask(self, allergens) -> int:
+        """Bitmask d'une liste d'allergènes ; un allergène inconnu n'exclut aucun plat."""
+        mask = 0
+        for allergen in parse_allergens(allergens):
+            mask |= self.allergen_bits.get(allergen, 0)
+        return mask
+
+    def categories(self) -> list:
+        return sorted(self.by_category)
+
+    def positions(self, categorie=None, prix_min=None, prix_max=None, sans_allergenes=None) -> np.ndarray:
+        """Positions (triées par prix) des plats correspondant aux filtres."""
+        if categorie:
+            candidates = self.by_category.get(categorie)
+            if candidates is None:
+                return np.empty(0, dtype=np.int64)
+        else:
+            candidates = np.arange(len(self.products))
+
+        # Les positions étant triées par prix, un filtre de prix est une tranche
+        prices = self.prices[candidates]
+        lo = np.searchsorted(prices, prix_min, side="left") if prix_min is not None else 0
+        hi = np.searchsorted(prices, prix_max, side="right") if prix_max is not None else len(candidates)
+        candidates = candidates[lo:hi]
+
+        excluded = self.allergen_mask(sans_allergenes)
+        if excluded:
+            candidates = candidates[(self.masks[candidates] & np.uint64(excluded)) == 0]
+        return candidates
+
+    def query(self, categorie=None, prix_min=None, prix_max=None, sans_allergenes=None,
+              page=1, page_size=DEFAULT_PAGE_SIZE) -> dict:
+        page, page_size, offset = _page_bounds(page, page_size)
+        found = self.positions(categorie, prix_min, prix_max, sans_allergenes)
+        results = [self.products[i] for i in found[offset:offset + page_size]]
+        return _page(len(found), page, page_size, results)
+
+    def search_name(self, name: str, k: int = DEFAULT_TOP_K, categorie=None, prix_max=None,
+                    sans_allergenes=None) -> list:
+        """Plats dont le nom ressemble à `name` (top-k, avec score), filtres optionnels."""
+        excluded = np.uint64(self.allergen_mask(sans_allergenes))
+        filtered = bool(categorie) or prix_max is not None or bool(excluded)
+        results = []
+        # Avec des filtres, on élargit la recherche pour garder k résultats après filtrage
+        for i, score in self.names.search(name, k=max(k * 10, 50) if filtered else k):
+            if categorie and self.products[i]["catégorie"] != categorie:
+                continue
+            if prix_max is not None and self.prices[i] > prix_max:
+                continue
+            if excluded and self.masks[i] & excluded:
+                continue
+            results.append(_with_score(self.products[i], score))
+            if len(results) == k:
+                break
+        return results
+
+
+class SQLiteProductStore:
+    """Même interface que ProductStore, adossée à SQLite (index (catégorie, prix))."""
+
+    def __init__(self, path: str, products=None, replace: bool = False):
+        """
+        Ouvre (ou crée) la base `path`. `products` n'amorce qu'une base vide : un catalogue
+        existant n'est remplacé que si `replace=True`.
+        """
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS allergens (name TEXT PRIMARY KEY, bit INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " id INTEGER PRIMARY KEY, nom TEXT NOT NULL, prix REAL NOT NULL, categorie TEXT NOT NULL,"
+            " allergen_mask INTEGER NOT NULL, data TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_cat_prix ON products(categorie, prix)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_prix ON products(prix)")
+        self.allergen_bits = dict(self._db.execute("SELECT name, bit FROM allergens"))
+        if products and (replace or not len(self)):
+            self.load(products)
+        else:
+            self._index_names()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def _index_names(self):
+        # L'index des noms reste en mémoire : quelques Mo même pour 100k plats
+        rows = self._db.execute("SELECT id, nom FROM products ORDER BY id").fetchall()
+        self._name_ids = [row[0] for row in rows]
+        self.names = NameIndex(row[1] for row in rows)
+
+    def load(self, products):
+        """Remplace le contenu de la base par `products` (dict ou liste de plats)."""
+        products = list(products.values()) if isinstance(products, dict) else list(products)
+        rows = []
+        for p in products:
+            mask = 0
+            for allergen in p.get("allergènes", []):
+                allergen = normalize_allergen(allergen)
+                if allergen not in self.allergen_bits:
+                    if len(self.allergen_bits) >= 63:   # entiers SQLite signés sur 64 bits
+                        raise ValueError("au plus 63 allergènes distincts sont supportés")
+                    self.allergen_bits[allergen] = 1 << len(self.allergen_bits)
+                mask |= self.allergen_bits[allergen]
+            rows.append((p["nom"], p["prix"], p["catégorie"], mask, json.dumps(p, ensure_ascii=False)))
+
+        with self._db:
+            self._db.execute("DELETE FROM products")
+            self._db.execute("DELETE FROM allergens")
+            self._db.executemany("INSERT INTO allergens VALUES (?, ?)", self.allergen_bits.items())
+            self._db.executemany(
+                "INSERT INTO products (nom, prix, categorie, allergen_mask, data) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        self._index_names()
+
+    def to_memory(self) -> ProductStore:
+        """Copie en mémoire de tout le catalogue (ex : pour le solveur de menus)."""
+        return ProductStore([json.loads(data) for (data,) in self._db.execute("SELECT data FROM products")])
+
+    def allergen_mask(self, allergens) -> int:
+        mask = 0
+        for allergen in parse_allergens(allergens):
+            mask |= self.allergen_bits.get(allergen, 0)
+        return mask
+
+    def categories(self) -> list:
+        return [c for (c,) in self._db.execute("SELECT DISTINCT categorie FROM products ORDER BY categorie")]
+
+    def _where(self, categorie, prix_min, prix_max, sans_allergenes):
+        clauses, params = [], []
+        if categorie:
+            clauses.append("categorie = ?")
+            params.append(categorie)
+        if prix_min is not None:
+            clauses.append("prix >= ?")
+            params.append(prix_min)
+        if prix_max is not None:
+            clauses.append("prix <= ?")
+            params.append(prix_max)
+        excluded = self.allergen_mask(sans_allergenes)
+        if excluded:
+            clauses.append("(allergen_mask & ?) = 0")
+            params.append(excluded)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, categorie=None, prix_min=None, prix_max=None, sans_allergenes=None,
+              page=1, page_size=DEFAULT_PAGE_SIZE) -> dict:
+        page, page_size, offset = _page_bounds(page, page_size)
+        where, params = self._where(categorie, prix_min, prix_max, sans_allergenes)
+        (total,) = self._db.execute(f"SELECT COUNT(*) FROM products{where}", params).fetchone()
+        rows = self._db.execute(
+            f"SELECT data FROM products{where} ORDER BY prix, id LIMIT ? OFFSET ?", params + [page_size, offset]
+        ).fetchall()
+        return _page(total, page, page_size, [json.loads(data) for (data,) in rows])
+
+    def search_name(self, name: str, k: int = DEFAULT_TOP_K, categorie=None, prix_max=None,
+                    sans_allergenes=None) -> list:
+        matches = self.names.search(name, k=max(k * 10, 50))
+        if not matches:
+            return []
+        scores = {self._name_ids[i]: score for i, score in matches}
+        where, params = self._where(categorie, None, prix_max, sans_allergenes)
+        id_filter = f"id IN ({', '.join('?' * len(scores))})"
+        where = f"{where} AND {id_filter}" if where else f" WHERE {id_filter}"
+        rows = self._db.execute(f"SELECT id, data FROM products{where}", params + list(scores)).fetchall()
+        ranked = sorted(rows, key=lambda r: (-scores[r[0]], r[0]))[:k]
+        return [_with_score(json.loads(data), scores[pid]) for pid, data in ranked]
@@ -0,0 +1,229 @@
+"""
+Registre paresseux des clients, modèles et agents : chaque objet (et son SDK) n'est créé qu'au
+premier `get(nom)` ; `registry.override(nom, objet)` le remplace (tests, replay).
+"""
+import asyncio
+import contextvars
+import functools
+import importlib
+import inspect
+import os
+import threading
+
+_factories = {}
+_instances = {}
+_lock = threading.RLock()
+
+
+def register(name: str, factory):
+    """Déclare (ou remplace) la fabrique d'un objet ; l'objet déjà construit est oublié."""
+    with _lock:
+        _factories[name] = factory
+        _instances.pop(name, None)
+    return factory
+
+
+def get(name: str):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        if name not in _instances:
+            try:
+                factory = _factories[name]
+            except KeyError:
+                raise KeyError(f"aucune fabrique enregistrée pour {name!r}") from None
+            _instances[name] = factory()
+        return _instances[name]
+
+
+def get_or_create(name: str, factory):
+    """get(), en enregistrant `factory` si le nom est inconnu."""
+    if name not in _factories:
+        with _lock:
+            _factories.setdefault(name, factory)
+    return get(name)
+
+
+def override(name: str, instance):
+    """Impose une instance (replay, faux client...) à la place de celle de la fabrique."""
+    with _lock:
+        _instances[name] = instance
+    return instance
+
+
+def reset(name: str = None):
+    """Oublie une instance (ou toutes) : elle sera reconstruite au prochain get()."""
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def is_built(name: str) -> bool:
+    return name in _instances
+
+
+# -----------------------------------------------------------------------
+# --- Fabriques par défaut ---
+
+# Groq et LiteLLM passent par le pool de connexions partagé (http_pool.py)
+
+def _groq():
+    import http_pool
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_pool.sync_client())
+
+
+def _langfuse():
+    # Provider échantillonné et export en arrière-plan : voir tracing.py
+    import tracing
+    return tracing.langfuse_client()
+
+
+def _response_cache():
+    # La base SQLite n'est ouverte (et créée) qu'au premier appel mis en cache
+    from cache import ResponseCache
+    return ResponseCache()
+
+
+register("groq", _groq)
+register("langfuse", _langfuse)
+register("response_cache", _response_cache)
+
+
+_async_groqs = {}   # boucle asyncio -> (client httpx de la boucle, AsyncGroq)
+
+
+def async_groq():
+    """Client AsyncGroq de la boucle asyncio courante (pool http_pool.async_client), sauf override."""
+    instance = _instances.get("async_groq")
+    if instance is not None:
+        return instance
+    import http_pool
+    loop = asyncio.get_running_loop()
+    http_client = http_pool.async_client()
+    with _lock:
+        for other in [l for l in _async_groqs if l.is_closed()]:
+            del _async_groqs[other]
+        built = _async_groqs.get(loop)
+        # Pool fermé puis recréé (http_pool.close()) : le client Groq est reconstruit dessus
+        if built is None or built[0] is not http_client:
+            from groq import AsyncGroq
+            built = _async_groqs[loop] = (http_client, AsyncGroq(api_key=os.getenv("GROQ_API_KEY"),
+                                                                  http_client=http_client))
+        return built[1]
+
+
+def litellm_model(model_id: str):
+    """LiteLLMModel smolagents partagé pour `model_id`, créé au premier appel."""
+    def factory():
+        import http_pool
+        from smolagents import LiteLLMModel
+        return LiteLLMModel(model_id=model_id, client=get_or_create("litellm", http_pool.PooledLiteLLM))
+    return get_or_create(f"litellm:{model_id}", factory)
+
+
+# -----------------------------------------------------------------------
+# --- Décorateur Langfuse paresseux ---
+
+def observe(func=None, **kwargs):
+    """Comme `langfuse.observe`, appliqué au premier appel tracé (générateurs : jusqu'à leur fin)."""
+    if func is None:
+        return lambda f: observe(f, **kwargs)
+
+    import metrics
+    import tracing
+    names = (kwargs.get("name") or func.__name__, func.__name__)
+    observed = None
+
+    def resolve():
+        nonlocal observed
+        if observed is None:
+            observed = importlib.import_module("langfuse").observe(**kwargs)(func)
+        return observed
+
+    def start(args, kw):
+        # Générateurs : exécuté dans un contexte propre à l'itération, jamais réinitialisé
+        sampled, _ = tracing.enter(*names)
+        metrics.enter(names[0])
+        return (resolve() if sampled else func)(*args, **kw)
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        def async_generator_wrapper(*args, **kw):
+            context = contextvars.copy_context()
+            return _aiterate_in(context, context.run(start, args, kw))
+        return async_generator_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kw):
+            context = contextvars.copy_context()
+            return _iterate_in(context, context.run(start, args, kw))
+        return generator_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kw):
+            sampled, token = tracing.enter(*names)
+            label = metrics.enter(names[0])
+            try:
+                return await (resolve() if sampled else func)(*args, **kw)
+            finally:
+                metrics.leave(label)
+                tracing.leave(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        sampled, token = tracing.enter(*names)
+        label = metrics.enter(names[0])   # étiquette "function" des métriques LLM (metrics.py)
+        try:
+            return (resolve() if sampled else func)(*args, **kw)
+        finally:
+            metrics.leave(label)
+            tracing.leave(token)
+    return wrapper
+
+
+def _iterate_in(context, generator):
+    """Itère `generator` en exécutant chaque étape dans `context`, jusqu'à épuisement ou fermeture."""
+    try:
+        item = context.run(next, generator)
+        while True:
+            try:
+                sent = yield item
+            except GeneratorExit:
+                raise
+            except BaseException as e:
+                item = context.run(generator.throw, e)
+            else:
+                item = context.run(generator.send, sent)
+    except StopIteration as e:
+        return e.value
+    finally:
+        context.run(generator.close)
+
+
+async def _aiterate_in(context, generator):
+    """Variante asynchrone : chaque étape est une tâche asyncio exécutée dans `context`."""
+    def step(awaitable):
+        return asyncio.get_running_loop().create_task(awaitable, context=context)
+
+    try:
+        item = await step(generator.__anext__())
+        while True:
+            try:
+                sent = yield item
+            except GeneratorExit:
+                raise
+            except BaseException as e:
+                item = await step(generator.athrow(e))
+            else:
+                item = await step(generator.asend(sent))
+    except StopAsyncIteration:
+        return
+    finally:
+        await step(generator.aclose())
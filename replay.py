@@ -0,0 +1,243 @@
+"""
+Record / replay de Groq, LiteLLM et Langfuse (CI, benchmarks) : "record" écrit une fixture JSON
+par requête, "replay" la relit avec une latence synthétique (ReplayMiss si absente), "auto" choisit.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+
+FIXTURES_DIR = os.getenv("CHEFBOT_FIXTURES_DIR", "fixtures")
+MODES = ("record", "replay", "auto")
+
+# En-têtes qui ne doivent pas être rejoués : le corps est stocké décodé
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+class ReplayMiss(KeyError):
+    """Aucune fixture enregistrée pour cette requête."""
+
+
+class FixtureStore:
+    """Fixtures sur disque : un fichier <hash>.json par requête."""
+
+    def __init__(self, directory: str = FIXTURES_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, data: dict):
+        with self._lock:
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+def synthetic_latency(latency) -> float:
+    """`latency` : secondes fixes, ou (moyenne, écart) pour un délai uniforme autour de la moyenne."""
+    if isinstance(latency, (tuple, list)):
+        mean, jitter = latency
+        return max(0.0, random.uniform(mean - jitter, mean + jitter))
+    return float(latency or 0.0)
+
+
+def _check_mode(mode):
+    if mode not in MODES:
+        raise ValueError(f"mode inconnu : {mode!r} (attendu : {', '.join(MODES)})")
+
+
+# -----------------------------------------------------------------------
+# --- Transport httpx (Groq, API Langfuse) ---
+
+def _request_payload(request: httpx.Request) -> dict:
+    body = request.content.decode("utf-8", errors="replace")
+    try:
+        body = json.loads(body) if body else None
+    except json.JSONDecodeError:
+        pass
+    return {"method": request.method, "url": str(request.url.copy_with(query=None)),
+            "query": sorted(request.url.params.multi_items()), "body": body}
+
+
+def _to_fixture(payload, response: httpx.Response) -> dict:
+    return {
+        "request": payload,
+        "response": {
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+            "body": response.content.decode("utf-8", errors="replace"),
+        },
+    }
+
+
+def _from_fixture(fixture, request) -> httpx.Response:
+    data = fixture["response"]
+    return httpx.Response(data["status"], headers=data["headers"],
+                          content=data["body"].encode("utf-8"), request=request)
+
+
+class ReplayTransport(httpx.BaseTransport):
+
+    def __init__(self, store: FixtureStore, mode: str = "replay", latency=0.0, transport=None):
+        _check_mode(mode)
+        self.store = store
+        self.mode = mode
+        self.latency = latency
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        payload = _request_payload(request)
+        key = self.store.key(payload)
+
+        if self.mode != "record":
+            fixture = self.store.load(key)
+            if fixture is not None:
+                time.sleep(synthetic_latency(self.latency))
+                return _from_fixture(fixture, request)
+            if self.mode == "replay":
+                raise ReplayMiss(f"{request.method} {request.url} ({key})")
+
+        response = self.transport.handle_request(request)
+        response.read()
+        self.store.save(key, _to_fixture(payload, response))
+        return _from_fixture(self.store.load(key), request)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+
+    def __init__(self, store: FixtureStore, mode: str = "replay", latency=0.0, transport=None):
+        _check_mode(mode)
+        self.store = store
+        self.mode = mode
+        self.latency = latency
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        payload = _request_payload(request)
+        key = self.store.key(payload)
+
+        if self.mode != "record":
+            fixture = self.store.load(key)
+            if fixture is not None:
+                await asyncio.sleep(synthetic_latency(self.latency))
+                return _from_fixture(fixture, request)
+            if self.mode == "replay":
+                raise ReplayMiss(f"{request.method} {request.url} ({key})")
+
+        response = await self.transport.handle_async_request(request)
+        await response.aread()
+        self.store.save(key, _to_fixture(payload, response))
+        return _from_fixture(self.store.load(key), request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def groq_client(store: FixtureStore, mode: str = "replay", latency=0.0):
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY") or "replay", max_retries=0,
+                http_client=httpx.Client(transport=ReplayTransport(store, mode, latency)))
+
+
+def async_groq_client(store: FixtureStore, mode: str = "replay", latency=0.0):
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=os.getenv("GROQ_API_KEY") or "replay", max_retries=0,
+                     http_client=httpx.AsyncClient(transport=AsyncReplayTransport(store, mode, latency)))
+
+
+# -----------------------------------------------------------------------
+# --- LiteLLM (modèles smolagents) ---
+
+class ReplayLiteLLM:
+    """
+    Remplaçant du module litellm pour `LiteLLMModel.client` : seules les complétions sont
+    enregistrées / rejouées, le reste est délégué au vrai module.
+    """
+
+    _IGNORED_KWARGS = {"api_key", "api_base", "timeout", "stream_options"}
+
+    def __init__(self, store: FixtureStore, mode: str = "replay", latency=0.0):
+        _check_mode(mode)
+        import litellm
+        self._litellm = litellm
+        self.store = store
+        self.mode = mode
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return getattr(self._litellm, name)
+
+    def completion(self, **kwargs):
+        payload = {"litellm": {k: v for k, v in kwargs.items() if k not in self._IGNORED_KWARGS}}
+        key = self.store.key(payload)
+
+        if self.mode != "record":
+            fixture = self.store.load(key)
+            if fixture is not None:
+                time.sleep(synthetic_latency(self.latency))
+                return self._litellm.ModelResponse(**fixture["response"])
+            if self.mode == "replay":
+                raise ReplayMiss(f"litellm {kwargs.get('model')} ({key})")
+
+        response = self._litellm.completion(**kwargs)
+        self.store.save(key, {"request": payload, "response": response.model_dump()})
+        return response
+
+
+def litellm_client(store: FixtureStore, mode: str = "replay", latency=0.0) -> ReplayLiteLLM:
+    return ReplayLiteLLM(store, mode, latency)
+
+
+# -----------------------------------------------------------------------
+# --- Langfuse ---
+
+def langfuse_client(store: FixtureStore, mode: str = "replay", latency=0.0):
+    """
+    Client Langfuse hors-ligne : les appels d'API passent par le transport de replay et
+    les spans OpenTelemetry restent en mémoire (client.span_exporter.get_finished_spans()).
+    """
+    from langfuse import Langfuse
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    import tracing
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=tracing.sampler())
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    client = Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY") or "pk-lf-replay",
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY") or "sk-lf-replay",
+        host=os.getenv("LANGFUSE_HOST") or "https://cloud.langfuse.com",
+        httpx_client=httpx.Client(transport=ReplayTransport(store, mode, latency)),
+        tracer_provider=provider,
+        # Les spans du SDK ne partent pas vers l'export OTLP de Langfuse : ils restent en mémoire
+        blocked_instrumentation_scopes=["langfuse-sdk"],
+    )
+    client.span_exporter = exporter
+    return client
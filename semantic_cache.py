@@ -0,0 +1,186 @@
+"""
+Cache sémantique des questions posées au chef (Partie 1) : une question reformulée retrouve la
+réponse d'une question proche (plongement local haché, cosinus sur un index NumPy, TTL puis LRU).
+Jamais utilisé au-delà de `max_temperature`.
+"""
+import hashlib
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from cache import MAX_CACHED_TEMPERATURE, effective_temperature
+from matching import fold, stem
+
+DEFAULT_DIM = 2048
+DEFAULT_THRESHOLD = 0.88
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL = 24 * 3600            # secondes
+DEFAULT_MAX_TEMPERATURE = MAX_CACHED_TEMPERATURE   # même seuil que le cache exact
+TEMPERATURE_STEP = 0.1             # largeur des tranches de température d'une portée
+
+STOPWORDS = frozenset(
+    "a au aux avec ce ces cette de des du elle en et il je j la le les leur ma me mes mon ne "
+    "nous on ou par pas pour qu que quel quelle quels quelles qui sa se ses son sur ta te tes "
+    "toi ton tu un une vos votre vous y est sont ai as avez peux peut puis faire quoi comment "
+    "ai-je moi mais donc ca cela".split()
+)
+# Mots de la demande elle-même ("que cuisiner ce soir") : peu de poids, pour que deux questions
+# ne se ressemblent que si elles portent sur les mêmes ingrédients / plats
+GENERIC_WORDS = frozenset(stem(w) for w in (
+    "cuisiner cuisine recette recettes idee idees soir midi matin marche recupere preparer "
+    "prepare plat plats manger repas aujourd hui demain envie proposer propose conseille "
+    "conseiller suggere suggerer".split()
+))
+GENERIC_WEIGHT = 0.25
+TRIGRAM_WEIGHT = 0.5      # poids total des trigrammes d'un mot, relatif au mot entier
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokens(text: str) -> list:
+    """Mots normalisés (sans accents, sans pluriel simple), mots vides retirés."""
+    return [stem(w) for w in _WORD_RE.findall(fold(text)) if w not in STOPWORDS]
+
+
+def embed(text: str, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Vecteur float32 de norme 1 : mots et trigrammes de caractères hachés avec un signe."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in tokens(text):
+        weight = GENERIC_WEIGHT if word in GENERIC_WORDS else 1.0
+        padded = f"<{word}>"
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        trigram_weight = weight * TRIGRAM_WEIGHT / max(1, len(trigrams)) ** 0.5
+        for feature, w in [(f"w:{word}", weight)] + [(t, trigram_weight) for t in trigrams]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % dim] += w if h & 0x80000000 else -w
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def temperature_band(temperature: float = None) -> float:
+    """Tranche de température d'une portée : 0.1 et 0.7 ne partagent jamais leurs réponses."""
+    if temperature is None:
+        return None
+    return round(round(float(temperature) / TEMPERATURE_STEP) * TEMPERATURE_STEP, 3)
+
+
+def scope_key(*parts) -> int:
+    """Identifiant de portée (ex : modèle + prompt système) : deux portées ne partagent rien."""
+    digest = hashlib.blake2b("\x00".join(map(str, parts)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class SemanticCache:
+    """Index NumPy question -> réponse, recherche par similarité cosinus."""
+
+    def __init__(self, dim: int = DEFAULT_DIM, threshold: float = DEFAULT_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 max_temperature: float = DEFAULT_MAX_TEMPERATURE):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            capacity = min(self.max_entries, 64)
+            self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            self._scopes = np.zeros(capacity, dtype=np.int64)
+            self._expires = np.zeros(capacity, dtype=np.float64)    # 0 : emplacement libre
+            self._used = np.zeros(capacity, dtype=np.float64)
+            self._entries = [None] * capacity                       # (question, réponse)
+            self._size = 0
+            self.stats = {"lookups": 0, "hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+
+    def __len__(self):
+        return int(np.count_nonzero(self._expires[:self._size] > time.time()))
+
+    def accepts(self, temperature: float = None) -> bool:
+        return effective_temperature(temperature) <= self.max_temperature
+
+    def get(self, question: str, temperature: float = None, scope: int = 0):
+        """Réponse d'une question assez proche, ou None. Retourne (réponse, similarité, question)."""
+        if not self.accepts(temperature):
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None
+        vector = embed(question, self.dim)
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            n = self._size
+            if n:
+                similarities = self._vectors[:n] @ vector
+                similarities[(self._scopes[:n] != scope) | (self._expires[:n] <= now)] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._used[best] = now
+                    self.stats["hits"] += 1
+                    cached_question, answer = self._entries[best]
+                    return answer, float(similarities[best]), cached_question
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, question: str, answer: str, temperature: float = None, scope: int = 0):
+        if not self.accepts(temperature) or not answer:
+            return
+        vector = embed(question, self.dim)
+        if not vector.any():
+            return   # question sans mot significatif : rien à comparer
+        now = time.time()
+        with self._lock:
+            slot = self._same_question(vector, scope, now)
+            if slot is None:
+                slot = self._free_slot(now)
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._expires[slot] = now + self.ttl
+            self._used[slot] = now
+            self._entries[slot] = (question, answer)
+
+    def _same_question(self, vector, scope: int, now: float):
+        """Emplacement d'une question identique déjà indexée (mise à jour plutôt que doublon)."""
+        n = self._size
+        if not n:
+            return None
+        same = np.flatnonzero((self._vectors[:n] @ vector >= 0.999) & (self._scopes[:n] == scope)
+                              & (self._expires[:n] > now))
+        return int(same[0]) if len(same) else None
+
+    def _free_slot(self, now: float) -> int:
+        n = self._size
+        expired = np.flatnonzero(self._expires[:n] <= now)
+        if len(expired):
+            return int(expired[0])
+        if n < len(self._expires):
+            self._size += 1
+            return n
+        if n < self.max_entries:
+            self._grow(min(self.max_entries, 2 * n))
+            self._size += 1
+            return n
+        self.stats["evictions"] += 1
+        return int(np.argmin(self._used[:n]))   # la moins récemment utilisée
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self._expires)
+        self._vectors = np.vstack([self._vectors, np.zeros((extra, self.dim), dtype=np.float32)])
+        self._scopes = np.concatenate([self._scopes, np.zeros(extra, dtype=np.int64)])
+        self._expires = np.concatenate([self._expires, np.zeros(extra)])
+        self._used = np.concatenate([self._used, np.zeros(extra)])
+        self._entries.extend([None] * extra)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["lookups"] + self.stats["bypassed"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        return {**stats, "entries": len(self), "hit_rate": self.hit_rate()}
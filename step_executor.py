@@ -0,0 +1,113 @@
+"""
+Étapes du planificateur (Partie 2) : exécution parallèle selon les dépendances, chaque étape
+ne recevant que les sorties dont elle dépend, dans un budget de tokens.
+"""
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_CONTEXT_BUDGET = 1500   # tokens par prompt d'étape
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation locale grossière (~4 caractères par token), suffisante pour un budget."""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[: max(0, max_tokens * 4 - 1)].rstrip() + "…"
+
+
+def normalize_plan(plan: dict) -> list:
+    """
+    Étapes {"id", "nom", "depend_de"} de la réponse de get_plan (ancien format : liste de chaînes,
+    chaque étape dépend de la précédente). Dépendances invalides ou cycliques ignorées.
+    """
+    steps = []
+    for i, step in enumerate(plan.get("etapes", [])):
+        if isinstance(step, dict):
+            name = str(step.get("nom") or step.get("name") or step.get("etape") or "")
+            deps = step.get("depend_de", step.get("depends_on", []))
+        else:
+            name = str(step)
+            deps = [i - 1] if i > 0 else []
+        if not isinstance(deps, list):
+            deps = [deps]
+        steps.append({"id": i, "nom": name, "depend_de": deps})
+
+    n = len(steps)
+    for step in steps:
+        clean = []
+        for d in step["depend_de"]:
+            try:
+                d = int(d)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= d < n and d != step["id"] and d not in clean:
+                clean.append(d)
+        step["depend_de"] = clean
+
+    # Suppression des cycles : on garde une dépendance seulement si elle ne ramène pas à l'étape
+    for step in steps:
+        step["depend_de"] = [d for d in step["depend_de"] if not _reaches(steps, d, step["id"])]
+    return steps
+
+
+def _reaches(steps, start, target) -> bool:
+    stack, seen = [start], set()
+    while stack:
+        current = stack.pop()
+        if current == target:
+            return True
+        if current in seen:
+            continue
+        seen.add(current)
+        stack.extend(steps[current]["depend_de"])
+    return False
+
+
+def compact_context(constraints: str, dependency_outputs: list,
+                    budget: int = DEFAULT_CONTEXT_BUDGET) -> str:
+    """
+    Contexte d'une étape : contraintes + sorties des étapes dont elle dépend.
+    Le budget restant après les contraintes est partagé équitablement entre les dépendances.
+    """
+    context = f"Contraintes accumulées : {constraints}"
+    if not dependency_outputs:
+        return context
+
+    remaining = budget - estimate_tokens(context)
+    share = max(0, remaining // len(dependency_outputs))
+    parts = [truncate_to_tokens(out, share) for out in dependency_outputs if share > 0]
+    return "\n".join([context, *parts])
+
+
+def run_steps(steps: list, execute, constraints: str,
+              budget: int = DEFAULT_CONTEXT_BUDGET, max_workers: int = 4, on_result=None) -> list:
+    """
+    Résultats dans l'ordre du plan. `execute(step_name, context)` tourne dans un pool de threads
+    (contexte copié : spans imbriqués) ; `on_result(step, result)` à la fin de chaque étape.
+    """
+    results = {}
+    remaining = {s["id"]: s for s in steps}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while remaining or running:
+            ready = [s for s in remaining.values() if all(d in results for d in s["depend_de"])]
+            for step in ready:
+                del remaining[step["id"]]
+                context = compact_context(constraints, [results[d] for d in step["depend_de"]], budget)
+                ctx = contextvars.copy_context()
+                future = pool.submit(ctx.run, execute, step["nom"], context)
+                running[future] = step
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                results[step["id"]] = future.result()
+                if on_result is not None:
+                    on_result(step, results[step["id"]])
+
+    return [results[s["id"]] for s in steps]
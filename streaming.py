@@ -0,0 +1,82 @@
+"""
+Streaming des complétions Groq (synchrone et asynchrone) avec mesure du
+time-to-first-token (TTFT) et du débit en tokens/seconde.
+"""
+import time
+
+
+def new_stats() -> dict:
+    return {"ttft_s": None, "duration_s": None, "tokens": 0, "tokens_per_s": None, "cached": False}
+
+
+def _start(stats):
+    # Le dict peut être fourni vide par l'appelant : on complète les champs manquants
+    for key, value in new_stats().items():
+        stats.setdefault(key, value)
+    stats["_start"] = time.perf_counter()
+
+
+def _on_chunk(stats, chunk):
+    """Met à jour les stats pour un chunk ; retourne le texte du chunk (ou "")."""
+    if not chunk.choices:
+        return ""
+    delta = chunk.choices[0].delta.content or ""
+    if delta:
+        if stats["ttft_s"] is None:
+            stats["ttft_s"] = time.perf_counter() - stats["_start"]
+        stats["tokens"] += 1
+    # Groq renvoie l'usage exact dans le dernier chunk (x_groq.usage)
+    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    if usage is not None and getattr(usage, "completion_tokens", None):
+        stats["tokens"] = usage.completion_tokens
+    return delta
+
+
+def _finish(stats):
+    start = stats.pop("_start")
+    stats["duration_s"] = time.perf_counter() - start
+    generation_s = stats["duration_s"] - (stats["ttft_s"] or 0.0)
+    if stats["tokens"] and generation_s > 0:
+        stats["tokens_per_s"] = stats["tokens"] / generation_s
+
+
+def stream_chat(client, messages: list, model: str, stats: dict = None, **params):
+    """
+    Générateur : produit les morceaux de texte au fil de l'eau.
+    `stats` (voir new_stats) est complété à la fin du flux.
+    """
+    stats = new_stats() if stats is None else stats
+    _start(stats)
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    try:
+        for chunk in stream:
+            delta = _on_chunk(stats, chunk)
+            if delta:
+                yield delta
+    finally:
+        _finish(stats)
+
+
+async def astream_chat(client, messages: list, model: str, stats: dict = None, **params):
+    """Équivalent asynchrone de stream_chat (client AsyncGroq)."""
+    stats = new_stats() if stats is None else stats
+    _start(stats)
+    stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    try:
+        async for chunk in stream:
+            delta = _on_chunk(stats, chunk)
+            if delta:
+                yield delta
+    finally:
+        _finish(stats)
+
+
+def cached_stream(content: str, stats: dict = None):
+    """Rejoue une réponse déjà en cache sous forme de flux (un seul morceau)."""
+    stats = new_stats() if stats is None else stats
+    _start(stats)
+    stats["cached"] = True
+    stats["ttft_s"] = time.perf_counter() - stats["_start"]
+    stats["tokens"] = 0
+    _finish(stats)
+    yield content
@@ -0,0 +1,214 @@
+"""
+Sorties JSON des appels LLM : `response_format` selon le modèle, réparation locale d'un JSON
+presque valide (sans nouvel appel) et compteurs. Aucun appel réseau ici.
+"""
+import json
+import re
+import threading
+
+# Modèles Groq qui acceptent response_format={"type": "json_schema", ...}
+JSON_SCHEMA_MODELS = {
+    "openai/gpt-oss-20b",
+    "openai/gpt-oss-120b",
+    "moonshotai/kimi-k2-instruct",
+    "moonshotai/kimi-k2-instruct-0905",
+    "meta-llama/llama-4-maverick-17b-128e-instruct",
+    "meta-llama/llama-4-scout-17b-16e-instruct",
+}
+
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "etapes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "nom": {"type": "string"},
+                    "depend_de": {"type": "array", "items": {"type": "integer"}},
+                },
+                "required": ["nom", "depend_de"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["etapes"],
+    "additionalProperties": False,
+}
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def response_format(model: str, name: str, schema: dict) -> dict:
+    """Génération contrainte par `schema` si `model` la supporte, mode JSON simple sinon."""
+    if model in JSON_SCHEMA_MODELS:
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+    return {"type": "json_object"}
+
+
+def failed_generation(error) -> str:
+    """Texte rejeté par Groq (erreur 400 "json_validate_failed") ; None pour toute autre erreur."""
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+        if isinstance(body, dict) and body.get("code") == "json_validate_failed":
+            return body.get("failed_generation")
+    return None
+
+
+# -----------------------------------------------------------------------
+# --- Réparation ---
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE_RE.search(text)
+    return match.group(1).strip() if match else text
+
+
+def _extract_object(text: str) -> str:
+    """Premier objet (ou tableau) JSON équilibré du texte : ignore ce qui l'entoure."""
+    start = next((i for i, c in enumerate(text) if c in "{["), None)
+    if start is None:
+        return text
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _normalize_syntax(text: str) -> str:
+    """Chaînes entre guillemets simples -> doubles, littéraux Python -> JSON, virgules finales."""
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':   # chaîne JSON : recopiée telle quelle (apostrophes comprises)
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif c == "'":
+            j, chars = i + 1, []
+            while j < n and text[j] != "'":
+                if text[j] == "\\" and j + 1 < n:
+                    chars.append(text[j + 1] if text[j + 1] == "'" else text[j:j + 2])
+                    j += 2
+                    continue
+                chars.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = j
+        else:
+            out.append(c)
+            i += 1
+    return _TRAILING_COMMA_RE.sub(r"\1", "".join(out))
+
+
+REPAIRS = (
+    ("code_fence", _strip_fences),
+    ("surrounding_text", _extract_object),
+    ("syntax", _normalize_syntax),
+)
+
+
+def repair_json(content: str):
+    """Retourne (données, réparations appliquées) ; lève json.JSONDecodeError si le texte reste illisible."""
+    try:
+        return json.loads(content), []
+    except json.JSONDecodeError as e:
+        error = e
+    applied = []
+    text = content.strip()
+    for name, repair in REPAIRS:
+        repaired = repair(text)
+        if repaired == text:
+            continue
+        text = repaired
+        applied.append(name)
+        try:
+            return json.loads(text), applied
+        except json.JSONDecodeError as e:
+            error = e
+    raise error
+
+
+# -----------------------------------------------------------------------
+# --- Métriques ---
+
+class ParseMetrics:
+    """Réponses parsées directement, réparées (par réparation), irréparables ; retries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {"parsed": 0, "repaired": 0, "failed": 0, "retries": 0,
+                            "recovered_generations": 0}
+            self._repairs = {}
+
+    def record(self, repairs: list = None, failed: bool = False):
+        with self._lock:
+            if failed:
+                self._counts["failed"] += 1
+            elif repairs:
+                self._counts["repaired"] += 1
+                for name in repairs:
+                    self._repairs[name] = self._repairs.get(name, 0) + 1
+            else:
+                self._counts["parsed"] += 1
+
+    def count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, repairs = dict(self._counts), dict(self._repairs)
+        total = counts["parsed"] + counts["repaired"] + counts["failed"]
+        counts["repair_rate"] = counts["repaired"] / total if total else 0.0
+        counts["failure_rate"] = counts["failed"] / total if total else 0.0
+        return {**counts, "by_repair": repairs}
+
+
+metrics = ParseMetrics()
+
+
+def parse(content: str, validate=None, stats: ParseMetrics = metrics):
+    """JSON réparé de `content`, validé par `validate` ; retourne (données, réparations)."""
+    try:
+        data, repairs = repair_json(content)
+        if validate is not None:
+            validate(data)
+    except Exception:
+        if stats is not None:
+            stats.record(failed=True)
+        raise
+    if stats is not None:
+        stats.record(repairs)
+    return data, repairs
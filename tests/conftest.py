@@ -0,0 +1,59 @@
+"""
+Configuration commune des tests : modules du dépôt importables, aucun accès réseau, cache
+SQLite et fixtures dans un dossier temporaire, faux client Groq via le registre.
+"""
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="chefbot-tests-")
+os.environ.setdefault("CHEFBOT_CACHE_PATH", os.path.join(_TMP, "cache.sqlite"))
+os.environ.setdefault("CHEFBOT_FIXTURES_DIR", os.path.join(_TMP, "fixtures"))
+os.environ["CHEFBOT_TRACING"] = "0"
+os.environ.setdefault("GROQ_API_KEY", "test")   # clients construits, jamais appelés
+for _name in ("CHEFBOT_METRICS_PORT", "CHEFBOT_METRICS_JSON", "CHEFBOT_MODEL_ROUTING", "CHEFBOT_CASCADE_SYNTHESIS"):
+    os.environ.pop(_name, None)
+
+
+class FakeCompletions:
+    """chat.completions.create : réponse produite par `reply(kwargs)`, appels conservés."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        content = self.reply(kwargs)
+        if not isinstance(content, str):
+            return content   # réponse complète fournie par le test (tool_calls...)
+        message = types.SimpleNamespace(content=content, tool_calls=None)
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)],
+            usage=types.SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+        )
+
+
+def fake_client(reply=None):
+    completions = FakeCompletions(reply or (lambda kwargs: "ok"))
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)), completions
+
+
+@pytest.fixture
+def fake_groq():
+    """Installe un faux client Groq ; `fake_groq(reply)` retourne ses completions."""
+    import registry
+
+    def install(reply=None):
+        client, completions = fake_client(reply)
+        registry.override("groq", client)
+        return completions
+
+    yield install
+    registry.reset("groq")
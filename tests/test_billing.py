@@ -0,0 +1,103 @@
+import math
+
+import pytest
+
+from billing import (PriceBook, UnknownDishes, UnsafeExpression, build_bill, compile_expression, order_totals,
+                     parse_order, safe_eval)
+from product_store import ProductStore
+
+MENU = [
+    {"nom": "Quiche Lorraine", "prix": 14, "allergènes": [], "catégorie": "déjeuner"},
+    {"nom": "Crème Brûlée", "prix": 9, "allergènes": [], "catégorie": "dessert"},
+    {"nom": "Tarte aux Pommes", "prix": 8, "allergènes": [], "catégorie": "dessert"},
+    {"nom": "Soupe de Légumes", "prix": 10, "allergènes": [], "catégorie": "entrée"},
+    {"nom": "Salade César", "prix": 12, "allergènes": [], "catégorie": "déjeuner"},
+    {"nom": "Salade de Quinoa", "prix": 12, "allergènes": [], "catégorie": "entrée"},
+]
+
+
+@pytest.fixture
+def prices():
+    return PriceBook(ProductStore(MENU))
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("3 * 12 + 9 / 2", 40.5),
+    ("round(87 / 6, 2)", 14.5),
+    ("12 € × 3", 36),
+    ("max(2, 3) ** 2", 9),
+    ("(-2) ** -2", 0.25),
+    ("sum([12, 9, 8]) / 3", 29 / 3),
+    ("max((14, 9)) - min(8, 10)", 6),
+])
+def test_safe_eval(expression, expected):
+    assert safe_eval(expression) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os')", "open('x')", "(1).__class__", "a + 1", "'a' * 3", "True + 1", "[x for x in (1,)]",
+])
+def test_safe_eval_rejects_non_arithmetic(expression):
+    with pytest.raises(UnsafeExpression):
+        safe_eval(expression)
+
+
+@pytest.mark.parametrize("expression", ["9**9**9**9", "((9**99)**99)**99", "2**(50+60)", "10.0**400"])
+def test_safe_eval_bounds_powers(expression):
+    with pytest.raises(UnsafeExpression):
+        safe_eval(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "sum([1] * 10**7)", "[0] * 10**9", "(1, 2) + (3,)", "[1, 2]", "abs([1])", "sum([[1] * 9])",
+])
+def test_safe_eval_rejects_sequence_arithmetic(expression):
+    with pytest.raises(UnsafeExpression):
+        compile_expression(expression)
+
+
+@pytest.mark.parametrize("expression", ["2 3", "2\u00a03", "1\u202f000"])
+def test_safe_eval_does_not_join_separated_numbers(expression):
+    with pytest.raises(UnsafeExpression):
+        safe_eval(expression)
+
+
+def test_parse_order_formats():
+    assert parse_order({"quiche": 2}) == [("quiche", 2)]
+    assert parse_order([["quiche", 1], "quiche", {"plat": "tarte", "quantite": 3}]) == [("quiche", 2), ("tarte", 3)]
+    with pytest.raises(ValueError):
+        parse_order({"quiche": "deux"})
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("quiche", "Quiche Lorraine"),
+    ("creme brulee", "Crème Brûlée"),
+    ("SALADE CÉSAR", "Salade César"),
+    ("tartes aux pommes", "Tarte aux Pommes"),
+    ("poires", None),              # ressemble à "Pommes" : jamais substitué
+    ("soupe de poisson", None),    # ressemble à "Soupe de Légumes"
+    ("salade", None),              # ambigu : César ou Quinoa
+])
+def test_resolve_is_strict(prices, name, expected):
+    product = prices.resolve(name)
+    assert (product and product["nom"]) == expected
+
+
+def test_build_bill(prices):
+    bill = build_bill(prices, {"quiche": 2, "crème brûlée": 2}, convives=4, budget=40)
+    assert bill["total"] == 46 and bill["articles"] == 4
+    assert bill["par_personne"] == 11.5
+    assert bill["budget"] == {"montant": 40, "reste": -6, "respecte": False}
+
+
+def test_build_bill_refuses_unknown_dishes(prices):
+    with pytest.raises(UnknownDishes) as error:
+        build_bill(prices, {"quiche": 1, "soupe de poisson": 1})
+    assert list(error.value.suggestions) == ["soupe de poisson"]
+    assert "Soupe de Légumes" in error.value.suggestions["soupe de poisson"]
+
+
+def test_order_totals(prices):
+    totals = order_totals(prices, [{"quiche": 2}, {"tarte aux pommes": 1, "creme brulee": 1}, {"poires": 1}])
+    assert totals[:2].tolist() == [28, 17]
+    assert math.isnan(totals[2])
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from cache import MAX_CACHED_TEMPERATURE, ResponseCache, cacheable, make_key
+from conftest import ROOT
+
+
+def test_make_key_ignores_parameter_order():
+    messages = [{"role": "user", "content": "bonjour"}]
+    assert make_key("m", messages, temperature=0, top_p=1) == make_key("m", messages, top_p=1, temperature=0)
+    assert make_key("m", messages, temperature=0) != make_key("m", messages, temperature=0.5)
+
+
+def test_response_cache_persists_and_expires(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.set("a", {"content": "x"})
+    cache.set("b", {"content": "y"}, ttl=-1)
+    reopened = ResponseCache(path)
+    assert reopened.get("a") == {"content": "x"}
+    assert reopened.get("b") is None
+    assert reopened.stats["disk_hits"] == 1
+
+
+def test_response_cache_memory_lru(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), memory_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "a"    # relu depuis SQLite
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_importing_chefbot_creates_no_cache_file(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != "CHEFBOT_CACHE_PATH"}
+    result = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import chefbot"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert os.listdir(tmp_path) == []
+
+
+def test_sampled_calls_are_not_cached(fake_groq):
+    import chefbot
+    completions = fake_groq(lambda kwargs: f"tirage {len(completions.calls)}")
+    messages = [{"role": "user", "content": "une idée de dessert (cache) ?"}]
+    assert chefbot._chat(messages, temperature=1.2) != chefbot._chat(messages, temperature=1.2)
+
+    chefbot.execute_step("courses (cache)", "contexte")
+    chefbot.execute_step("courses (cache)", "contexte")
+    assert len(completions.calls) == 3
+
+
+def test_cacheability_follows_the_effective_temperature():
+    assert cacheable(0) and cacheable(0.1) and cacheable(MAX_CACHED_TEMPERATURE)
+    assert not cacheable(0.7) and not cacheable(None)    # sans température : 1.0 chez Groq
+
+
+def test_low_temperature_calls_are_cached(fake_groq):
+    import chefbot
+    completions = fake_groq(lambda kwargs: f"tirage {len(completions.calls)}")
+    messages = [{"role": "user", "content": "une idée d'entrée (cache basse température) ?"}]
+    assert chefbot._chat(messages, temperature=0.1) == chefbot._chat(messages, temperature=0.1)
+    chefbot._chat(messages)
+    chefbot._chat(messages)
+    assert len(completions.calls) == 3
+    assert completions.calls[0]["temperature"] == 0.1 and "temperature" not in completions.calls[1]
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import cascade
+
+VEGETARIAN = cascade.expectations_for("Repas végétariens")
+MENU = "Menu sans viande ni poisson : légumes rôtis, lentilles et pois chiches pour toute la semaine."
+
+
+def test_expectations_from_constraints_and_dataset():
+    expectations = cascade.expectations_for("Sans gluten", {"must_include": ["légumes"]})
+    assert "blé" in expectations["must_avoid"]
+    assert expectations["must_include"] == ["légumes"]
+
+
+@pytest.mark.parametrize("output, reasons", [
+    (MENU, []),
+    ("Pas de viande, ni de poisson, ni de fruits de mer cette semaine : un curry de légumes.", []),
+    ("Lundi : poulet rôti et légumes, mardi : gratin de pâtes au fromage.", ["forbidden"]),
+    ("Sans viande le lundi, mais saumon grillé le mardi, et légumes de saison.", ["forbidden"]),
+    ("Risotto sans fromage aux fruits de mer, puis tarte sans sucre au thon.", ["forbidden"]),
+    ("Salade sans vinaigrette et poulet grillé.", ["forbidden"]),
+    ("", ["empty"]),
+    ("Désolé, je ne peux pas composer ce menu pour vous aujourd'hui.", ["refusal"]),
+])
+def test_check_output_understands_negation(output, reasons):
+    assert cascade.check_output(output, VEGETARIAN) == reasons
+
+
+def test_check_output_missing_required():
+    expectations = {"must_avoid": [], "must_include": ["légumes"]}
+    output = "Une semaine de repas sans légumes : riz, pâtes et semoule au menu."
+    assert cascade.check_output(output, expectations, require_included=True) == ["missing_required"]
+
+
+def test_synthesis_goes_to_large_model_unless_enabled(monkeypatch):
+    assert cascade.routing()["synthesis"] == ("large",)
+    monkeypatch.setenv("CHEFBOT_CASCADE_SYNTHESIS", "1")
+    assert cascade.routing()["synthesis"] == ("small", "large")
+    monkeypatch.setenv("CHEFBOT_MODEL_ROUTING", "synthesis=large,step=large")
+    assert cascade.routing()["synthesis"] == ("large",)
+    assert cascade.routing({"plan": "small"})["plan"] == ("small",)
+
+
+def test_run_escalates_on_check_and_on_error():
+    recorder = cascade.CascadeStats()
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        if model == cascade.TIERS["small"]:
+            raise TimeoutError
+        return "ok"
+
+    assert cascade.run("step", call, lambda out: [], ("small", "large"), recorder) == (
+        "ok", "large", [["error:TimeoutError"]])
+    output, tier, escalations = cascade.run("step", lambda model: model, lambda out: ["forbidden"],
+                                            ("small", "large"), recorder)
+    assert tier == "large" and escalations == [["forbidden"]]
+    assert recorder.snapshot()["by_stage"]["step"]["escalation_rate"] == 1.0
+
+
+def test_plan_weekly_menu_serves_negated_menus_from_small_model(fake_groq):
+    import chefbot
+
+    def reply(kwargs):
+        if "Décompose" in kwargs["messages"][-1]["content"]:
+            return json.dumps({"etapes": [{"nom": "entrées", "depend_de": []},
+                                          {"nom": "plats", "depend_de": [0]}]})
+        return MENU
+
+    completions = fake_groq(reply)
+    cascade.stats.reset()
+    assert chefbot.plan_weekly_menu("Repas végétariens", use_cache=False) == MENU
+    snapshot = cascade.stats.snapshot()["by_stage"]
+    assert snapshot["step"]["escalations"] == 0
+    assert snapshot["synthesis"]["served_by"] == {"large": 1}
+    assert [c["model"] for c in completions.calls].count(cascade.TIERS["large"]) == 1
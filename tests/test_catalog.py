@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import catalog
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "recipes.json").write_text(json.dumps({"Crème Brûlée": {"temps": 40}}), encoding="utf-8")
+    (tmp_path / "nutrition.json").write_text(json.dumps({
+        "ingredient": ["Œufs", "lait"],
+        "calories_per_100g": [155, None],
+        "calories_per_100ml": [None, 42],
+    }), encoding="utf-8")
+    (tmp_path / "fridge.json").write_text(json.dumps(["poireaux"]), encoding="utf-8")
+    return tmp_path
+
+
+def test_lookups_are_normalized(data_dir):
+    cat = catalog.Catalog(str(data_dir))
+    assert cat.get_recipe("  creme   BRULEE ") == {"temps": 40}
+    assert cat.get_nutrition("oeufs") == {"calories_per_100g": 155}   # colonnes nulles absentes
+    assert cat.get_nutrition("LAIT") == {"calories_per_100ml": 42}
+    assert cat.get_recipe("inconnu") is None
+
+
+def test_files_are_read_once(data_dir, monkeypatch):
+    cat = catalog.Catalog(str(data_dir))
+    reads = []
+    load = catalog._load_json
+    monkeypatch.setattr(catalog, "_load_json", lambda path: reads.append(path) or load(path))
+    for _ in range(3):
+        cat.get_recipe("crème brûlée")
+        cat.fridge
+    assert len(reads) == 2
+
+
+def test_update_fridge_persists_on_request(data_dir):
+    cat = catalog.Catalog(str(data_dir))
+    cat.update_fridge(["noix"])
+    assert cat.fridge == ["noix"]
+    assert catalog.Catalog(str(data_dir)).fridge == ["poireaux"]
+    cat.update_fridge(["noix", "poireaux"], persist=True)
+    assert catalog.Catalog(str(data_dir)).fridge == ["noix", "poireaux"]
+
+
+def test_tools_read_the_shared_catalog():
+    import tools
+
+    assert catalog.get_catalog() is catalog.get_catalog()
+    assert tools.get_recipe("Omelette") == catalog.get_catalog().get_recipe("omelette")
+    assert tools.check_dietary_info("oeufs") == catalog.get_catalog().get_nutrition("oeufs")
+    assert "error" in tools.get_recipe("plat inconnu")
+
+
+def test_tool_results_are_copies(data_dir):
+    cat = catalog.Catalog(str(data_dir))
+    cat.fridge.append("jambon")
+    cat.get_recipe("crème brûlée")["temps"] = 0
+    cat.get_nutrition("oeufs").clear()
+    assert cat.fridge == ["poireaux"]
+    assert cat.get_recipe("crème brûlée") == {"temps": 40}
+    assert cat.get_nutrition("oeufs") == {"calories_per_100g": 155}
@@ -0,0 +1,57 @@
+from conversation import EVICTED_TOOL_RESULT, ConversationMemory, count_tokens, extract_facts
+
+LONG = "Voici une longue réponse détaillée sur les menus de saison. " * 40
+
+
+def test_extract_facts():
+    facts = extract_facts("Budget de 80 euros pour 6 personnes, sans gluten et allergique aux noix.")
+    assert facts["budget"] == ["Budget de 80 euros"]
+    assert facts["convives"] == ["6 personnes"]
+    assert facts["contraintes"] == ["sans gluten", "allergique aux noix"]
+
+
+def test_pinned_facts_survive_summarization():
+    memory = ConversationMemory(budget=400, keep_turns=1)
+    memory.add_turn("Nous serons 4 personnes, budget 50 €, végétarien.", LONG)
+    for i in range(5):
+        memory.add_turn(f"Idée de dessert numéro {i} ?", LONG)
+    memory.add_user("Et pour samedi ?")
+    messages = memory.messages("Tu es ChefBot.")
+
+    system = messages[0]["content"]
+    assert "budget 50 €" in system and "4 personnes" in system and "végétarien" in system
+    assert "Résumé des échanges précédents" in system
+    assert memory.stats["summarized_turns"] >= 1
+    assert sum(count_tokens(m["content"]) for m in messages) <= 400 + 4 * len(messages)
+
+
+def test_budget_facts_are_replaced_constraints_accumulate():
+    memory = ConversationMemory()
+    memory.add_user("Budget 40 euros, sans lactose.")
+    memory.add_user("Finalement budget 60 euros, et sans gluten.")
+    assert memory.pinned["budget"] == ["budget 60 euros"]
+    assert memory.pinned["contraintes"] == ["sans lactose", "sans gluten"]
+
+
+def test_old_tool_results_are_evicted_first_but_pending_ones_are_kept():
+    memory = ConversationMemory(budget=300, keep_turns=2)
+    memory.add_user("Que reste-t-il au frigo ?")
+    memory.add({"role": "assistant", "content": None,
+                "tool_calls": [{"function": {"name": "check_fridge", "arguments": "{}"}}]})
+    memory.add({"role": "tool", "tool_call_id": "a", "content": LONG})
+    memory.add({"role": "assistant", "content": "Des poireaux."})
+    memory.add_user("Une recette ?")
+    memory.add({"role": "tool", "tool_call_id": "b", "content": LONG})
+
+    contents = [m["content"] for m in memory.messages("")]
+    assert EVICTED_TOOL_RESULT in contents       # ancien résultat remplacé
+    assert contents[-1] == LONG                  # pas encore lu par le modèle
+    assert memory.stats["evicted_tool_results"] == 1
+
+
+def test_prompt_for_string_agents():
+    memory = ConversationMemory(budget=1500)
+    memory.add_turn("Allergique aux arachides, 3 convives.", "Noté.")
+    prompt = memory.prompt("Un dessert ?")
+    assert "allergique aux arachides" in prompt.lower() and "3 convives" in prompt
+    assert "user : Allergique aux arachides" in prompt and prompt.endswith("Nouvelle demande : Un dessert ?")
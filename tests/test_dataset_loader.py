@@ -0,0 +1,77 @@
+import json
+import threading
+
+import pytest
+
+import dataset_loader
+from dataset_loader import InvalidCase, content_hash, load_cases, validate_case
+
+CASE = {"input": {"constraints": "Végétarien"}, "expected_output": {"must_avoid": ["viande"]}}
+
+
+class Recorder:
+    def __init__(self, fail_times=0):
+        self.items = []
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def __call__(self, **item):
+        with self._lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("503")
+            self.items.append(item)
+
+
+def test_validate_case_normalizes_and_rejects():
+    case = validate_case({"input": {"constraints": "  sans gluten "},
+                          "expected_output": {"must_include": [" légumes "], "max_calories_per_meal": 600.0}})
+    assert case["input"]["constraints"] == "sans gluten"
+    assert case["expected_output"] == {"must_avoid": [], "must_include": ["légumes"], "max_calories_per_meal": 600}
+    for bad in [[], {"input": {}}, {"input": {"constraints": "x"}, "expected_output": {}},
+                {"input": {"constraints": "x"}, "expected_output": {"must_avoid": [""]}}]:
+        with pytest.raises(InvalidCase):
+            validate_case(bad)
+
+
+def test_content_hash_ignores_key_order():
+    reordered = {"expected_output": {"must_avoid": ["viande"]}, "input": {"constraints": "Végétarien"}}
+    assert content_hash(validate_case(CASE)) == content_hash(validate_case(reordered))
+
+
+def test_jsonl_and_csv_files(tmp_path):
+    jsonl = tmp_path / "cas.jsonl"
+    jsonl.write_text("\n".join([json.dumps(CASE), "{pas du json", "", json.dumps(CASE)]), encoding="utf-8")
+    csv_file = tmp_path / "cas.csv"
+    csv_file.write_text("constraints,must_avoid,must_include\nSans lactose,lait|crème,légumes\n,,\n", encoding="utf-8")
+
+    recorder = Recorder()
+    stats = load_cases(str(jsonl), "ds", recorder, manifest=None, verbose=False)
+    assert (stats["valid"], stats["invalid"], stats["duplicates"], stats["uploaded"]) == (2, 1, 1, 1)
+    assert stats["errors"][0]["line"] == 2
+
+    stats = load_cases(str(csv_file), "ds", recorder, manifest=None, verbose=False)
+    assert stats["uploaded"] == 1 and stats["invalid"] == 1
+    assert recorder.items[-1]["expected_output"]["must_avoid"] == ["lait", "crème"]
+
+
+def test_reruns_skip_uploaded_cases_and_retry_failures(tmp_path):
+    manifest = str(tmp_path / "manifest.txt")
+    cases = [{"input": {"constraints": f"menu {i}"}, "expected_output": {"must_avoid": ["viande"]}}
+             for i in range(120)]
+    recorder = Recorder(fail_times=2)
+    stats = load_cases(cases, "ds", recorder, batch_size=10, workers=4, backoff=0, manifest=manifest, verbose=False)
+    assert stats["uploaded"] == 120 and stats["failed"] == 0
+    assert len({item["id"] for item in recorder.items}) == 120
+
+    again = load_cases(cases, "ds", recorder, manifest=manifest, verbose=False)
+    assert again["already_uploaded"] == 120 and again["uploaded"] == 0
+
+
+def test_failed_uploads_are_reported():
+    stats = load_cases([CASE], "ds", Recorder(fail_times=10), retries=1, backoff=0, manifest=None, verbose=False)
+    assert stats["failed"] == 1 and "503" in stats["errors"][0]["error"]
+
+
+def test_manifest_path_is_safe():
+    assert dataset_loader.manifest_path("chefbot/menu eval", "d").endswith(".dataset_manifest_chefbot_menu_eval.txt")
@@ -0,0 +1,70 @@
+import contextlib
+import json
+import threading
+import types
+
+import evaluation
+
+ITEMS = [{"id": f"item-{i}", "input": {"constraints": f"menu {i}"}, "expected_output": {"must_avoid": ["viande"]}}
+         for i in range(4)]
+
+
+def _task(input):
+    return f"Menu sans viande pour {input['constraints']}"
+
+
+def _evaluator(input, output, expected_output):
+    return {"length": len(output), "has_expected": float(bool(expected_output))}
+
+
+def test_runs_items_in_parallel_and_summarizes(tmp_path):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def task(input):
+        if input["constraints"] in ("menu 0", "menu 1"):
+            barrier.wait()   # deux items en même temps : pool de workers
+        return _task(input)
+
+    summary = evaluation.run_local_evaluation(ITEMS, task, [_evaluator], workers=2,
+                                              checkpoint_path=str(tmp_path / "ckpt.jsonl"), verbose=False)
+    assert summary["items"] == 4 and summary["errors"] == 0
+    assert summary["scores"]["has_expected"] == 1.0
+    assert summary["latency_p50_s"] is not None
+
+
+def test_resumes_from_checkpoint_and_replays_errors(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+
+    def flaky(input):
+        if input["constraints"] == "menu 2":
+            raise TimeoutError("groq")
+        return _task(input)
+
+    first = evaluation.run_local_evaluation(ITEMS, flaky, [_evaluator], checkpoint_path=str(path), verbose=False)
+    assert first["errors"] == 1
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"item_id": "tronqu')   # interruption en pleine écriture
+
+    replayed = []
+
+    def task(input):
+        replayed.append(input["constraints"])
+        return _task(input)
+
+    second = evaluation.run_local_evaluation(ITEMS, task, [_evaluator], checkpoint_path=str(path), verbose=False)
+    assert replayed == ["menu 2"]   # seul l'item en erreur est rejoué
+    assert second["items"] == 4 and second["errors"] == 0
+    assert set(evaluation.load_checkpoint(str(path))) == {item["id"] for item in ITEMS}
+
+
+def test_usage_is_reported_per_item(tmp_path):
+    @contextlib.contextmanager
+    def track_usage():
+        yield {"prompt_tokens": 10, "completion_tokens": 5}
+
+    items = [types.SimpleNamespace(id=None, input={"constraints": "x"}, expected_output=None)]
+    summary = evaluation.run_local_evaluation(items, _task, [], checkpoint_path=str(tmp_path / "c.jsonl"),
+                                              track_usage=track_usage, verbose=False)
+    assert summary["prompt_tokens"] == 10 and summary["completion_tokens"] == 5
+    record = json.loads((tmp_path / "c.jsonl").read_text())
+    assert record["item_id"] == "0"
@@ -0,0 +1,91 @@
+import asyncio
+import math
+import types
+
+import numpy as np
+import pytest
+
+import experiments
+import registry
+
+
+class FakeAsyncCompletions:
+    """Réponses "<question> à T=<température>" ; la concurrence maximale est mesurée."""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.active = self.peak = self.calls = 0
+
+    async def create(self, model, messages, temperature):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if temperature == self.fail_at:
+                raise RuntimeError("rate limit")
+            content = f"{messages[-1]['content']} à T={temperature}"
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=content))])
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def fake_async_groq():
+    completions = FakeAsyncCompletions(fail_at=1.2)
+    registry.override("async_groq", types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    yield completions
+    registry.reset("async_groq")
+
+
+def test_grid_runs_every_combination_within_concurrency(fake_async_groq):
+    results = asyncio.run(experiments.collect_grid(["a", "b"], [0.1, 0.7, 1.2], repeats=3, concurrency=4))
+    assert len(results) == fake_async_groq.calls == 18
+    assert fake_async_groq.peak <= 4
+    assert {(r["question"], r["temperature"], r["repeat"]) for r in results} == {
+        (q, t, r) for q in "ab" for t in (0.1, 0.7, 1.2) for r in range(3)}
+    errors = [r for r in results if r["error"]]
+    assert len(errors) == 6 and {r["temperature"] for r in errors} == {1.2}
+
+
+def test_cached_grid_replays_each_repeat(fake_async_groq):
+    asyncio.run(experiments.collect_grid(["cache"], [0.3], repeats=2, use_cache=True))
+    again = asyncio.run(experiments.collect_grid(["cache"], [0.3], repeats=2, use_cache=True))
+    assert fake_async_groq.calls == 2
+    assert sorted(r["repeat"] for r in again) == [0, 1]
+
+
+def test_pairwise_overlap():
+    matrix = experiments.pairwise_overlap(["Tarte aux poireaux", "tarte aux noix", ""])
+    assert matrix.shape == (3, 3)
+    assert matrix[0, 1] == pytest.approx(2 / 4)
+    assert np.allclose(np.diag(matrix)[:2], 1.0)
+    assert matrix[0, 2] == 0.0
+
+
+def test_diversity_stats_by_temperature():
+    results = [
+        {"question": "q", "temperature": 0.1, "content": "soupe de poireaux", "error": None},
+        {"question": "q", "temperature": 0.1, "content": "soupe de poireaux", "error": None},
+        {"question": "q", "temperature": 1.2, "content": "gratin aux noix et poireaux", "error": None},
+        {"question": "q", "temperature": 1.2, "content": None, "error": "timeout"},
+    ]
+    stats = experiments.diversity_stats(results)
+    assert stats[0.1]["overlap_mean"] == 1.0 and stats[0.1]["n"] == 2
+    assert stats[1.2]["n"] == 1 and math.isnan(stats[1.2]["overlap_mean"])
+    assert stats[1.2]["length_max"] == 5
+
+
+def test_grid_calls_are_measured(fake_async_groq):
+    import chefbot
+    import metrics
+
+    metrics.metrics.reset()
+    with chefbot.track_usage() as usage:
+        asyncio.run(experiments.collect_grid(["mesure"], [0.1, 1.2], repeats=2))
+    counters = {(c["name"], frozenset(c["labels"].items())): c["value"] for c in metrics.metrics.snapshot()["counters"]}
+    labels = {"function": "run_grid", "model": experiments.MODEL}
+    assert counters[("chefbot_llm_requests_total", frozenset({**labels, "status": "ok"}.items()))] == 2
+    assert counters[("chefbot_llm_requests_total", frozenset({**labels, "status": "error"}.items()))] == 2
+    assert usage["calls"] == 2
+    metrics.metrics.reset()
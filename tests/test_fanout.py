@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+import registry
+from fanout import ERROR, OK, TIMEOUT, UNKNOWN, fan_out, merge_answers
+
+
+def test_fan_out_runs_sub_tasks_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def agent(task):
+        barrier.wait()   # ne passe que si les trois sous-tâches tournent en même temps
+        return task.upper()
+
+    results = fan_out({"a": agent, "b": agent, "c": agent}, {"a": "x", "b": "y", "c": "z"}, timeout=5)
+    assert [r["status"] for r in results.values()] == [OK, OK, OK]
+    assert results["b"]["answer"] == "Y"
+
+
+def test_fan_out_reports_timeouts_errors_and_unknown_agents():
+    def slow(task):
+        time.sleep(1)
+
+    def broken(task):
+        raise RuntimeError("boom")
+
+    results = fan_out({"slow": slow, "broken": broken}, {"slow": "", "broken": "", "ghost": ""}, timeout=0.1)
+    assert results["slow"]["status"] == TIMEOUT
+    assert results["broken"]["status"] == ERROR and "boom" in results["broken"]["answer"]
+    assert results["ghost"]["status"] == UNKNOWN
+    assert "slow" in merge_answers(results)
+
+
+@pytest.fixture
+def fake_model():
+    from smolagents.models import Model
+    model = Model(model_id="fake")
+    registry.override("database_tools.model", model)
+    yield model
+    registry.reset("database_tools.model")
+    registry.reset("database_tools.empire")
+
+
+def test_empire_builds_with_managed_code_agents(fake_model):
+    import database_tools
+    empire = database_tools.get_empire()
+    assert set(empire["manager"].managed_agents) == {"nutritionist", "chef", "budget"}
+    assert set(empire["consult_agents"].agents) == {"nutritionist", "chef", "budget"}
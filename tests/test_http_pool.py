@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+
+import http_pool
+import registry
+
+
+def test_async_groq_uses_the_loop_pool():
+    async def clients():
+        return registry.async_groq(), registry.async_groq(), http_pool.async_client()
+
+    first, again, pool = asyncio.run(clients())
+    assert first is again
+    assert first._client is pool
+
+    second, _, other_pool = asyncio.run(clients())
+    assert second is not first and other_pool is not pool
+
+
+def test_async_groq_override_wins():
+    sentinel = object()
+    registry.override("async_groq", sentinel)
+    try:
+        assert asyncio.run(_get_async_groq()) is sentinel
+    finally:
+        registry.reset("async_groq")
+
+
+async def _get_async_groq():
+    return registry.async_groq()
+
+
+def test_close_closes_sync_and_async_clients():
+    sync = http_pool.sync_client()
+    loop = asyncio.new_event_loop()
+    try:
+        async_client = loop.run_until_complete(_pool_client())
+        http_pool.close()
+        assert sync.is_closed and async_client.is_closed
+        assert http_pool.sync_client() is not sync
+    finally:
+        loop.close()
+        http_pool.close()
+
+
+async def _pool_client():
+    return http_pool.async_client()
+
+
+def test_aclose_from_the_loop():
+    async def run():
+        client = http_pool.async_client()
+        await http_pool.aclose()
+        return client, http_pool.async_client()
+
+    closed, fresh = asyncio.run(run())
+    assert closed.is_closed and not fresh.is_closed
+
+
+def test_connections_are_reused():
+    http_pool.metrics.reset()
+    transport = http_pool.MeteredTransport(httpx.MockTransport(lambda request: httpx.Response(200)))
+    with httpx.Client(transport=transport) as client:
+        client.get("https://api.example/a")
+        client.get("https://api.example/b")
+    assert http_pool.stats()["requests"] == 2
+
+
+def test_grid_runs_share_the_loop_pool(monkeypatch):
+    import experiments
+
+    def reply(request):
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Tarte aux poireaux"}}],
+        })
+
+    monkeypatch.setattr(http_pool, "new_async_client",
+                        lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(reply)))
+
+    async def two_grids():
+        first = await experiments.collect_grid(["q"], [0.7], repeats=2)
+        second = await experiments.collect_grid(["q"], [0.7], repeats=1)
+        return first + second
+
+    results = asyncio.run(two_grids())
+    assert [r["error"] for r in results] == [None] * 3
+    assert {r["content"] for r in results} == {"Tarte aux poireaux"}
@@ -0,0 +1,119 @@
+import contextvars
+import json
+import threading
+import uuid
+
+import pytest
+
+from judge import (
+    MicroBatcher, batch_prompt, judge_key, parse_batch, repair_score, repair_scores, single_prompt,
+)
+
+EXPECTED = {"must_avoid": ["viande"], "must_include": ["légumes"]}
+
+
+@pytest.mark.parametrize("raw, score", [
+    ("0,8", 0.8), ("8/10", 0.8), (80, 0.8), (7, 0.7), (7.0, 0.7), ("75 %", 0.75), (-1, 0.0),
+    (1.5, 1.0), (9.5, 1.0), (250, 1.0),
+    (True, None), ("n/a", None), (float("nan"), None),
+])
+def test_repair_score(raw, score):
+    assert repair_score(raw) == pytest.approx(score) if score is not None else repair_score(raw) is None
+
+
+def test_repair_scores_keeps_known_criteria():
+    assert repair_scores({"Pertinence": "9/10", "créativité": 0.5, "autre": 1}) == {
+        "pertinence": 0.9, "creativite": 0.5}
+
+
+def test_parse_batch_tolerates_bare_list_and_string_ids():
+    content = json.dumps([{"id": "1", "pertinence": 1, "creativite": 1, "praticite": 1},
+                          {"id": 0, "pertinence": 0.5, "creativite": 0.5, "praticite": 0.5}])
+    parsed = parse_batch(content, 2)
+    assert parsed[0]["pertinence"] == 0.5 and parsed[1]["pertinence"] == 1.0
+    assert parse_batch("pas du json", 2) == {}
+
+
+def test_prompts_and_key_include_expectations():
+    assert "à éviter : viande" in single_prompt("végétarien", "menu", EXPECTED)
+    assert "Attentes" not in single_prompt("végétarien", "menu")
+    prompt = batch_prompt([{"question": "q0", "output": "m0", "expected": EXPECTED},
+                           {"question": "q1", "output": "m1"}])
+    assert prompt.count("à inclure : légumes") == 1
+    assert judge_key("q", "m", "model", EXPECTED) != judge_key("q", "m", "model")
+    assert judge_key("q", "m", "model", {}) == judge_key("q", "m", "model")
+
+
+def test_micro_batcher_groups_concurrent_submits():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(items) or [i * 2 for i in items],
+                           batch_size=3, max_wait=5)
+    results = [None] * 3
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit(i))) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [0, 2, 4]
+    assert len(batches) == 1
+
+
+def test_micro_batcher_timer_flush_keeps_submitter_context():
+    var = contextvars.ContextVar("submitter", default=None)
+    seen = []
+
+    def process(items):
+        seen.append(var.get())
+        return items
+
+    batcher = MicroBatcher(process, batch_size=8, max_wait=0.01)
+    var.set("evaluation")
+    assert batcher.submit("a") == "a"    # lot incomplet : part sur le thread du minuteur
+    assert seen == ["evaluation"]
+
+
+def test_micro_batcher_propagates_errors():
+    def process(items):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        MicroBatcher(process, batch_size=1).submit("a")
+
+
+def test_llm_judge_batched_counts_usage_and_sends_expectations(fake_groq):
+    import chefbot
+
+    scores = {"pertinence": 1, "creativite": 0.5, "praticite": 0.5}
+    completions = fake_groq(lambda kwargs: json.dumps(scores))
+    with chefbot.track_usage() as usage:
+        result = chefbot.llm_judge_batched(input="végétarien", output=f"menu {uuid.uuid4()}",
+                                           expected_output=EXPECTED)
+    assert result == {"pertinence": 1.0, "creativite": 0.5, "praticite": 0.5}
+    assert usage["calls"] == 1 and usage["prompt_tokens"] == 10
+    assert "à éviter : viande" in completions.calls[0]["messages"][0]["content"]
+
+
+def test_batched_usage_is_split_between_submitters(fake_groq, monkeypatch):
+    import chefbot
+
+    def reply(kwargs):
+        return json.dumps({"notes": [{"id": i, "pertinence": 1, "creativite": 1, "praticite": 1} for i in range(3)]})
+
+    fake_groq(reply)
+    monkeypatch.setattr(chefbot, "_judge_batcher",
+                        MicroBatcher(chefbot._judge_process, batch_size=3, max_wait=5, charge=chefbot._charge_usage))
+    usages = [None] * 3
+
+    def submit(i):
+        with chefbot.track_usage() as usage:
+            chefbot.llm_judge_batched(input="q", output=f"menu {uuid.uuid4()}")
+        usages[i] = usage
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(u["calls"] for u in usages) == 1
+    assert sorted(u["prompt_tokens"] for u in usages) == [3, 3, 4]
+    assert sum(u["completion_tokens"] for u in usages) == 5
@@ -0,0 +1,64 @@
+from matching import TermMatcher, compile_expectations, fold, fold_with_offsets
+
+
+def test_fold_accents_case_ligatures():
+    assert fold("Œufs BRÛLÉS") == "oeufs brules"
+    folded, offsets = fold_with_offsets("œuf")
+    assert folded == "oeuf" and offsets == [0, 0, 1, 2, 3]
+
+
+def test_plurals_and_compound_terms():
+    matcher = TermMatcher(["légume", "chou", "fruits de mer"])
+    assert matcher.found("Des LÉGUMES, des choux et des fruits-de-mer") == {"légume", "chou", "fruits de mer"}
+    assert matcher.found("choucroute") == set()    # mot entier uniquement
+
+
+def test_short_term_inside_longer_term_is_found():
+    matcher = TermMatcher(["pâtes sans gluten", "pâtes", "gluten"])
+    spans = matcher.find("Pâtes sans gluten")
+    assert ("pâtes", 0, 5) in spans
+    assert ("pâtes sans gluten", 0, 17) in spans
+    assert ("gluten", 11, 17) in spans
+
+
+def test_forbidden_prefix_of_required_term_is_reported():
+    expectations = compile_expectations({"must_avoid": ["pâtes"], "must_include": ["pâtes sans gluten"]})
+    assert expectations.score("Ce soir : pâtes sans gluten") == {"no_forbidden": 0.0, "included_ratio": 1.0}
+    assert [s[0] for s in expectations.matches("pâtes sans gluten")["forbidden"]] == ["pâtes"]
+
+
+def test_find_maps_positions_to_original_text():
+    text = "Un bœuf, des œufs"
+    (term, start, end), = TermMatcher(["oeuf"]).find(text)
+    assert text[start:end] == "œufs"
+
+
+def test_found_batch_matches_individual_calls():
+    matcher = TermMatcher(["viande", "poisson", "légumes"])
+    texts = ["viande et légumes", "", "poissons", "rien ici"]
+    assert matcher.found_batch(texts) == [matcher.found(t) for t in texts]
+
+
+def test_scores_without_expectations():
+    assert compile_expectations({}).score("n'importe quoi") == {"no_forbidden": 1.0, "included_ratio": 1.0}
+    assert TermMatcher(["", " "]).found("texte") == set()
+
+
+def test_negated_mentions_are_ignored():
+    expectations = compile_expectations({"must_avoid": ["viande", "poisson"], "must_include": ["légumes"]})
+    texts = ["Sans viande ni poisson, des légumes", "Pas de légumes, du poisson", "sans sel, viande grillée"]
+    assert expectations.score_batch(texts) == [expectations.score(t) for t in texts] == [
+        {"no_forbidden": 1.0, "included_ratio": 1.0},
+        {"no_forbidden": 0.0, "included_ratio": 0.0},
+        {"no_forbidden": 0.0, "included_ratio": 0.0},
+    ]
+    assert expectations.matches("Sans viande ni poisson")["forbidden"] == []
+
+
+def test_negation_covers_only_the_term_right_after_the_marker():
+    expectations = compile_expectations({"must_avoid": ["crevettes", "blé"]})
+    assert expectations.score("Risotto sans lactose aux crevettes")["no_forbidden"] == 0.0
+    assert expectations.score("Pain sans sel au blé complet")["no_forbidden"] == 0.0
+    assert expectations.score("Sans gluten et crevettes sautées")["no_forbidden"] == 0.0
+    assert expectations.score("Pas de crevettes, ni de blé")["no_forbidden"] == 1.0
+    assert expectations.score("Sans les crevettes, exempt de blé")["no_forbidden"] == 1.0
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from memo import ToolSession
+
+
+def test_repeated_calls_are_served_from_the_session():
+    calls = []
+    session = ToolSession()
+    lookup = session.memoize(lambda dish: calls.append(dish) or {"dish": dish}, name="get_recipe")
+    assert lookup("omelette") == lookup("omelette") == {"dish": "omelette"}
+    lookup(dish="omelette")   # appel nommé : clé distinte de l'appel positionnel
+    lookup(dish="omelette")
+    assert calls == ["omelette", "omelette"]
+    assert session.stats["get_recipe"] == {"hits": 2, "misses": 2}
+
+
+def test_ttl_and_events_invalidate():
+    calls = []
+    session = ToolSession(ttls={"check_fridge": 0})
+    fridge = session.memoize(lambda: calls.append(1) or ["poireaux"], name="check_fridge")
+    fridge()
+    fridge()
+    assert len(calls) == 2   # TTL nul : jamais conservé
+
+    session.ttls["check_fridge"] = 60
+    fridge()
+    fridge()
+    assert len(calls) == 3
+    session.emit("fridge_update")
+    fridge()
+    assert len(calls) == 4
+
+
+def test_sessions_are_isolated_and_wrap_copies_tools():
+    class Lookup:
+        name = "database_lookup"
+
+        def __init__(self):
+            self.calls = 0
+
+        def forward(self, product_name=None):
+            self.calls += 1
+            return product_name
+
+    tool = Lookup()
+    first, second = ToolSession().wrap(tool), ToolSession().wrap(tool)
+    first.forward("quiche")
+    first.forward("quiche")
+    second.forward("quiche")
+    assert tool.calls == 2 and tool.forward is not first.forward
+
+
+def test_parallel_identical_calls_run_once():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["poireaux"]
+
+    session = ToolSession()
+    fridge = session.memoize(slow, name="check_fridge")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fridge())) for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [["poireaux"]] * 3 and len(calls) == 1
+    assert session.stats["check_fridge"] == {"hits": 2, "misses": 1}
+
+
+def test_errors_are_not_memoized():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise TimeoutError
+        return "ok"
+
+    session = ToolSession()
+    tool = session.memoize(flaky, name="flaky")
+    with pytest.raises(TimeoutError):
+        tool()
+    assert tool() == "ok" and tool() == "ok" and len(calls) == 2
@@ -0,0 +1,147 @@
+import itertools
+import json
+import random
+
+import pytest
+
+from menu_solver import Infeasible, MenuSolver, parse_constraint
+from product_store import ProductStore
+
+PRODUCTS = [
+    {"nom": "Kir", "prix": 4, "allergènes": [], "catégorie": "apéritif", "végétarien": True},
+    {"nom": "Jus de pomme", "prix": 3, "allergènes": [], "catégorie": "apéritif", "végétarien": True},
+    {"nom": "Soupe de Légumes", "prix": 6, "allergènes": [], "catégorie": "entrée", "végétarien": True},
+    {"nom": "Tartare de saumon", "prix": 9, "allergènes": ["poisson"], "catégorie": "entrée"},
+    {"nom": "Salade aux noix", "prix": 7, "allergènes": ["fruits à coque"], "catégorie": "entrée",
+     "végétarien": True},
+    {"nom": "Quiche Lorraine", "prix": 14, "allergènes": ["gluten", "lait", "oeufs"], "catégorie": "déjeuner"},
+    {"nom": "Risotto", "prix": 13, "allergènes": ["lait"], "catégorie": "dîner", "végétarien": True},
+    {"nom": "Poulet rôti", "prix": 12, "allergènes": [], "catégorie": "déjeuner"},
+    {"nom": "Crème Brûlée", "prix": 6, "allergènes": ["lait", "oeufs"], "catégorie": "dessert", "végétarien": True},
+    {"nom": "Salade de fruits", "prix": 5, "allergènes": [], "catégorie": "dessert", "végétarien": True},
+]
+
+
+FULL_MENU = ["apéritif", "entrée", "plat", "dessert"]
+
+
+@pytest.fixture
+def solver():
+    return MenuSolver(ProductStore(PRODUCTS))
+
+
+def test_parse_constraint():
+    assert parse_constraint("Végétarien") == ("diet", "végétarien")
+    assert parse_constraint("sans gluten") == ("allergen", "gluten")
+    assert parse_constraint("allergique aux noix") == ("allergen", "fruits a coque")
+    assert parse_constraint("2 intolérants au lactose") == ("allergen", "lait")
+
+
+def test_cheapest_menus_for_all_guests(solver):
+    result = solver.solve(4, ["sans lait"], FULL_MENU, budget=200, top_k=3)
+    first = result["menus"][0]
+    assert [s["plat"] for s in first["services"]] == ["Jus de pomme", "Soupe de Légumes", "Poulet rôti",
+                                                      "Salade de fruits"]
+    assert (first["total"], first["par_personne"], first["reste"]) == (104, 26, 96)
+    assert [m["total"] for m in result["menus"]] == [104, 108, 108]
+    assert result["contraintes"] == {"sans": ["lait"], "regimes": [], "non_verifiees": []}
+    assert result["avertissements"] == []
+
+
+def test_budget_and_top_k_bound_the_search(solver):
+    assert [m["total"] for m in solver.solve(4, ["sans lait"], FULL_MENU, budget=107, top_k=5)["menus"]] == [104]
+    assert len(solver.solve(4, ["sans lait"], FULL_MENU, budget=108, top_k=5)["menus"]) == 3
+    assert len(solver.solve(4, ["sans lait"], FULL_MENU, top_k=1)["menus"]) == 1
+
+
+def test_dishes_are_distinct_across_courses(solver):
+    menus = solver.solve(1, courses=["plat", "dîner"], top_k=5)["menus"]
+    assert [[s["plat"] for s in m["services"]] for m in menus] == [["Poulet rôti", "Risotto"],
+                                                                   ["Quiche Lorraine", "Risotto"]]
+
+
+def test_matches_brute_force_on_random_catalogs():
+    rng = random.Random(7)
+    courses = {"boisson": "boisson", "entrée": "entrée", "dîner": "dîner", "dessert": "dessert"}
+    for _ in range(20):
+        products = [{"nom": f"Plat {i}", "prix": rng.randint(2, 30), "catégorie": rng.choice(list(courses.values())),
+                     "allergènes": rng.sample(["gluten", "lait", "oeufs"], rng.randint(0, 2))} for i in range(30)]
+        convives, budget = rng.randint(1, 6), rng.randint(60, 300)
+        by_course = [[p["prix"] for p in products if p["catégorie"] == c and "gluten" not in p["allergènes"]]
+                     for c in courses.values()]
+        expected = sorted(sum(combo) * convives for combo in itertools.product(*by_course)
+                          if sum(combo) * convives <= budget)[:4]
+        try:
+            menus = MenuSolver(ProductStore(products)).solve(convives, ["sans gluten"], list(courses),
+                                                             budget=budget, top_k=4)["menus"]
+        except Infeasible:
+            menus = []
+        assert [m["total"] for m in menus] == expected
+
+
+def test_no_dish_for_a_course_explains_why(solver):
+    with pytest.raises(Infeasible) as e:
+        solver.solve(2, ["végétarien", "sans lait"])
+    assert e.value.reasons == ["plat : aucun plat compatible avec toutes les contraintes (sans lait, végétarien)"]
+
+    with pytest.raises(Infeasible) as e:
+        solver.solve(2, courses=["petit déjeuner"])
+    assert e.value.reasons == ["petit déjeuner : aucun plat de ce service à la carte"]
+
+    with pytest.raises(Infeasible) as e:
+        solver.solve(2, ["sans poisson"], courses=["entrée", "plat", "dessert"], budget=10)
+    assert e.value.reasons[0].startswith("coût minimal 46.00 € pour 2 convives > budget 10.00 €")
+
+
+def test_aperitif_is_its_own_category(solver):
+    assert solver.solve(1, courses=["apéritif"])["menus"][0]["services"][0]["plat"] == "Jus de pomme"
+    drinks_only = MenuSolver(ProductStore([{"nom": "Limonade", "prix": 3, "allergènes": [], "catégorie": "boisson"}]))
+    with pytest.raises(Infeasible) as e:
+        drinks_only.solve(1, courses=["apéritif"])
+    assert e.value.reasons == ["apéritif : aucun plat de ce service à la carte"]
+
+
+def test_untracked_allergens_are_reported_not_satisfied(solver):
+    result = solver.solve(2, ["sans sésame", "sans lait"], ["entrée"])
+    assert result["contraintes"]["sans"] == ["lait"]
+    assert result["contraintes"]["non_verifiees"] == ["sesame"]
+    assert result["avertissements"][0].startswith("sesame : allergène non renseigné")
+    with pytest.raises(Infeasible) as e:
+        solver.solve(2, ["sans sésame"], ["entrée"], budget=1)
+    assert len(e.value.warnings) == 1
+
+
+def test_unknown_course_is_an_error(solver):
+    with pytest.raises(ValueError, match="service inconnu"):
+        solver.solve(2, courses=["goûter"])
+
+
+def test_compose_menu_tool(tmp_path):
+    from database_tools import MenuComposerTool, MenuDatabaseTool
+    from product_store import SQLiteProductStore
+
+    path = str(tmp_path / "menu.sqlite")
+    SQLiteProductStore(path, PRODUCTS)
+    composer = MenuComposerTool(MenuDatabaseTool(db_path=path))
+
+    result = json.loads(composer.forward(2, ["allergique aux noix"], ["entrée", "dessert"], budget=30, top_k=2))
+    assert [[s["plat"] for s in m["services"]] for m in result["menus"]] == [
+        ["Soupe de Légumes", "Salade de fruits"], ["Soupe de Légumes", "Crème Brûlée"]]
+    assert result["menus"][0]["total"] == 22   # prix du catalogue SQLite, pas ceux des plats de démonstration
+    assert json.loads(composer.forward(2, budget=5)) == {
+        "menus": [], "impossible": ["coût minimal 46.00 € pour 2 convives > budget 5.00 €"], "avertissements": []}
+    assert "erreur" in json.loads(composer.forward(2, services=["goûter"]))
+
+
+def test_empire_request_on_the_demo_catalog():
+    from database_tools import MenuComposerTool, MenuDatabaseTool
+
+    composer = MenuComposerTool(MenuDatabaseTool())
+    guests = ["végétarien", "sans gluten", "allergique aux fruits à coque"]
+    aperitif = json.loads(composer.forward(8, guests, ["apéritif"]))
+    assert aperitif["menus"][0]["services"][0]["plat"] == "Bâtonnets de Crudités"
+    assert aperitif["contraintes"]["non_verifiees"] == ["fruits a coque"]
+
+    full = json.loads(composer.forward(8, guests, ["apéritif", "entrée", "plat", "dessert"], budget=120))
+    assert full["impossible"] == ["plat : aucun plat compatible avec toutes les contraintes (sans gluten, végétarien)"]
+    assert len(full["avertissements"]) == 1
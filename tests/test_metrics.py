@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import metrics
+from conftest import ROOT
+
+
+@pytest.fixture
+def fresh():
+    metrics.metrics.reset()
+    yield metrics.metrics
+    metrics.metrics.reset()
+
+
+def _response(prompt_tokens, completion_tokens):
+    return types.SimpleNamespace(usage=types.SimpleNamespace(prompt_tokens=prompt_tokens,
+                                                             completion_tokens=completion_tokens))
+
+
+def test_track_records_usage_status_and_errors(fresh):
+    with metrics.function("ask_chef"):
+        with metrics.track("m") as call:
+            call["response"] = _response(12, 30)
+        with pytest.raises(TimeoutError):
+            with metrics.track("m"):
+                raise TimeoutError
+    with metrics.track("m", function="ask_chef") as call:
+        call["cached"] = True
+    metrics.count_retry("ask_chef", "escalation")
+
+    counters = {(c["name"], frozenset(c["labels"].items())): c["value"] for c in fresh.snapshot()["counters"]}
+
+    def value(name, **labels):
+        return counters[(name, frozenset(labels.items()))]
+
+    call = {"function": "ask_chef", "model": "m"}
+    assert value("chefbot_llm_requests_total", status="ok", **call) == 1
+    assert value("chefbot_llm_requests_total", status="error", **call) == 1
+    assert value("chefbot_llm_requests_total", status="cache_hit", **call) == 1
+    assert value("chefbot_llm_errors_total", error="TimeoutError", **call) == 1
+    assert value("chefbot_llm_prompt_tokens_total", **call) == 12
+    assert value("chefbot_llm_retries_total", function="ask_chef", reason="escalation") == 1
+
+
+def test_prometheus_text_cumulative_buckets(fresh):
+    for duration in (0.01, 0.2, 100):
+        fresh.record_call("f", "m", duration)
+    text = fresh.prometheus_text()
+    assert "# TYPE chefbot_llm_request_duration_seconds histogram" in text
+    assert 'chefbot_llm_request_duration_seconds_bucket{function="f",model="m",le="0.05"} 1' in text
+    assert 'chefbot_llm_request_duration_seconds_bucket{function="f",model="m",le="+Inf"} 3' in text
+    assert 'chefbot_llm_request_duration_seconds_count{function="f",model="m"} 3' in text
+
+
+def test_disabled_metrics_record_nothing(fresh):
+    metrics.set_enabled(False)
+    try:
+        with metrics.track("m"):
+            pass
+    finally:
+        metrics.set_enabled(True)
+    assert fresh.snapshot()["counters"] == []
+
+
+def test_exporters_start_on_first_use_not_at_import(tmp_path):
+    path = tmp_path / "metrics.json"
+    script = (
+        f"import sys, threading; sys.path.insert(0, {ROOT!r})\n"
+        "import metrics, chefbot, tools\n"
+        "names = lambda: [t.name for t in threading.enumerate()]\n"
+        "assert 'chefbot-metrics-json' not in names(), names()\n"
+        "with metrics.track('m'):\n"
+        "    pass\n"
+        "assert names().count('chefbot-metrics-json') == 1, names()\n"
+        "metrics.start()\n"
+        "assert names().count('chefbot-metrics-json') == 1, names()\n"
+    )
+    env = {**os.environ, "CHEFBOT_METRICS_JSON": str(path), "CHEFBOT_METRICS_INTERVAL": "3600"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_write_snapshot(tmp_path, fresh):
+    fresh.record_call("f", "m", 0.1, prompt_tokens=3)
+    path = tmp_path / "metrics.json"
+    metrics.write_snapshot(str(path))
+    assert json.loads(path.read_text())["counters"][0]["name"] == "chefbot_llm_prompt_tokens_total"
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from product_store import NameIndex, ProductStore, trigrams
+
+NAMES = ["Salade César", "Salade de Quinoa", "Tarte aux Pommes", "Pâtes Bolognaises", "Crème Brûlée"]
+
+
+def test_trigrams_are_padded_for_word_starts():
+    assert "  s" in trigrams("salade") and "de " in trigrams("salade")
+
+
+def test_exact_and_prefix_matches_rank_first():
+    index = NameIndex(NAMES)
+    (exact, score), *_ = index.search("salade cesar")
+    assert NAMES[exact] == "Salade César" and score == 1.0
+    ranked = [NAMES[i] for i, _ in index.search("salade")]
+    assert ranked[:2] == ["Salade César", "Salade de Quinoa"]
+    assert NAMES[index.search("pomme")[0][0]] == "Tarte aux Pommes"   # début d'un mot du nom
+
+
+@pytest.mark.parametrize("query", ["pates bolognese", "PÂTES  bolognaises", "creme brule"])
+def test_typos_accents_and_spacing(query):
+    index = NameIndex(NAMES)
+    assert index.search(query, k=1)[0][1] >= 0.5
+
+
+def test_no_result_below_threshold_or_for_empty_query():
+    index = NameIndex(NAMES)
+    assert index.search("xylophone") == []
+    assert index.search("   ") == []
+    assert len(index.search("salade", k=1)) == 1
+
+
+def test_filtered_search_keeps_k_results_in_large_catalog():
+    products = [{"nom": f"Salade numéro {i}", "prix": i % 30, "allergènes": ["gluten"] if i % 2 else [],
+                 "catégorie": "entrée"} for i in range(2000)]
+    store = ProductStore(products)
+    results = store.search_name("salade numero", k=5, prix_max=3, sans_allergenes="gluten")
+    assert len(results) == 5
+    assert all(r["prix"] <= 3 and "gluten" not in r["allergènes"] for r in results)
+
+
+def test_database_lookup_tool_returns_ranked_matches():
+    from database_tools import MenuDatabaseTool
+
+    result = json.loads(MenuDatabaseTool().forward(product_name="quiche lorain"))
+    assert result["results"][0]["nom"] == "Quiche Lorraine"
+    assert result["results"][0]["score"] > 0.5
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+import registry
+import replay
+from conftest import ROOT
+
+
+def test_modules_import_without_langfuse_keys():
+    env = {k: v for k, v in os.environ.items() if not k.startswith("LANGFUSE_")}
+    # Sans .env : le dossier courant est un dossier vide
+    result = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); "
+                             "import chefbot, tools"],
+                            cwd=os.environ["CHEFBOT_FIXTURES_DIR"].rsplit(os.sep, 1)[0],
+                            env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_replay_roundtrip(tmp_path):
+    store = replay.FixtureStore(str(tmp_path))
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True}))
+    with httpx.Client(transport=replay.ReplayTransport(store, "record", transport=upstream)) as client:
+        assert client.post("https://api.example/v1", json={"q": 1}).json() == {"ok": True}
+
+    with httpx.Client(transport=replay.ReplayTransport(store, "replay")) as client:
+        assert client.post("https://api.example/v1", json={"q": 1}).json() == {"ok": True}
+        with pytest.raises(replay.ReplayMiss):
+            client.post("https://api.example/v1", json={"q": 2})
+
+
+def test_setup_offline_installs_replay_langfuse(tmp_path):
+    import benchmarks
+    try:
+        benchmarks.setup_offline("replay", fixtures=str(tmp_path))
+        assert hasattr(registry.get("langfuse"), "span_exporter")
+    finally:
+        for name in ("langfuse", "groq", "async_groq"):
+            registry.reset(name)
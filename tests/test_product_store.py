@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from product_store import ProductStore, SQLiteProductStore
+
+PRODUCTS = [
+    {"nom": "Omelette", "prix": 15, "allergènes": ["oeufs"], "catégorie": "petitdéjeuner"},
+    {"nom": "Quiche Lorraine", "prix": 14, "allergènes": ["gluten", "lait", "oeufs"], "catégorie": "déjeuner"},
+    {"nom": "Salade César", "prix": 12, "allergènes": ["lait", "poisson"], "catégorie": "déjeuner"},
+    {"nom": "Soupe de Légumes", "prix": 10, "allergènes": [], "catégorie": "entrée"},
+    {"nom": "Crème Brûlée", "prix": 9, "allergènes": ["lait", "oeufs"], "catégorie": "dessert"},
+]
+
+
+def catalog(n):
+    return [{"nom": f"Plat {i}", "prix": 5 + i % 20, "allergènes": ["gluten"] if i % 3 else [],
+             "catégorie": "dîner"} for i in range(n)]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return ProductStore(PRODUCTS)
+    return SQLiteProductStore(str(tmp_path / "menu.sqlite"), PRODUCTS)
+
+
+def test_query_filters_and_sorts_by_price(store):
+    page = store.query(categorie="déjeuner", sans_allergenes="gluten")
+    assert [p["nom"] for p in page["results"]] == ["Salade César"]
+    page = store.query(prix_max=12)
+    assert [p["prix"] for p in page["results"]] == [9, 10, 12]
+
+
+def test_query_paginates(store):
+    page = store.query(page=2, page_size=2)
+    assert page["total"] == 5 and page["pages"] == 3
+    assert [p["nom"] for p in page["results"]] == ["Salade César", "Quiche Lorraine"]
+
+
+def test_search_name_tolerates_accents_and_typos(store):
+    assert store.search_name("creme brulee", k=1)[0]["nom"] == "Crème Brûlée"
+    assert store.search_name("quiche", k=1)[0]["nom"] == "Quiche Lorraine"
+
+
+def test_sqlite_store_keeps_an_existing_catalog(tmp_path):
+    path = str(tmp_path / "menu.sqlite")
+    SQLiteProductStore(path, catalog(1000))
+    reopened = SQLiteProductStore(path, PRODUCTS)
+    assert len(reopened) == 1000
+    assert reopened.query(categorie="dîner")["total"] == 1000
+
+
+def test_sqlite_store_reseeds_only_on_request(tmp_path):
+    path = str(tmp_path / "menu.sqlite")
+    SQLiteProductStore(path, catalog(1000))
+    assert len(SQLiteProductStore(path, PRODUCTS, replace=True)) == len(PRODUCTS)
+
+
+def test_sqlite_store_to_memory_matches(tmp_path):
+    store = SQLiteProductStore(str(tmp_path / "menu.sqlite"), catalog(50))
+    memory = store.to_memory()
+    assert len(memory.products) == 50
+    assert memory.query(sans_allergenes="gluten")["total"] == store.query(sans_allergenes="gluten")["total"]
+
+
+def test_database_tools_use_the_sqlite_catalog(tmp_path):
+    from database_tools import MenuDatabaseTool
+    path = str(tmp_path / "menu.sqlite")
+    SQLiteProductStore(path, [*catalog(200), {"nom": "Soupe Maison", "prix": 3, "allergènes": [],
+                                               "catégorie": "entrée", "végétarien": True}])
+    menu = MenuDatabaseTool(db_path=path)
+    assert json.loads(menu.forward(categorie="dîner"))["total"] == 200
+
@@ -0,0 +1,61 @@
+from semantic_cache import SemanticCache, embed, scope_key, temperature_band
+
+QUESTION = "J'ai des poireaux et des noix, que cuisiner ce soir ?"
+PARAPHRASE = "Que faire ce soir avec des noix et des poireaux ?"
+
+
+def test_paraphrase_is_close_and_other_ingredients_are_not():
+    assert float(embed(QUESTION) @ embed(PARAPHRASE)) >= 0.88
+    assert float(embed(QUESTION) @ embed("J'ai des poireaux et des lardons, que cuisiner ?")) < 0.88
+
+
+def test_hit_on_paraphrase_within_scope():
+    cache = SemanticCache()
+    cache.set(QUESTION, "Tarte poireaux-noix", temperature=0.1, scope=1)
+    answer, similarity, cached_question = cache.get(PARAPHRASE, temperature=0.1, scope=1)
+    assert answer == "Tarte poireaux-noix" and cached_question == QUESTION
+    assert cache.get(PARAPHRASE, temperature=0.1, scope=2) is None
+
+
+def test_high_temperature_bypasses_the_cache():
+    cache = SemanticCache()
+    cache.set(QUESTION, "Tarte", temperature=0.7)
+    assert cache.get(QUESTION, temperature=0.7) is None
+    assert len(cache) == 0 and cache.stats["bypassed"] == 1
+
+
+def test_missing_temperature_means_the_api_default():
+    cache = SemanticCache()
+    cache.set(QUESTION, "Tarte")                      # Groq échantillonne à 1.0
+    assert not cache.accepts(None) and len(cache) == 0
+    assert cache.accepts(0.3) and not cache.accepts(0.31)
+
+
+def test_temperature_is_part_of_the_scope():
+    assert temperature_band(0.1) != temperature_band(0.2)
+    assert temperature_band(0.12) == temperature_band(0.1)
+    assert scope_key("m", "p", temperature_band(0.1)) != scope_key("m", "p", temperature_band(0.2))
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    cache = SemanticCache(max_entries=2, ttl=10)
+    cache.set("soupe de potiron", "a", temperature=0)
+    cache.set("gratin de courgettes", "b", temperature=0)
+    cache.get("soupe de potiron", temperature=0)
+    cache.set("tarte aux pommes", "c", temperature=0)   # évince le gratin, le moins récemment utilisé
+    assert cache.get("gratin de courgettes", temperature=0) is None
+    assert cache.get("soupe de potiron", temperature=0)[0] == "a"
+
+    import semantic_cache
+    now = semantic_cache.time.time()
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now + 11)
+    assert cache.get("soupe de potiron", temperature=0) is None
+
+
+def test_ask_chef_temperature_runs_do_not_share_answers(fake_groq):
+    import chefbot
+    completions = fake_groq(lambda kwargs: f"réponse à T={kwargs['temperature']}")
+    chefbot._semantic_cache().clear()
+    answers = [chefbot.ask_chef(QUESTION + " (semantic)", temperature=t) for t in (0.1, 0.2, 0.7, 1.2)]
+    assert answers == ["réponse à T=0.1", "réponse à T=0.2", "réponse à T=0.7", "réponse à T=1.2"]
+    assert len(completions.calls) == 4
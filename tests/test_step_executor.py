@@ -0,0 +1,62 @@
+import contextvars
+import threading
+
+import pytest
+
+from step_executor import compact_context, estimate_tokens, normalize_plan, run_steps, truncate_to_tokens
+
+
+def test_normalize_plan_new_and_legacy_formats():
+    steps = normalize_plan({"etapes": [{"nom": "a", "depend_de": []}, {"name": "b", "depends_on": "0"}]})
+    assert steps == [{"id": 0, "nom": "a", "depend_de": []}, {"id": 1, "nom": "b", "depend_de": [0]}]
+    legacy = normalize_plan({"etapes": ["entrée", "plat", "dessert"]})
+    assert [s["depend_de"] for s in legacy] == [[], [0], [1]]
+
+
+def test_normalize_plan_drops_invalid_and_cyclic_dependencies():
+    steps = normalize_plan({"etapes": [
+        {"nom": "a", "depend_de": [1, 0, 7, "x"]},
+        {"nom": "b", "depend_de": [0, 0]},
+    ]})
+    assert [s["depend_de"] for s in steps] == [[], [0]]   # le cycle 0 <-> 1 est rompu
+
+
+def test_compact_context_respects_budget():
+    outputs = ["x" * 4000, "y" * 4000]
+    context = compact_context("végétarien", outputs, budget=300)
+    assert estimate_tokens(context) <= 300 + len(outputs)
+    assert context.startswith("Contraintes accumulées : végétarien")
+    assert truncate_to_tokens("court", 10) == "court"
+
+
+def test_independent_steps_run_in_parallel_and_keep_plan_order():
+    steps = normalize_plan({"etapes": [{"nom": "a", "depend_de": []}, {"nom": "b", "depend_de": []},
+                                       {"nom": "c", "depend_de": [0, 1]}]})
+    barrier = threading.Barrier(2, timeout=5)
+    contexts = {}
+
+    def execute(name, context):
+        if name in ("a", "b"):
+            barrier.wait()   # a et b doivent tourner en même temps
+        contexts[name] = context
+        return f"sortie {name}"
+
+    finished = []
+    results = run_steps(steps, execute, "contraintes", on_result=lambda step, res: finished.append(step["nom"]))
+    assert results == ["sortie a", "sortie b", "sortie c"]
+    assert finished[-1] == "c"
+    assert "sortie a" in contexts["c"] and "sortie b" in contexts["c"]
+    assert "sortie" not in contexts["a"]
+
+
+def test_steps_see_the_caller_context_and_errors_propagate():
+    var = contextvars.ContextVar("trace", default=None)
+    var.set("trace-1")
+    steps = normalize_plan({"etapes": ["a"]})
+    assert run_steps(steps, lambda name, context: var.get(), "") == ["trace-1"]
+
+    def fail(name, context):
+        raise ValueError(name)
+
+    with pytest.raises(ValueError):
+        run_steps(steps, fail, "")
@@ -0,0 +1,75 @@
+import asyncio
+import types
+import uuid
+
+import streaming
+
+
+def _chunk(text=None, completion_tokens=None):
+    # Dernier chunk Groq : delta vide et usage exact dans x_groq
+    x_groq = types.SimpleNamespace(usage=types.SimpleNamespace(completion_tokens=completion_tokens)) \
+        if completion_tokens else None
+    delta = types.SimpleNamespace(content=text)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)], x_groq=x_groq)
+
+
+CHUNKS = [_chunk("Velouté "), _chunk(""), _chunk("de poireaux"), _chunk(completion_tokens=6)]
+
+
+class StreamingCompletions:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return iter(CHUNKS)
+
+
+def _client(completions):
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+
+
+def test_stream_chat_yields_deltas_and_measures():
+    completions = StreamingCompletions()
+    stats = {}
+    parts = list(streaming.stream_chat(_client(completions), [], "m", stats, temperature=0))
+    assert parts == ["Velouté ", "de poireaux"]
+    assert completions.calls[0]["stream"] is True
+    assert stats["tokens"] == 6                    # usage exact du dernier chunk
+    assert stats["ttft_s"] is not None and stats["duration_s"] >= stats["ttft_s"]
+    assert "_start" not in stats
+
+
+def test_astream_chat():
+    class AsyncCompletions:
+        async def create(self, **kwargs):
+            async def chunks():
+                for chunk in CHUNKS:
+                    yield chunk
+            return chunks()
+
+    async def collect():
+        stats = streaming.new_stats()
+        parts = [d async for d in streaming.astream_chat(_client(AsyncCompletions()), [], "m", stats)]
+        return parts, stats
+
+    parts, stats = asyncio.run(collect())
+    assert "".join(parts) == "Velouté de poireaux" and stats["tokens"] == 6
+
+
+def test_cached_stream():
+    stats = {}
+    assert list(streaming.cached_stream("réponse", stats)) == ["réponse"]
+    assert stats["cached"] is True and stats["tokens"] == 0
+
+
+def test_ask_chef_stream_caches_deterministic_answers(fake_groq):
+    import chefbot
+
+    completions = fake_groq(lambda kwargs: iter(CHUNKS))
+    question = f"Que faire avec des poireaux ? {uuid.uuid4()}"
+    first = "".join(chefbot.ask_chef_stream(question, temperature=0))
+    stats = {}
+    second = "".join(chefbot.ask_chef_stream(question, temperature=0, stats=stats))
+    assert first == second == "Velouté de poireaux"
+    assert len(completions.calls) == 1 and stats["cached"] is True
@@ -0,0 +1,89 @@
+import json
+import types
+
+import pytest
+
+import chefbot
+import structured
+from structured import ParseMetrics, failed_generation, parse, repair_json
+
+PLAN = {"etapes": [{"nom": "courses", "depend_de": []}, {"nom": "menu", "depend_de": [0]}]}
+
+
+def test_response_format_depends_on_model():
+    assert structured.response_format("openai/gpt-oss-20b", "plan", structured.PLAN_SCHEMA) == {
+        "type": "json_schema", "json_schema": {"name": "plan", "schema": structured.PLAN_SCHEMA}}
+    assert structured.response_format("llama-3.1-8b-instant", "plan", structured.PLAN_SCHEMA) == {"type": "json_object"}
+
+
+@pytest.mark.parametrize("content, repairs", [
+    ('{"a": 1}', []),
+    ('```json\n{"a": 1}\n```', ["code_fence"]),
+    ('Voici le plan : {"a": 1} Bon appétit !', ["surrounding_text"]),
+    ("{'a': 1,}", ["syntax"]),
+    ('{"a": 1, "ok": True, "vide": None, "non": False,}', ["syntax"]),
+    ("```\nLe plan : {'a': 1}\n```", ["code_fence", "surrounding_text", "syntax"]),
+])
+def test_repair_json(content, repairs):
+    data, applied = repair_json(content)
+    assert applied == repairs
+    assert data["a"] == 1
+
+
+def test_repair_keeps_string_contents():
+    data, _ = repair_json("{'plat': \"l'omelette, True\", 'note': 'dit \"bon\"',}")
+    assert data == {"plat": "l'omelette, True", "note": 'dit "bon"'}
+
+
+def test_unrepairable_content_raises():
+    with pytest.raises(json.JSONDecodeError):
+        repair_json("pas de JSON ici")
+
+
+def test_failed_generation():
+    error = types.SimpleNamespace(body={"error": {"code": "json_validate_failed", "failed_generation": "{'a': 1}"}})
+    assert failed_generation(error) == "{'a': 1}"
+    assert failed_generation(types.SimpleNamespace(body={"error": {"code": "rate_limit_exceeded"}})) is None
+    assert failed_generation(ValueError("boom")) is None
+
+
+def test_parse_validates_and_counts():
+    stats = ParseMetrics()
+    parse(json.dumps(PLAN), chefbot._validate_plan, stats=stats)
+    parse("```json\n" + json.dumps(PLAN) + "\n```", chefbot._validate_plan, stats=stats)
+    with pytest.raises(ValueError):
+        parse('{"plan": []}', chefbot._validate_plan, stats=stats)
+    with pytest.raises(json.JSONDecodeError):
+        parse("rien", stats=stats)
+
+    snapshot = stats.snapshot()
+    assert (snapshot["parsed"], snapshot["repaired"], snapshot["failed"]) == (1, 1, 2)
+    assert snapshot["by_repair"] == {"code_fence": 1}
+    assert snapshot["repair_rate"] == 0.25
+
+
+def test_get_plan_repairs_without_retry(fake_groq):
+    completions = fake_groq(lambda kwargs: "Voici : " + json.dumps(PLAN).replace('"', "'") + ",")
+    assert chefbot.get_plan("Sans gluten", use_cache=False, model="llama-3.1-8b-instant") == PLAN
+    assert len(completions.calls) == 1
+    assert completions.calls[0]["response_format"] == {"type": "json_object"}
+
+
+def test_get_plan_recovers_rejected_generation(fake_groq):
+    class Rejected(Exception):
+        body = {"error": {"code": "json_validate_failed", "failed_generation": "```json\n" + json.dumps(PLAN)}}
+
+    def reply(kwargs):
+        raise Rejected("400")
+
+    before = structured.metrics.snapshot()["recovered_generations"]
+    fake_groq(reply)
+    assert chefbot.get_plan("Végétarien", use_cache=False, model="openai/gpt-oss-20b") == PLAN
+    assert structured.metrics.snapshot()["recovered_generations"] == before + 1
+
+
+def test_get_plan_retries_then_raises(fake_groq):
+    completions = fake_groq(lambda kwargs: "désolé, pas de plan")
+    with pytest.raises(json.JSONDecodeError):
+        chefbot.get_plan("Végétarien", use_cache=False, attempts=2)
+    assert len(completions.calls) == 2
@@ -0,0 +1,58 @@
+import json
+import threading
+import types
+
+import tools
+from memo import ToolSession
+
+
+def _tool_call_response(*calls):
+    tool_calls = [types.SimpleNamespace(id=f"call_{i}", type="function",
+                                        function=types.SimpleNamespace(name=name, arguments=json.dumps(args)))
+                  for i, (name, args) in enumerate(calls)]
+    message = types.SimpleNamespace(content=None, tool_calls=tool_calls, role="assistant")
+    message.model_dump = lambda **kw: {"role": "assistant", "content": None}
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)],
+                                 usage=types.SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+
+def test_run_tool_call_reports_errors():
+    call = types.SimpleNamespace(function=types.SimpleNamespace(name="missing", arguments="{}"))
+    assert tools.run_tool_call(call).startswith("Error: unknown tool")
+    call = types.SimpleNamespace(function=types.SimpleNamespace(name="get_recipe", arguments="{oops"))
+    assert tools.run_tool_call(call).startswith("Error: invalid JSON")
+
+
+def test_tool_calling_agent_uses_groq_from_registry(fake_groq):
+    # Régression : la variable locale des outils masquait le module `registry`
+    replies = iter([_tool_call_response(("check_fridge", {}), ("check_fridge", {})), "Voici le menu."])
+    completions = fake_groq(lambda kwargs: next(replies))
+    session = ToolSession()
+
+    assert tools.tool_calling_agent("Que reste-t-il au frigo ?", session=session) == "Voici le menu."
+    assert len(completions.calls) == 2
+    tool_messages = [m for m in completions.calls[1]["messages"] if isinstance(m, dict) and m.get("role") == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["call_0", "call_1"]
+    assert session.stats["check_fridge"]["hits"] == 1
+
+
+def test_tool_calls_of_one_message_run_in_parallel(fake_groq, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow_recipe(dish_name):
+        barrier.wait()   # les deux appels doivent être en cours en même temps
+        return {"plat": dish_name}
+
+    monkeypatch.setitem(tools.TOOL_REGISTRY, "get_recipe", slow_recipe)
+    replies = iter([_tool_call_response(("get_recipe", {"dish_name": "omelette"}),
+                                        ("get_recipe", {"dish_name": "riz au poulet"})), "Fini."])
+    completions = fake_groq(lambda kwargs: next(replies))
+
+    assert tools.tool_calling_agent("Deux recettes ?") == "Fini."
+    tool_messages = [m for m in completions.calls[1]["messages"] if isinstance(m, dict) and m.get("role") == "tool"]
+    assert [json.loads(m["content"])["plat"] for m in tool_messages] == ["omelette", "riz au poulet"]
+
+
+def test_serialize_tool_result():
+    assert tools.serialize_tool_result("texte") == "texte"
+    assert tools.serialize_tool_result({"plat": "crème"}) == '{"plat": "crème"}'
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tracing
+from conftest import ROOT
+
+
+def _run(script, **env):
+    env = {**{k: v for k, v in os.environ.items() if not k.startswith(("OTEL_", "LANGFUSE_"))}, **env}
+    result = subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {ROOT!r})\n" + script],
+                            env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_import_and_first_use_leave_process_state_alone():
+    _run(
+        "import os\n"
+        "from opentelemetry import trace\n"
+        "import tracing, chefbot, tools, database_tools\n"
+        "provider = tracing.tracer_provider()\n"
+        "assert 'OTEL_BSP_MAX_QUEUE_SIZE' not in os.environ\n"
+        "assert isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider)\n"
+        "assert tracing.init() is provider\n"
+        "assert os.environ['OTEL_BSP_MAX_QUEUE_SIZE'] == '512'\n"
+        "assert trace.get_tracer_provider() is provider\n"
+        "assert tracing.init() is provider\n",
+        CHEFBOT_TRACING="1", CHEFBOT_TRACE_QUEUE_SIZE="512",
+    )
+
+
+def test_init_is_a_no_op_when_tracing_is_disabled():
+    _run(
+        "import os, tracing\n"
+        "assert tracing.init() is None\n"
+        "assert 'OTEL_BSP_MAX_QUEUE_SIZE' not in os.environ\n",
+        CHEFBOT_TRACING="0",
+    )
+
+
+@pytest.mark.parametrize("spec, names, rate", [
+    ("", ("ask_chef",), 0.01),
+    ("ask_chef=0.5", ("ask_chef",), 0.5),
+    ("custom=2", ("custom",), 1.0),
+    ("", ("inconnu", "run_partie_3"), 1.0),
+])
+def test_sample_rate(monkeypatch, spec, names, rate):
+    monkeypatch.setenv("CHEFBOT_TRACE_SAMPLING", spec)
+    assert tracing.sample_rate(*names) == rate
+
+
+def test_enter_follows_root_decision(monkeypatch):
+    monkeypatch.setenv("CHEFBOT_TRACING", "1")
+    monkeypatch.setenv("CHEFBOT_TRACE_SAMPLING", "root=0,child=1")
+    sampled, token = tracing.enter("root")
+    try:
+        assert sampled is False
+        assert tracing.enter("child") == (False, None)   # décision héritée de la racine
+        assert not tracing.is_sampled()
+    finally:
+        tracing.leave(token)
+    sampled, token = tracing.enter("child")
+    tracing.leave(token)
+    assert sampled is True
+
+
+def test_generators_keep_their_sampling_and_label_while_iterated(monkeypatch):
+    import asyncio
+
+    import metrics
+    from registry import observe
+
+    monkeypatch.setenv("CHEFBOT_TRACING", "1")
+    monkeypatch.setenv("CHEFBOT_TRACE_SAMPLING", "stream_root=0,nested=1")
+    seen = []
+
+    @observe(name="nested")
+    def nested():
+        seen.append(tracing.is_sampled())
+
+    @observe(name="stream_root")
+    def stream():
+        for i in range(2):
+            nested()
+            yield metrics.current_function()
+
+    @observe(name="stream_root")
+    async def astream():
+        for i in range(2):
+            await asyncio.sleep(0)
+            nested()
+            yield metrics.current_function()
+
+    async def consume():
+        return [label async for label in astream()]
+
+    outside = metrics.current_function()
+    labels = []
+    for label in stream():
+        labels.append(label)
+        assert metrics.current_function() == outside   # rien ne fuit chez l'appelant
+    assert labels == ["stream_root"] * 2
+    assert asyncio.run(consume()) == ["stream_root"] * 2
+    assert seen == [False] * 4                          # décision de la racine, pas un nouveau tirage
+
+
+def test_closing_an_observed_generator_closes_the_wrapped_one():
+    from registry import observe
+    closed = []
+
+    @observe(name="stream_root")
+    def stream():
+        try:
+            yield 1
+            yield 2
+        finally:
+            closed.append(True)
+
+    iterator = stream()
+    assert next(iterator) == 1
+    iterator.close()
+    assert closed == [True]
@@ -1,25 +1,38 @@
 from dotenv import load_dotenv
-from smolagents import CodeAgent, ToolCallingAgent, LiteLLMModel, tool
-from langfuse import get_client
-from dotenv import load_dotenv
-from groq import Groq
-from langfuse import observe, get_client
+import contextvars
 import json
 import os
-
-#Configuration Langfuse (optionnel si déjà dans .env)
-os.environ["LANGFUSE_PUBLIC_KEY"] = os.getenv("LANGFUSE_PUBLIC_KEY")
-os.environ["LANGFUSE_SECRET_KEY"] = os.getenv("LANGFUSE_SECRET_KEY")
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import registry
+import tracing
+from catalog import get_catalog
+from conversation import ConversationMemory
+from memo import ToolSession
+from registry import observe
+
+#Configuration Langfuse : les clés viennent du .env ; absentes (CI, replay hors-ligne), rien n'est
+#copié (os.environ n'accepte pas None)
 os.environ["LANGFUSE_HOST"] = "https://cloud.langfuse.com/"
 
 load_dotenv()
-groq_client = Groq()
+
+# Client Groq, modèle smolagents et tools smolagents : construits au premier usage (registry.py),
+# toujours accessibles comme attributs du module (tools.groq_client, tools.model, tools.smol_tools)
+def __getattr__(name):
+    if name == "groq_client":
+        return registry.get("groq")
+    if name == "model":
+        return registry.litellm_model(MODEL_ID)
+    if name == "smol_tools":
+        return registry.get_or_create("tools.smol_tools", _build_smol_tools)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -----------------------------------------------------------------------
 # --- 4.1 - Definissez 3 outils ---
 
-# model = LiteLLMModel(model_id="groq/llama-3.3-70b-versatile")
-model = LiteLLMModel(model_id="gemini/gemini-3-pro-preview")
 tools = [
     {
         "name": "check_fridge",
@@ -59,152 +72,140 @@ tools = [
     }
 ]
 
-## Définitions du tools (implémentations simulées)
-def check_fridge():
+## Définitions du tools (données lues une fois depuis data/ via catalog.py)
+def check_fridge() -> list:
     """
     Retourne une liste d'ingrédients disponibles dans le frigo (données simulées).
     """
-    return [
-        "oeufs",
-        "lait",
-        "fromage",
-        "tomates",
-        "poulet",
-        "riz",
-        "oignons",
-        "huile d'olive"
-    ]
-
-def get_recipe(dish_name: str):
+    return get_catalog().fridge
+
+def get_recipe(dish_name: str) -> dict:
     """
     Retourne une recette détaillée pour un plat donné (données simulées).
-    """
-    recipes = {
-        "omelette": {
-            "ingredients": ["oeufs", "fromage", "huile d'olive", "sel", "poivre"],
-            "steps": [
-                "Battre les oeufs dans un bol",
-                "Chauffer l'huile dans une poêle",
-                "Verser les oeufs battus",
-                "Ajouter le fromage",
-                "Cuire 3 à 4 minutes et servir"
-            ],
-            "prep_time_minutes": 10,
-            "difficulty": "facile"
-        },
-        "riz au poulet": {
-            "ingredients": ["riz", "poulet", "oignons", "huile d'olive", "sel"],
-            "steps": [
-                "Faire revenir les oignons dans l'huile",
-                "Ajouter le poulet et le faire dorer",
-                "Ajouter le riz",
-                "Ajouter de l'eau et laisser cuire 15 minutes"
-            ],
-            "prep_time_minutes": 30,
-            "difficulty": "moyenne"
-        }
-    }
 
-    return recipes.get(
-        dish_name.lower(),
-        {"error": f"Aucune recette trouvée pour '{dish_name}'"}
-    )
+    Args:
+        dish_name: Nom du plat dont on veut la recette
+    """
+    recipe = get_catalog().get_recipe(dish_name)
+    if recipe is None:
+        return {"error": f"Aucune recette trouvée pour '{dish_name}'"}
+    return recipe
 
 
-def check_dietary_info(ingredient: str):
+def check_dietary_info(ingredient: str) -> dict:
     """
     Retourne les informations nutritionnelles et allergéniques d'un ingrédient (données simulées).
-    """
-    dietary_db = {
-        "oeufs": {
-            "calories_per_100g": 155,
-            "protein_g": 13,
-            "fat_g": 11,
-            "allergens": ["oeufs"]
-        },
-        "lait": {
-            "calories_per_100ml": 42,
-            "protein_g": 3.4,
-            "fat_g": 1,
-            "allergens": ["lactose"]
-        },
-        "fromage": {
-            "calories_per_100g": 350,
-            "protein_g": 25,
-            "fat_g": 28,
-            "allergens": ["lactose"]
-        },
-        "poulet": {
-            "calories_per_100g": 165,
-            "protein_g": 31,
-            "fat_g": 3.6,
-            "allergens": []
-        }
-    }
 
-    return dietary_db.get(
-        ingredient.lower(),
-        {"error": f"Aucune information nutritionnelle trouvée pour '{ingredient}'"}
-    )
+    Args:
+        ingredient: Nom de l'ingrédient
+    """
+    info = get_catalog().get_nutrition(ingredient)
+    if info is None:
+        return {"error": f"Aucune information nutritionnelle trouvée pour '{ingredient}'"}
+    return info
 
 # -----------------------------------------------------------------------
 # --- 4.2 - Boucle de tool calling manuelle ---
 
+def serialize_tool_result(result) -> str:
+    """Le champ `content` d'un message "tool" doit être une chaîne : dicts et listes passent en JSON."""
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+
+def run_tool_call(tool_call, tool_registry: dict = None) -> str:
+    """Exécute un appel d'outil demandé par le LLM et retourne son résultat sérialisé."""
+    name = tool_call.function.name
+    try:
+        args = json.loads(tool_call.function.arguments or "{}")
+    except json.JSONDecodeError as e:
+        return f"Error: invalid JSON arguments for '{name}': {e}"
+
+    func = (tool_registry or TOOL_REGISTRY).get(name)
+    if not func:
+        return f"Error: unknown tool '{name}'"
+    try:
+        return serialize_tool_result(func(**args))
+    except Exception as e:
+        return f"Error: tool '{name}' failed: {e}"
+
+
 ### Agent d'appel d'outils 
-@observe()
-def tool_calling_agent(user_message: str) -> str:
+AGENT_SYSTEM_PROMPT = "You are a helpful assistant. Use the provided tools when needed to answer questions accurately."
 
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a helpful assistant. Use the provided tools when needed to answer questions accurately."
-        },
-        {"role": "user", "content": user_message}
-    ]
+
+@observe()
+def tool_calling_agent(user_message: str, max_workers: int = 8, session: ToolSession = None,
+                       memory: ConversationMemory = None) -> str:
+    # Outils mémoïsés pour la session (nouvelle session par appel si aucune n'est fournie)
+    session = session or ToolSession()
+    tool_registry = session.wrap_registry(TOOL_REGISTRY)
+
+    # Historique borné en tokens : passer la même `memory` d'un appel à l'autre pour une
+    # conversation multi-tours (faits épinglés + résumé glissant des anciens tours)
+    memory = memory or ConversationMemory()
+    memory.add_user(user_message)
+    timings = []
 
     for iteration in range(5):  # Max 5 iterations to avoid infinite loops
         print(f"\n  [Iteration {iteration + 1}]")
-
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            parallel_tool_calls=False,
-        )
+        start = time.perf_counter()
+
+        # Plusieurs appels d'outils par message : moins d'allers-retours avec le LLM
+        messages = memory.messages(AGENT_SYSTEM_PROMPT)
+        with metrics.track("llama-3.3-70b-versatile") as call:
+            response = call["response"] = registry.get("groq").chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                parallel_tool_calls=True,
+            )
+        llm_s = time.perf_counter() - start
 
         message = response.choices[0].message
 
         # If no tool calls, the LLM is giving its final answer
         if not message.tool_calls:
-            print(f"  Final answer ready.")
+            memory.add({"role": "assistant", "content": message.content})
+            timings.append({"iteration": iteration + 1, "llm_s": llm_s, "tools_s": 0.0, "tool_calls": 0,
+                            "prompt_tokens": memory.total_tokens(AGENT_SYSTEM_PROMPT)})
+            tracing.update_current_span(metadata={"iterations": timings, "tool_cache": session.stats})
+            print(f"  Final answer ready. ({llm_s:.2f}s)")
             return message.content
 
         # Process each tool call
-        messages.append(message)  # Add assistant's tool-call message to history
+        memory.add(message)  # Add assistant's tool-call message to history
 
+        # Les appels d'outils d'un même message sont exécutés en parallèle (contexte
+        # Langfuse copié dans chaque thread) ; les résultats gardent l'ordre des appels
+        tools_start = time.perf_counter()
         for tool_call in message.tool_calls:
-            name = tool_call.function.name
-            args = json.loads(tool_call.function.arguments)
-
-            print(f"  Tool call: {name}({args})")
-
-            # Execute the tool
-            func = TOOL_REGISTRY.get(name)
-            if func:
-                result = func(**args)
-            else:
-                result = f"Error: unknown tool '{name}'"
-
+            print(f"  Tool call: {tool_call.function.name}({tool_call.function.arguments})")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(message.tool_calls))) as pool:
+            results = list(pool.map(
+                lambda call: contextvars.copy_context().run(run_tool_call, call, tool_registry),
+                message.tool_calls,
+            ))
+        tools_s = time.perf_counter() - tools_start
+
+        for tool_call, result in zip(message.tool_calls, results):
             print(f"  Result: {result}")
 
             # Add tool result to message history
-            messages.append({
+            memory.add({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
                 "content": result,
             })
 
+        timings.append({"iteration": iteration + 1, "llm_s": llm_s, "tools_s": tools_s,
+                        "tool_calls": len(message.tool_calls),
+                        "prompt_tokens": memory.total_tokens(AGENT_SYSTEM_PROMPT)})
+        print(f"  Iteration time: LLM {llm_s:.2f}s, tools {tools_s:.2f}s")
+
+    tracing.update_current_span(metadata={"iterations": timings, "tool_cache": session.stats})
     return "Error: max iterations reached"
 
 
@@ -217,39 +218,25 @@ TOOL_REGISTRY = {
 # -----------------------------------------------------------------------
 # --- 4.3 - Migration vers smolagents ---
 
-# model = LiteLLMModel(model_id="groq/llama-3.3-70b-versatile")
-model = LiteLLMModel(model_id="gemini/gemini-3-pro-preview")
-
-@tool
-def check_fridge(): return [ "oeufs", "lait", "fromage", "tomates", "poulet", "riz", "oignons", "huile d'olive" ]
-
-@tool
-def get_recipe(dish_name: str):
-    recipes = { "omelette": { "ingredients": ["oeufs", "fromage", "huile d'olive", "sel", "poivre"], 
-                        "steps": [ "Battre les oeufs dans un bol", "Chauffer l'huile dans une poêle", "Verser les oeufs battus", "Ajouter le fromage", "Cuire 3 à 4 minutes et servir" ], 
-                        "prep_time_minutes": 10, 
-                        "difficulty": "facile" }, 
-            "riz au poulet": { "ingredients": ["riz", "poulet", "oignons", "huile d'olive", "sel"], 
-                        "steps": [ "Faire revenir les oignons dans l'huile", "Ajouter le poulet et le faire dorer", "Ajouter le riz", "Ajouter de l'eau et laisser cuire 15 minutes" ], 
-                        "prep_time_minutes": 30,
-                        "difficulty": "moyenne" } } 
-    return recipes.get( dish_name.lower(), {"error": f"Aucune recette trouvée pour '{dish_name}'"} )
-
-@tool
-def check_dietary_info(ingredient: str):
-    dietary_db = { "oeufs": { "calories_per_100g": 155, "protein_g": 13, "fat_g": 11, "allergens": ["oeufs"] },
-                  "lait": { "calories_per_100ml": 42, "protein_g": 3.4, "fat_g": 1, "allergens": ["lactose"] },
-                  "fromage": { "calories_per_100g": 350, "protein_g": 25, "fat_g": 28, "allergens": ["lactose"] },
-                  "poulet": { "calories_per_100g": 165, "protein_g": 31, "fat_g": 3.6, "allergens": [] } }
-    return dietary_db.get( ingredient.lower(), {"error": f"Aucune information nutritionnelle trouvée pour '{ingredient}'"} )
+# MODEL_ID = "groq/llama-3.3-70b-versatile"
+MODEL_ID = "gemini/gemini-3-pro-preview"
+
+
+def _build_smol_tools():
+    # Les mêmes fonctions servent aux deux chemins (TOOL_REGISTRY et smolagents)
+    from smolagents import tool
+    return [tool(check_fridge), tool(get_recipe), tool(check_dietary_info)]
+
 
 def run_code_agent():
-    agent = CodeAgent(model=model,
-                      tools=[check_fridge, get_recipe, check_dietary_info],
+    from smolagents import CodeAgent
+    agent = CodeAgent(model=registry.litellm_model(MODEL_ID),
+                      tools=registry.get_or_create("tools.smol_tools", _build_smol_tools),
                       max_iterations=5)
     result = agent.run("Quels plats puis-je faire avec du poulet et du riz ?") 
     print("Résultat final :", result)
 
 
 if __name__ == "__main__":
+    tracing.init()
     run_code_agent()
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Traçage Langfuse échantillonné par point d'entrée, exporté en arrière-plan (jamais de flush
+sur le chemin d'une requête) ; LiteLLM tracé sur le même pipeline. Configuration par `init()`.
+
+    CHEFBOT_TRACING=0, CHEFBOT_TRACE_SAMPLE_RATE=1.0, CHEFBOT_TRACE_SAMPLING="ask_chef=0.05",
+    CHEFBOT_TRACE_QUEUE_SIZE=2048
+"""
+import contextvars
+import os
+import random
+import threading
+from functools import lru_cache
+
+DEFAULT_SAMPLE_RATES = {
+    "run_partie_3": 1.0,        # run_evaluation
+    "ask_chef": 0.01,
+    "ask_chef_stream": 0.01,
+    "ask_chef_astream": 0.01,
+}
+DEFAULT_QUEUE_SIZE = 2048
+
+# Décision de la trace en cours : None (pas encore de racine), True (tracée), False (ignorée)
+_sampled = contextvars.ContextVar("chefbot_trace_sampled", default=None)
+_lock = threading.Lock()
+_provider = None
+_litellm_logger = None
+
+
+def enabled() -> bool:
+    return os.getenv("CHEFBOT_TRACING", "1") != "0" and os.getenv("LANGFUSE_TRACING_ENABLED", "true").lower() != "false"
+
+
+@lru_cache(maxsize=8)
+def _parse_rates(spec: str) -> dict:
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def sample_rates() -> dict:
+    return {**DEFAULT_SAMPLE_RATES, **_parse_rates(os.getenv("CHEFBOT_TRACE_SAMPLING", ""))}
+
+
+def sample_rate(*names) -> float:
+    """Taux du premier nom connu (nom du span, puis nom de la fonction), sinon le taux par défaut."""
+    overrides = _parse_rates(os.getenv("CHEFBOT_TRACE_SAMPLING", ""))
+    for name in names:
+        if name in overrides:
+            return overrides[name]
+        if name in DEFAULT_SAMPLE_RATES:
+            return DEFAULT_SAMPLE_RATES[name]
+    return float(os.getenv("CHEFBOT_TRACE_SAMPLE_RATE", "1.0"))
+
+
+def is_sampled() -> bool:
+    """La trace en cours est-elle exportée ?"""
+    return enabled() and _sampled.get() is not False
+
+
+def enter(*names):
+    """Décision de la racine si on est déjà dans une trace, sinon tirage ; retourne (tracé, jeton)."""
+    if not enabled():
+        return False, None
+    decision = _sampled.get()
+    if decision is not None:
+        return decision, None
+    decision = random.random() < sample_rate(*names)
+    return decision, _sampled.set(decision)
+
+
+def leave(token):
+    if token is not None:
+        _sampled.reset(token)
+
+
+# -----------------------------------------------------------------------
+# --- OpenTelemetry ---
+
+def sampler():
+    from opentelemetry.sdk.trace.sampling import (
+        Decision, ParentBased, Sampler, SamplingResult, TraceIdRatioBased,
+    )
+
+    class HeadSampler(Sampler):
+        """Suit la décision prise par enter() ; spans racine hors points d'entrée : taux par défaut."""
+
+        def __init__(self):
+            self._fallback = TraceIdRatioBased(sample_rate())
+
+        def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None,
+                          trace_state=None):
+            decision = _sampled.get()
+            if decision is None:
+                return self._fallback.should_sample(parent_context, trace_id, name, kind, attributes, links,
+                                                    trace_state)
+            return SamplingResult(Decision.RECORD_AND_SAMPLE if decision else Decision.DROP, attributes)
+
+        def get_description(self):
+            return "ChefBotHeadSampler"
+
+    return ParentBased(root=HeadSampler())
+
+
+def init():
+    """Taille de la file d'export et provider échantillonné global (idempotent) ; retourne le provider."""
+    global _provider
+    if not enabled():
+        return None
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    with _lock:
+        os.environ.setdefault("OTEL_BSP_MAX_QUEUE_SIZE",
+                              os.getenv("CHEFBOT_TRACE_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+        current = trace.get_tracer_provider()
+        if isinstance(current, TracerProvider):
+            _provider = _provider or current
+        else:
+            _provider = _provider or TracerProvider(sampler=sampler())
+            trace.set_tracer_provider(_provider)
+        return _provider
+
+
+def tracer_provider():
+    """Provider échantillonné : celui de init(), sinon le provider SDK global, sinon un privé."""
+    global _provider
+    with _lock:
+        if _provider is None:
+            from opentelemetry import trace
+            from opentelemetry.sdk.trace import TracerProvider
+            current = trace.get_tracer_provider()
+            _provider = current if isinstance(current, TracerProvider) else TracerProvider(sampler=sampler())
+        return _provider
+
+
+def langfuse_client():
+    """Client Langfuse branché sur le provider échantillonné et sur le pool HTTP partagé."""
+    import http_pool
+    from langfuse import Langfuse
+    if not enabled():
+        return Langfuse(tracing_enabled=False, httpx_client=http_pool.sync_client())
+    return Langfuse(tracer_provider=tracer_provider(), httpx_client=http_pool.sync_client())
+
+
+def instrument_litellm():
+    """Trace LiteLLM sur le provider de Langfuse (idempotent, retire "langfuse_otel")."""
+    global _litellm_logger
+    import litellm
+    with _lock:
+        litellm.callbacks = [cb for cb in litellm.callbacks if cb != "langfuse_otel"]
+        if not enabled() or _litellm_logger is not None:
+            return
+    provider = tracer_provider()
+    with _lock:
+        if _litellm_logger is None:
+            from litellm.integrations.opentelemetry import OpenTelemetry
+            _litellm_logger = OpenTelemetry(tracer_provider=provider)
+            litellm.callbacks.append(_litellm_logger)
+
+
+# -----------------------------------------------------------------------
+# --- Événements et métadonnées ---
+
+def update_current_span(**kwargs):
+    """langfuse.update_current_span, sans effet (ni client créé) si la trace n'est pas retenue."""
+    if is_sampled():
+        import registry
+        registry.get("langfuse").update_current_span(**kwargs)
+
+
+def update_current_trace(**kwargs):
+    if is_sampled():
+        import registry
+        registry.get("langfuse").update_current_trace(**kwargs)
+
+
+def event(name: str, **kwargs):
+    """Événement Langfuse rattaché à la trace en cours si elle est retenue ; jamais bloquant."""
+    if not is_sampled():
+        return
+    try:
+        import registry
+        registry.get("langfuse").create_event(name=name, **kwargs)
+    except Exception as e:
+        print(f"Langfuse logging failed: {e}")